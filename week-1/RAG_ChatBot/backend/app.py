@@ -1,19 +1,43 @@
 import os
+import asyncio
+import json
 import uuid
 from bedrock_claude import BedrockClaudeClient
-import docx
-import PyPDF2
+from bedrock_stub import StubClaudeClient
 import chromadb
+from chromadb.config import Settings
 import re
+import threading
+import time
+from collections import OrderedDict, deque
 from datetime import datetime
-from chromadb.utils import embedding_functions
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form, BackgroundTasks
-from fastapi.responses import JSONResponse
+import numpy as np
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from typing import List, Optional
+import hashlib
 import shutil
 from dotenv import load_dotenv
 from pydantic import BaseModel
+from document_loader import chunk_id, iter_document_batches
+from bm25_index import BM25Index, reciprocal_rank_fusion
+from collection_manager import SessionCollectionManager
+from context_packer import ContextPacker, count_tokens
+from document_registry import DocumentRegistry
+from conversation_store import InMemoryConversationStore, SQLiteConversationStore
+from embedding_service import EmbeddingService
+from index_snapshot import export_collection, iter_collection_batches, read_manifest, write_manifest
+from ingestion import IngestionExecutor, IngestQueueFull
+from metrics import (
+    MetricsRegistry,
+    record_stage,
+    request_timings,
+    reset_request_timing,
+    server_timing_header,
+    start_request_timing,
+    timed_stage,
+)
 
 
 # Load environment variables from .env file
@@ -37,158 +61,403 @@ def secure_filename(filename):
     return filename
 
 # =============================================================================
-# DOCUMENT PROCESSING AND UTILITIES
+# METRICS
 # =============================================================================
 
-def read_text_file(file_path: str):
-    """Read content from a text file"""
-    with open(file_path, 'r', encoding='utf-8') as file:
-        return file.read()
-
-def read_pdf_file(file_path: str):
-    """Read content from a PDF file"""
-    text = ""
-    with open(file_path, 'rb') as file:
-        pdf_reader = PyPDF2.PdfReader(file)
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-    return text
-
-def read_docx_file(file_path: str):
-    """Read content from a Word document"""
-    doc = docx.Document(file_path)
-    return "\n".join([paragraph.text for paragraph in doc.paragraphs])
-
-def read_document(file_path: str):
-    """Read document content based on file extension"""
-    _, file_extension = os.path.splitext(file_path)
-    file_extension = file_extension.lower()
-    
-    if file_extension == '.txt':
-        return read_text_file(file_path)
-    elif file_extension == '.pdf':
-        return read_pdf_file(file_path)
-    elif file_extension == '.docx':
-        return read_docx_file(file_path)
-    else:
-        raise ValueError(f"Unsupported file format: {file_extension}")
-
-def split_text(text: str, chunk_size: int = 500):
-    """Split text into chunks while preserving sentence boundaries"""
-    sentences = text.replace('\n', ' ').split('. ')
-    chunks = []
-    current_chunk = []
-    current_size = 0
-    
-    for sentence in sentences:
-        sentence = sentence.strip()
-        if not sentence:
-            continue
-            
-        # Ensure proper sentence ending
-        if not sentence.endswith('.'):
-            sentence += '.'
-            
-        sentence_size = len(sentence)
-        
-        # Check if adding this sentence would exceed chunk size
-        if current_size + sentence_size > chunk_size and current_chunk:
-            chunks.append(' '.join(current_chunk))
-            current_chunk = [sentence]
-            current_size = sentence_size
-        else:
-            current_chunk.append(sentence)
-            current_size += sentence_size
-    
-    # Add the last chunk if it exists
-    if current_chunk:
-        chunks.append(' '.join(current_chunk))
-    
-    return chunks
+metrics = MetricsRegistry(prefix="rag_")
+
+STAGE_SECONDS = metrics.histogram(
+    "stage_seconds", "Time spent in each stage of the RAG request path", ["stage"]
+)
+FIRST_TOKEN_SECONDS = metrics.histogram(
+    "stream_first_token_seconds", "Time from the start of a streamed generation to its first token"
+)
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "http_request_seconds", "HTTP request latency until the response headers are sent",
+    ["method", "route", "status"]
+)
+BEDROCK_TOKENS = metrics.counter("bedrock_tokens_total", "Tokens reported by Bedrock responses", ["type"])
+INGESTED_DOCUMENTS = metrics.counter("ingested_documents_total", "Documents ingested, by outcome", ["status"])
+INGESTED_CHUNKS = metrics.counter("ingested_chunks_total", "Chunks stored by document ingestion")
+INGESTION_SECONDS = metrics.histogram("ingestion_seconds", "Time to ingest one document")
+INGESTION_CHUNKS_PER_SECOND = metrics.histogram(
+    "ingestion_chunks_per_second", "Ingestion throughput of each document",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+)
+
+def record_bedrock_usage(usage: dict):
+    """Count the input and output tokens reported by a Bedrock response"""
+    for token_type in ("input_tokens", "output_tokens"):
+        if usage.get(token_type):
+            BEDROCK_TOKENS.inc(token_type.replace("_tokens", ""), amount=usage[token_type])
 
 # =============================================================================
 # CHROMADB SETUP AND OPERATIONS
 # =============================================================================
 
 class RAGDatabase:
-    def __init__(self, db_path: str = "chroma_db", collection_name: str = "documents_collection"):
-        """Initialize ChromaDB with persistence"""
+    def __init__(self, db_path: str = "chroma_db", collection_name: str = "documents_collection",
+                 embedding_model_name: str = "all-MiniLM-L6-v2", embedding_service: EmbeddingService = None,
+                 chunk_tokens: int = 128, overlap_tokens: int = 24, hybrid_search: bool = True,
+                 hybrid_candidates: int = 20, rrf_k: int = 60, registry_path: str = "collection_registry.db",
+                 max_session_handles: int = 1000, session_handle_idle_ttl: float = 900,
+                 session_collection_ttl: float = 0, shared_sessions: bool = False,
+                 memory_limit_bytes: int = 0):
+        """
+        Initialize ChromaDB with persistence.
+        With memory_limit_bytes set, ChromaDB keeps loaded collection segments in an
+        LRU cache of that size instead of keeping every collection ever used loaded.
+        With hybrid_search, every search fuses the top hybrid_candidates results of the
+        vector query and of a BM25 keyword index by reciprocal rank (constant rrf_k).
+        At most max_session_handles session collections stay open; see
+        SessionCollectionManager for the idle and TTL settings.
+        With shared_sessions, every session is stored in the default collection and
+        scoped by a session_id metadata filter instead of a collection of its own.
+        The database is opened by connect(), or on first use.
+        """
         self.db_path = db_path
         self.default_collection_name = collection_name
-        self.client = chromadb.PersistentClient(path=db_path)
+        self.embedding_model_name = embedding_model_name
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.shared_sessions = shared_sessions
+        self.settings = Settings()
+        if memory_limit_bytes > 0:
+            self.settings = Settings(chroma_segment_cache_policy="LRU", chroma_memory_limit_bytes=memory_limit_bytes)
         
-        # Configure sentence transformer embeddings
-        self.sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="all-MiniLM-L6-v2"
-        )
+        # Configure sentence transformer embeddings through the shared, cached embedding service
+        self.embedding_service = embedding_service or EmbeddingService(model_name=embedding_model_name)
+        self.sentence_transformer_ef = self.embedding_service.as_chroma_embedding_function()
         
-        # Dictionary to track session collections
-        self.session_collections = {}
+        # Version counter per collection, bumped whenever its contents change
+        self.collection_versions = {}
         
-        # Create or get default collection
-        self.default_collection = self.client.get_or_create_collection(
-            name=collection_name,
-            embedding_function=self.sentence_transformer_ef
-        )
+        # Callbacks run with the session ID when a session collection is deleted
+        self.session_deletion_listeners = []
+        
+        # BM25 keyword index per stored collection, built on first search
+        self.hybrid_search = hybrid_search
+        self.hybrid_candidates = hybrid_candidates
+        self.rrf_k = rrf_k
+        self.keyword_indexes = {}
+        self.keyword_index_lock = threading.Lock()
+        
+        # Session collection settings, see SessionCollectionManager
+        self.registry_path = registry_path
+        self.max_session_handles = max_session_handles
+        self.session_handle_idle_ttl = session_handle_idle_ttl
+        self.session_collection_ttl = session_collection_ttl
+        
+        # ChromaDB client, session collections and default collection, opened by connect()
+        self._client = None
+        self._session_collections = None
+        self._default_collection = None
+        self._connect_lock = threading.Lock()
+    
+    def connect(self):
+        """
+        Open the ChromaDB client, the session collection registry and the default
+        collection, if not open yet. Their cost grows with the size of the database,
+        so the server does this in its warm start rather than at import.
+        """
+        if self._client is not None:
+            return
+        with self._connect_lock:
+            if self._client is not None:
+                return
+            client = chromadb.PersistentClient(path=self.db_path, settings=self.settings)
+            
+            # Open session collections, closed when idle and deleted after their TTL
+            self._session_collections = SessionCollectionManager(
+                client,
+                self.sentence_transformer_ef,
+                registry_path=self.registry_path,
+                max_handles=self.max_session_handles,
+                handle_idle_ttl=self.session_handle_idle_ttl,
+                collection_ttl=self.session_collection_ttl,
+                on_evict=self._on_collection_evicted,
+                on_delete=self._on_collection_deleted
+            )
+            
+            # Create or get default collection
+            self._default_collection = client.get_or_create_collection(
+                name=self.default_collection_name,
+                embedding_function=self.sentence_transformer_ef
+            )
+            # Set last, so other threads only see a fully opened database
+            self._client = client
+    
+    @property
+    def connected(self) -> bool:
+        return self._client is not None
+    
+    @property
+    def client(self):
+        if self._client is None:
+            self.connect()
+        return self._client
+    
+    @property
+    def session_collections(self) -> SessionCollectionManager:
+        if self._client is None:
+            self.connect()
+        return self._session_collections
+    
+    @property
+    def default_collection(self):
+        if self._client is None:
+            self.connect()
+        return self._default_collection
     
     def get_collection_for_session(self, session_id: str = None):
-        """Get or create a collection for a specific session"""
-        if not session_id:
+        """Get or create the collection a session's chunks are stored in"""
+        if not session_id or self.shared_sessions:
             return self.default_collection
             
-        if session_id not in self.session_collections:
-            collection_name = f"session_{session_id}"
-            self.session_collections[session_id] = self.client.get_or_create_collection(
-                name=collection_name,
-                embedding_function=self.sentence_transformer_ef
+        return self.session_collections.get(self.get_collection_name(session_id))
+    
+    def _on_collection_evicted(self, collection_name: str):
+        """Drop in-memory state for a closed collection; it is rebuilt on next use"""
+        self.keyword_indexes.pop(collection_name, None)
+    
+    def _on_collection_deleted(self, collection_name: str):
+        self.keyword_indexes.pop(collection_name, None)
+        self.collection_versions[collection_name] = self.collection_versions.get(collection_name, 0) + 1
+        session_id = collection_name[len("session_"):]
+        for listener in self.session_deletion_listeners:
+            listener(session_id)
+    
+    def add_session_deletion_listener(self, callback):
+        """Run callback(session_id) whenever a session collection is deleted, including by its TTL"""
+        self.session_deletion_listeners.append(callback)
+    
+    def get_collection_name(self, session_id: str = None) -> str:
+        """Get the name identifying a session's documents (for versions and caches)"""
+        return f"session_{session_id}" if session_id else self.default_collection_name
+    
+    def get_storage_name(self, session_id: str = None) -> str:
+        """Get the name of the collection a session's chunks are stored in"""
+        return self.default_collection_name if self.shared_sessions else self.get_collection_name(session_id)
+    
+    def get_session_filter(self, session_id: str = None, where: dict = None) -> Optional[dict]:
+        """
+        Combine a metadata filter with the session scope; in shared mode chunks
+        without a session are stored with an empty session_id
+        """
+        conditions = [where] if where else []
+        if self.shared_sessions:
+            conditions.append({"session_id": session_id or ""})
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+    
+    @staticmethod
+    def build_filter(sources: List[str] = None, document_ids: List[str] = None,
+                     uploaded_after: float = None, uploaded_before: float = None) -> Optional[dict]:
+        """
+        Build a ChromaDB where clause from retrieval filters; upload times are
+        Unix timestamps. Returns None when no filter is set.
+        """
+        conditions = []
+        if sources:
+            conditions.append({"source": {"$in": list(sources)}})
+        if document_ids:
+            conditions.append({"document_id": {"$in": list(document_ids)}})
+        if uploaded_after is not None:
+            conditions.append({"uploaded_at": {"$gte": int(uploaded_after)}})
+        if uploaded_before is not None:
+            conditions.append({"uploaded_at": {"$lte": int(uploaded_before)}})
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+    
+    def get_session_id(self, collection_name: str) -> Optional[str]:
+        """Get the session a collection belongs to (None for the default collection)"""
+        if collection_name == self.default_collection_name:
+            return None
+        return collection_name[len("session_"):]
+    
+    def get_collection_by_name(self, collection_name: str):
+        """Get or create the default collection or a session collection by name"""
+        return self.get_collection_for_session(self.get_session_id(collection_name))
+    
+    def get_collection_version(self, session_id: str = None):
+        """Get (collection name, version) identifying the current contents of a session's collection"""
+        collection_name = self.get_collection_name(session_id)
+        return collection_name, self.collection_versions.get(collection_name, 0)
+    
+    def bump_collection_version(self, session_id: str = None):
+        """Mark a session's collection as changed"""
+        collection_name = self.get_collection_name(session_id)
+        self.collection_versions[collection_name] = self.collection_versions.get(collection_name, 0) + 1
+    
+    def get_keyword_index(self, session_id: str = None) -> BM25Index:
+        """
+        Get the BM25 index for the collection a session is stored in, (re)building it from the
+        collection when it is missing or out of step with it (e.g. after another
+        worker process changed the collection)
+        """
+        collection_name = self.get_storage_name(session_id)
+        collection = self.get_collection_for_session(session_id)
+        count = collection.count()
+        
+        index = self.keyword_indexes.get(collection_name)
+        if index is not None and len(index) == count:
+            return index
+        
+        with self.keyword_index_lock:
+            index = self.keyword_indexes.get(collection_name)
+            if index is None or len(index) != count:
+                index = BM25Index()
+                for offset in range(0, count, 1000):
+                    stored = collection.get(include=["documents"], limit=1000, offset=offset)
+                    index.add(stored["ids"], stored["documents"])
+                self.keyword_indexes[collection_name] = index
+        return index
+    
+    def warm_up(self, max_collections: int = 10) -> int:
+        """
+        Load the indexes of the default collection and the max_collections most
+        recently used session collections into memory: one query per collection
+        pages in its HNSW index, and the BM25 index is built when hybrid search is on.
+        Returns the number of non-empty collections warmed.
+        """
+        names = [self.default_collection_name] + self.session_collections.recent(max_collections)
+        warmed = 0
+        for name in names:
+            collection = self.get_collection_by_name(name)
+            sample = collection.get(limit=1, include=["embeddings"])
+            if not sample["ids"]:
+                continue
+            collection.query(query_embeddings=[sample["embeddings"][0]], n_results=1)
+            if self.hybrid_search:
+                self.get_keyword_index(self.get_session_id(name))
+            warmed += 1
+        return warmed
+    
+    def export_snapshot(self, path: str, collection_names: List[str] = None) -> dict:
+        """
+        Export collections with their embeddings to a snapshot directory at path
+        (by default the default collection and every session collection).
+        The snapshot is written next to path and moved into place when complete.
+        Returns the snapshot manifest.
+        """
+        if collection_names is None:
+            collection_names = [self.default_collection_name] + self.session_collections.recent()
+        
+        partial_path = f"{path}.partial"
+        shutil.rmtree(partial_path, ignore_errors=True)
+        os.makedirs(partial_path)
+        
+        collections = []
+        for name in collection_names:
+            if name != self.default_collection_name and not self.session_collections.exists(name):
+                continue
+            entry = export_collection(self.get_collection_by_name(name), os.path.join(partial_path, name))
+            entry["directory"] = name
+            collections.append(entry)
+        
+        manifest = write_manifest(
+            partial_path,
+            collections,
+            embedding_model=self.embedding_model_name,
+            chunk_tokens=self.chunk_tokens,
+            overlap_tokens=self.overlap_tokens
+        )
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(partial_path, path)
+        return manifest
+    
+    def import_snapshot(self, path: str, merge: bool = False, batch_size: int = 1000) -> dict:
+        """
+        Restore the collections of a snapshot using its stored embeddings, so no
+        text is embedded again. Collections that already hold data are skipped
+        unless merge is set, in which case snapshot records are upserted into them.
+        Returns the number of chunks restored per collection.
+        """
+        manifest = read_manifest(path)
+        if manifest.get("embedding_model") != self.embedding_model_name:
+            raise ValueError(
+                f"Snapshot was built with {manifest.get('embedding_model')}, "
+                f"but the server uses {self.embedding_model_name}"
             )
+        if (manifest.get("chunk_tokens"), manifest.get("overlap_tokens")) != (self.chunk_tokens, self.overlap_tokens):
+            print("Snapshot was chunked with different settings; re-uploaded documents will be re-chunked")
+        
+        restored = {}
+        for entry in manifest["collections"]:
+            name = entry["name"]
+            collection = self.get_collection_by_name(name)
+            if collection.count() and not merge:
+                restored[name] = 0
+                continue
             
-        return self.session_collections[session_id]
+            chunks = 0
+            for ids, documents, metadatas, embeddings in iter_collection_batches(
+                os.path.join(path, entry["directory"]), batch_size
+            ):
+                collection.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+                chunks += len(ids)
+            
+            self.keyword_indexes.pop(name, None)
+            self.collection_versions[name] = self.collection_versions.get(name, 0) + 1
+            restored[name] = chunks
+        
+        return {"collections": restored, "chunks": sum(restored.values())}
     
     def clear_session_data(self, session_id: str):
         """Clear all data for a specific session"""
         if not session_id:
             return False
             
-        collection_name = f"session_{session_id}"
         try:
-            if session_id in self.session_collections:
-                del self.session_collections[session_id]
-                
-            if collection_name in [col.name for col in self.client.list_collections()]:
-                self.client.delete_collection(collection_name)
+            if self.shared_sessions:
+                self._delete_where(self.get_session_filter(session_id), session_id)
+                return True
+            # Also drops the keyword index and bumps the collection version
+            self.session_collections.delete(self.get_collection_name(session_id))
             return True
         except Exception as e:
             print(f"Error clearing session data: {str(e)}")
             return False
     
+    def _delete_where(self, where: dict, session_id: str = None) -> int:
+        """Delete the chunks matching a where clause from a session's collection"""
+        collection = self.get_collection_for_session(session_id)
+        ids = collection.get(where=where, include=[])["ids"]
+        for i in range(0, len(ids), 100):
+            collection.delete(ids=ids[i:i + 100])
+        if ids:
+            index = self.keyword_indexes.get(self.get_storage_name(session_id))
+            if index is not None:
+                index.remove(ids)
+            self.bump_collection_version(session_id)
+        return len(ids)
+    
+    def iter_document_batches(self, file_path: str, session_id: str = None, batch_size: int = 100,
+                              source_name: str = None):
+        """Stream a document as (ids, texts, metadatas) batches of at most batch_size chunks"""
+        return iter_document_batches(
+            file_path, session_id, batch_size, source_name, self.chunk_tokens, self.overlap_tokens
+        )
+    
     def process_document(self, file_path: str, session_id: str = None):
         """Process a single document and prepare it for ChromaDB"""
         try:
-            # Read the document
-            content = read_document(file_path)
+            ids, texts, metadatas = [], [], []
+            for batch_ids, batch_texts, batch_metadatas in self.iter_document_batches(file_path, session_id):
+                ids.extend(batch_ids)
+                texts.extend(batch_texts)
+                metadatas.extend(batch_metadatas)
             
-            # Split into chunks
-            chunks = split_text(content)
-            
-            # Prepare metadata
-            file_name = os.path.basename(file_path)
-            metadatas = [{"source": file_name, "chunk": i, "session_id": session_id} for i in range(len(chunks))]
-            
-            # Include session_id in the document IDs if provided
-            if session_id:
-                ids = [f"{session_id}_{file_name}_chunk_{i}" for i in range(len(chunks))]
-            else:
-                ids = [f"{file_name}_chunk_{i}" for i in range(len(chunks))]
-            
-            return ids, chunks, metadatas
+            return ids, texts, metadatas
             
         except Exception as e:
             print(f"Error processing {file_path}: {str(e)}")
             return [], [], []
     
-    def add_to_collection(self, ids, texts, metadatas, session_id: str = None):
-        """Add documents to collection in batches"""
+    def add_to_collection(self, ids, texts, metadatas, session_id: str = None, embeddings=None):
+        """Add documents to collection in batches, using precomputed embeddings if given"""
         if not texts:
             return
             
@@ -201,11 +470,146 @@ class RAGDatabase:
             collection.add(
                 documents=texts[i:end_idx],
                 metadatas=metadatas[i:end_idx],
-                ids=ids[i:end_idx]
+                ids=ids[i:end_idx],
+                embeddings=embeddings[i:end_idx] if embeddings is not None else None
             )
+        
+        # Keep an already built keyword index in step; otherwise it is built on first search
+        index = self.keyword_indexes.get(self.get_storage_name(session_id))
+        if index is not None:
+            index.add(ids, texts)
+        
+        self.bump_collection_version(session_id)
+    
+    def get_document_manifest(self, source: str, session_id: str = None) -> dict:
+        """Get the chunk IDs stored for a document, mapped to their metadata"""
+        collection = self.get_collection_for_session(session_id)
+        stored = collection.get(where=self.get_session_filter(session_id, {"source": source}), include=["metadatas"])
+        return {id_: metadata or {} for id_, metadata in zip(stored["ids"], stored["metadatas"])}
+    
+    def copy_document(self, source: str, from_session_id: str = None, to_source: str = None,
+                      to_session_id: str = None, on_batch=None, batch_size: int = 100, metadata: dict = None,
+                      sha256: str = None):
+        """
+        Index a copy of an already indexed document under another name or session,
+        reusing its stored chunks and embeddings instead of parsing and embedding
+        it again. With sha256, the document is only copied if every stored chunk
+        was indexed from that content. Returns the ingest summary, or None if the
+        document is not indexed (or holds other content).
+        """
+        to_source = to_source or source
+        stored = self.get_collection_for_session(from_session_id).get(
+            where=self.get_session_filter(from_session_id, {"source": source}),
+            include=["documents", "metadatas", "embeddings"]
+        )
+        if not stored["ids"]:
+            return None
+        if sha256 and any(metadata.get("sha256") != sha256 for metadata in stored["metadatas"]):
+            return None
+        
+        chunks = sorted(
+            zip(stored["documents"], stored["metadatas"], stored["embeddings"]),
+            key=lambda item: item[1].get("chunk", 0)
+        )
+        
+        def batches():
+            for i in range(0, len(chunks), batch_size):
+                batch = chunks[i:i + batch_size]
+                metadatas = []
+                for _, metadata, _ in batch:
+                    metadata = {"source": to_source, "chunk": metadata.get("chunk", 0)}
+                    if to_session_id:
+                        metadata["session_id"] = to_session_id
+                    metadatas.append(metadata)
+                yield (
+                    [chunk_id(to_source, text, to_session_id) for text, _, _ in batch],
+                    [text for text, _, _ in batch],
+                    metadatas,
+                    [embedding for _, _, embedding in batch]
+                )
+        
+        return self.ingest_batches(batches(), to_session_id, on_batch, source=to_source, metadata=metadata)
+    
+    def ingest_batches(self, batches, session_id: str = None, on_batch=None, source: str = None,
+                       metadata: dict = None):
+        """
+        Add (ids, texts, metadatas[, embeddings]) batches to the collection as they arrive.
+        metadata (e.g. document_id and uploaded_at) is added to every new chunk's metadata.
+        When source is given, the batches are diffed against the chunks already stored
+        for that document: only new chunks are added, chunks whose position changed
+        are updated, and chunks no longer in the document are deleted. Unchanged chunks
+        keep the metadata of the upload that first indexed them.
+        on_batch(total_chunks) is called after every batch.
+        Returns a summary with the document's chunk count and the chunks added,
+        unchanged and removed.
+        """
+        manifest = self.get_document_manifest(source, session_id) if source else {}
+        collection = self.get_collection_for_session(session_id)
+        summary = {"chunks": 0, "added": 0, "unchanged": 0, "removed": 0}
+        seen = set()
+        
+        # ChromaDB rejects None metadata values
+        extra = {key: value for key, value in (metadata or {}).items() if value is not None}
+        if self.shared_sessions:
+            extra["session_id"] = session_id or ""
+        
+        for ids, texts, metadatas, *embeddings in batches:
+            embeddings = embeddings[0] if embeddings else None
+            new = [i for i, id_ in enumerate(ids) if id_ not in manifest]
+            # Only the chunk's own metadata is diffed: per-upload metadata changes on
+            # every re-upload and would otherwise rewrite every surviving chunk
+            changed = [
+                i for i, id_ in enumerate(ids)
+                if id_ in manifest and any(manifest[id_].get(key) != value for key, value in metadatas[i].items())
+            ]
+            if extra:
+                metadatas = [{**chunk_metadata, **extra} for chunk_metadata in metadatas]
+            seen.update(ids)
+            
+            if new:
+                self.add_to_collection(
+                    [ids[i] for i in new],
+                    [texts[i] for i in new],
+                    [metadatas[i] for i in new],
+                    session_id,
+                    embeddings=[embeddings[i] for i in new] if embeddings is not None else None
+                )
+            if changed:
+                collection.update(ids=[ids[i] for i in changed], metadatas=[metadatas[i] for i in changed])
+                self.bump_collection_version(session_id)
+            
+            summary["chunks"] += len(ids)
+            summary["added"] += len(new)
+            summary["unchanged"] += len(ids) - len(new)
+            if on_batch:
+                on_batch(summary["chunks"])
+        
+        # Remove chunks that are no longer part of the document
+        stale = [id_ for id_ in manifest if id_ not in seen]
+        if stale:
+            for i in range(0, len(stale), 100):
+                collection.delete(ids=stale[i:i + 100])
+            index = self.keyword_indexes.get(self.get_storage_name(session_id))
+            if index is not None:
+                index.remove(stale)
+            self.bump_collection_version(session_id)
+        summary["removed"] = len(stale)
+        
+        return summary
+    
+    def ingest_document(self, file_path: str, session_id: str = None, batch_size: int = 100, on_batch=None,
+                        source_name: str = None, metadata: dict = None):
+        """
+        Stream a document into the collection batch by batch, replacing any previous
+        version of the same document. Chunks become searchable as each batch is added,
+        before the rest of the document has been parsed. Returns the ingest summary.
+        """
+        source = source_name or os.path.basename(file_path)
+        batches = self.iter_document_batches(file_path, session_id, batch_size, source)
+        return self.ingest_batches(batches, session_id, on_batch, source=source, metadata=metadata)
     
     def process_and_add_documents(self, folder_path: str, session_id: str = None):
-        """Process all documents in a folder and add to collection"""
+        """Process all documents in a folder and sync them into the collection"""
         if not os.path.exists(folder_path):
             print(f"Folder {folder_path} does not exist")
             return
@@ -216,19 +620,107 @@ class RAGDatabase:
         
         for file_path in files:
             print(f"Processing {os.path.basename(file_path)}...")
-            ids, texts, metadatas = self.process_document(file_path, session_id)
-            self.add_to_collection(ids, texts, metadatas, session_id)
-            print(f"Added {len(texts)} chunks to collection")
+            try:
+                summary = self.ingest_document(file_path, session_id)
+            except Exception as e:
+                print(f"Error processing {file_path}: {str(e)}")
+                continue
+            print(f"Synced {summary['chunks']} chunks: {summary['added']} added, "
+                  f"{summary['unchanged']} unchanged, {summary['removed']} removed")
     
-    def semantic_search(self, query: str, session_id: str = None, n_results: int = 3):
-        """Perform semantic search on the collection"""
-        collection = self.get_collection_for_session(session_id)
-        results = collection.query(
-            query_texts=[query],
-            n_results=n_results
-        )
+    def semantic_search(self, query: str, session_id: str = None, n_results: int = 3, where: dict = None):
+        """
+        Perform semantic search on the collection, limited to chunks matching the
+        where clause if one is given (see build_filter).
+        With hybrid search enabled, vector and BM25 keyword results are fused by
+        reciprocal rank; results found only by keyword have a distance of None.
+        """
+        return self.semantic_search_many([query], [session_id], n_results, wheres=[where])[0]
+    
+    def semantic_search_many(self, queries: List[str], session_ids: List[Optional[str]], n_results: int = 3,
+                             query_embeddings=None, wheres: List[Optional[dict]] = None):
+        """
+        Search for several queries at once, returning one result per query.
+        Queries are embedded in one call (unless query_embeddings are given) and
+        queries for the same collection and filter are sent to it as one grouped query.
+        """
+        if query_embeddings is None:
+            with timed_stage(STAGE_SECONDS, "embed"):
+                query_embeddings = self.embedding_service.embed(queries)
+        wheres = wheres or [None] * len(queries)
+        
+        groups = OrderedDict()
+        for i, (session_id, where) in enumerate(zip(session_ids, wheres)):
+            where = self.get_session_filter(session_id, where)
+            key = (self.get_storage_name(session_id), json.dumps(where, sort_keys=True))
+            groups.setdefault(key, (session_id, where, []))[2].append(i)
+        
+        n_candidates = max(n_results, self.hybrid_candidates) if self.hybrid_search else n_results
+        results = [None] * len(queries)
+        for session_id, where, indices in groups.values():
+            collection = self.get_collection_for_session(session_id)
+            # The where clause is applied by ChromaDB before the vector search
+            with timed_stage(STAGE_SECONDS, "vector_query"):
+                dense = collection.query(
+                    query_embeddings=[query_embeddings[i] for i in indices],
+                    n_results=n_candidates,
+                    where=where
+                )
+            index = self.get_keyword_index(session_id) if self.hybrid_search else None
+            allowed_ids = None
+            if index is not None and where is not None:
+                with timed_stage(STAGE_SECONDS, "keyword_search"):
+                    allowed_ids = set(collection.get(where=where, include=[])["ids"])
+            
+            for position, i in enumerate(indices):
+                ids = dense["ids"][position]
+                documents = dense["documents"][position]
+                metadatas = dense["metadatas"][position]
+                distances = dense["distances"][position]
+                if index is not None:
+                    with timed_stage(STAGE_SECONDS, "keyword_search"):
+                        ids, documents, metadatas, distances = self._fuse_keyword_results(
+                            collection, index, queries[i], ids, documents, metadatas, distances, n_results,
+                            allowed_ids
+                        )
+                results[i] = {
+                    "ids": [ids],
+                    "documents": [documents],
+                    "metadatas": [metadatas],
+                    "distances": [distances]
+                }
+        
         return results
     
+    def _fuse_keyword_results(self, collection, index: BM25Index, query: str, ids, documents, metadatas,
+                              distances, n_results: int, allowed_ids: set = None):
+        """Fuse vector results for a query with its BM25 results (among allowed_ids, if given) by reciprocal rank"""
+        keyword = index.search(query, self.hybrid_candidates, allowed_ids)
+        fused = reciprocal_rank_fusion([ids, [id_ for id_, _ in keyword]], k=self.rrf_k)
+        top_ids = [id_ for id_, _ in fused[:n_results]]
+        
+        found = {
+            id_: (document, metadata, distance)
+            for id_, document, metadata, distance in zip(ids, documents, metadatas, distances)
+        }
+        keyword_only = [id_ for id_ in top_ids if id_ not in found]
+        if keyword_only:
+            stored = collection.get(ids=keyword_only, include=["documents", "metadatas"])
+            for id_, document, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+                found[id_] = (document, metadata, None)
+        
+        top_ids = [id_ for id_ in top_ids if id_ in found]
+        return (
+            top_ids,
+            [found[id_][0] for id_ in top_ids],
+            [found[id_][1] for id_ in top_ids],
+            [found[id_][2] for id_ in top_ids]
+        )
+    
+    async def asemantic_search(self, query: str, session_id: str = None, n_results: int = 3, where: dict = None):
+        """Async version of semantic_search, run on a worker thread"""
+        return await asyncio.to_thread(self.semantic_search, query, session_id, n_results, where)
+    
     def get_context_with_sources(self, results):
         """Extract context and source information from search results"""
         # Combine document chunks into a single context
@@ -246,68 +738,324 @@ class RAGDatabase:
 # CONVERSATION MEMORY MANAGEMENT
 # =============================================================================
 
+class _RenderedWindow:
+    __slots__ = ("lines", "last_seq", "text")
+
+    def __init__(self, lines, last_seq: int):
+        self.lines = lines
+        self.last_seq = last_seq
+        self.text = "\n\n".join(lines).strip()
+
 class ConversationManager:
-    def __init__(self):
-        """Initialize conversation manager"""
-        self.conversations = {}
+    def __init__(self, store=None, prompt_window: int = 5, max_rendered_sessions: int = 10000):
+        """
+        Initialize conversation manager.
+        History is kept in a conversation store (in-memory by default). The prompt
+        rendering of the last prompt_window messages is cached per session and
+        updated incrementally as messages are added. Callbacks added with
+        add_eviction_listener are called with the ID of every session the store evicts.
+        """
+        self.store = store or InMemoryConversationStore()
+        self.store.on_evict = self._on_session_evicted
+        self.eviction_listeners = []
+        self.prompt_window = prompt_window
+        # The store never returns more than its own per-session cap
+        self.window_size = min(prompt_window, self.store.max_messages)
+        self.max_rendered_sessions = max_rendered_sessions
+        self.rendered = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def add_eviction_listener(self, callback):
+        """Call callback(session_id) whenever the store evicts a session"""
+        self.eviction_listeners.append(callback)
+    
+    def _on_session_evicted(self, session_id: str):
+        with self.lock:
+            self.rendered.pop(session_id, None)
+        for callback in self.eviction_listeners:
+            callback(session_id)
     
     def create_session(self):
         """Create a new conversation session"""
         session_id = str(uuid.uuid4())
-        self.conversations[session_id] = []
+        self.store.create_session(session_id)
         return session_id
     
+    @staticmethod
+    def _render(role: str, content: str) -> str:
+        role = "Human" if role == "user" else "Assistant"
+        return f"{role}: {content}"
+    
+    def _cache_window(self, session_id: str, window: _RenderedWindow):
+        with self.lock:
+            self.rendered[session_id] = window
+            self.rendered.move_to_end(session_id)
+            while len(self.rendered) > self.max_rendered_sessions:
+                self.rendered.popitem(last=False)
+    
     def add_message(self, session_id: str, role: str, content: str):
         """Add a message to the conversation history"""
-        if session_id not in self.conversations:
-            self.conversations[session_id] = []
-            
-        self.conversations[session_id].append({
-            "role": role,
-            "content": content,
-            "timestamp": datetime.now().isoformat()
-        })
+        message = self.store.append(session_id, role, content)
+        
+        # Extend the rendered window if it was current before this message
+        with self.lock:
+            window = self.rendered.get(session_id)
+        if window and window.last_seq == message.seq - 1:
+            lines = deque(window.lines, maxlen=self.window_size)
+            lines.append(self._render(role, content))
+            self._cache_window(session_id, _RenderedWindow(lines, message.seq))
+        elif window:
+            with self.lock:
+                self.rendered.pop(session_id, None)
     
     def get_conversation_history(self, session_id: str, max_messages: int = None):
         """Get conversation history for a session"""
-        if session_id not in self.conversations:
-            return []
-            
-        history = self.conversations[session_id]
-        if max_messages:
-            history = history[-max_messages:]
-            
-        return history
+        return [message.to_dict() for message in self.store.get_messages(session_id, max_messages)]
     
     def format_history_for_prompt(self, session_id: str, max_messages: int = 5):
         """Format conversation history for inclusion in prompts"""
-        history = self.get_conversation_history(session_id, max_messages)
-        formatted_history = ""
+        if max_messages != self.prompt_window:
+            messages = self.store.get_messages(session_id, max_messages)
+            return "\n\n".join(self._render(msg.role, msg.content) for msg in messages).strip()
         
-        for msg in history:
-            role = "Human" if msg["role"] == "user" else "Assistant"
-            formatted_history += f"{role}: {msg['content']}\n\n"
+        # Serve the cached rendering unless another worker has added messages since
+        last_seq = self.store.last_seq(session_id)
+        with self.lock:
+            window = self.rendered.get(session_id)
+        if window and window.last_seq == last_seq:
+            return window.text
+        
+        messages = self.store.get_messages(session_id, self.window_size)
+        lines = deque((self._render(msg.role, msg.content) for msg in messages), maxlen=self.window_size)
+        window = _RenderedWindow(lines, messages[-1].seq if messages else 0)
+        self._cache_window(session_id, window)
+        return window.text
+    
+    def has_session(self, session_id: str) -> bool:
+        """Check whether a session has any stored history"""
+        return self.store.has_session(session_id)
+    
+    def delete_session(self, session_id: str) -> bool:
+        """Delete a session's history"""
+        with self.lock:
+            self.rendered.pop(session_id, None)
+        return self.store.delete_session(session_id)
+
+# =============================================================================
+# ANSWER CACHE
+# =============================================================================
+
+class AnswerCache:
+    def __init__(self, similarity_threshold: float = 0.95, ttl: float = 3600, max_entries: int = 1000):
+        """
+        Initialize the answer cache.
+        Answers are keyed by collection version, retrieval filter scope and query
+        embedding; a lookup hits when a cached query for the same collection version
+        and scope has cosine similarity of at least similarity_threshold and is
+        younger than ttl seconds.
+        """
+        self.similarity_threshold = similarity_threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # (collection name, scope, entry id) -> (version, unit query embedding, created at, result)
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.next_id = 0
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def _normalize(embedding):
+        embedding = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else embedding
+    
+    def get(self, collection_version, query_embedding, scope: str = None):
+        """Return the cached result for the most similar query, or None"""
+        collection_name, version = collection_version
+        query_embedding = self._normalize(query_embedding)
+        now = time.monotonic()
+        
+        with self.lock:
+            best_key, best_similarity = None, self.similarity_threshold
+            for key, (entry_version, embedding, created_at, _) in list(self.entries.items()):
+                if key[0] != collection_name:
+                    continue
+                if key[1] != scope:
+                    # Stale entries of other scopes are dropped too
+                    if entry_version != version:
+                        del self.entries[key]
+                    continue
+                # Drop entries for older versions of the collection or past their TTL
+                if entry_version != version or now - created_at > self.ttl:
+                    del self.entries[key]
+                    continue
+                similarity = float(np.dot(embedding, query_embedding))
+                if similarity >= best_similarity:
+                    best_key, best_similarity = key, similarity
+            
+            if best_key is None:
+                self.misses += 1
+                return None
             
-        return formatted_history.strip()
+            self.hits += 1
+            self.entries.move_to_end(best_key)
+            return self.entries[best_key][3]
+    
+    def put(self, collection_version, query_embedding, result: dict, scope: str = None):
+        """Cache a result for a query against a collection version and filter scope"""
+        collection_name, version = collection_version
+        with self.lock:
+            self.next_id += 1
+            self.entries[(collection_name, scope, self.next_id)] = (
+                version, self._normalize(query_embedding), time.monotonic(), result
+            )
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+    
+    def invalidate(self, collection_name: str = None):
+        """Drop cached answers for a collection, or all answers"""
+        with self.lock:
+            for key in list(self.entries):
+                if collection_name is None or key[0] == collection_name:
+                    del self.entries[key]
+    
+    def stats(self) -> dict:
+        """Return hit/miss counters and cache size"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self.entries)
+            }
 
 # =============================================================================
 # RAG CHATBOT CLASS
 # =============================================================================
 
+GENERATION_ERROR_PREFIX = "Error generating response"
+
+# Words and openings that make a question depend on the previous turns
+ANAPHORA_PATTERN = re.compile(
+    r"\b(it|its|this|that|these|those|they|them|their|theirs|he|him|his|she|her|hers|"
+    r"former|latter|above|previous|same|such|else)\b"
+    r"|^\s*(and|but|or|so|what about|how about|why|why not|what else|and what|elaborate|explain)\b",
+    re.IGNORECASE
+)
+
 class RAGChatbot:
-    def __init__(self, db: RAGDatabase = None):
-        """Initialize RAG Chatbot with Claude via AWS Bedrock"""
-        self.claude_client = BedrockClaudeClient()
+    def __init__(self, db: RAGDatabase = None, answer_cache: AnswerCache = None,
+                 short_query_words: int = 4, follow_up_similarity: float = 0.5, rewrite_cache_size: int = 32,
+                 rewrite_cache_sessions: int = 10000, conversation_manager: ConversationManager = None,
+                 context_packer: ContextPacker = None, claude_client=None):
+        """
+        Initialize RAG Chatbot with Claude via AWS Bedrock.
+        Follow-up questions are only sent for rewriting when they contain anaphora, or
+        have at most short_query_words words and an embedding similarity of at least
+        follow_up_similarity with the last turns. Up to rewrite_cache_size previous
+        rewrites are kept per session, for the rewrite_cache_sessions most recently
+        used sessions, and dropped when the conversation store evicts the session.
+        With a context_packer, retrieved chunks and history are fitted into its
+        token budget instead of being sent in full.
+        claude_client replaces the Bedrock client (e.g. with StubClaudeClient).
+        """
+        self.claude_client = claude_client or BedrockClaudeClient()
+        self.claude_client.on_usage = record_bedrock_usage
         self.db = db
-        self.conversation_manager = ConversationManager()
+        self.conversation_manager = conversation_manager or ConversationManager()
+        self.answer_cache = answer_cache
+        self.context_packer = context_packer
+        self.short_query_words = short_query_words
+        self.follow_up_similarity = follow_up_similarity
+        self.rewrite_cache_size = rewrite_cache_size
+        self.rewrite_cache_sessions = rewrite_cache_sessions
+        # Session ID -> OrderedDict of rewrites, least recently used session first;
+        # used from the event loop and from worker threads
+        self.rewrite_cache = OrderedDict()
+        self.rewrite_lock = threading.Lock()
+        self.conversation_manager.add_eviction_listener(self.clear_session_cache)
+        self.contextualization_counts = {
+            "no_history": 0,
+            "skipped": 0,
+            "cache_hits": 0,
+            "rewritten": 0
+        }
 
     def load_documents(self, folder_path: str):
         self.db.process_and_add_documents(folder_path)
 
-    def contextualize_query(self, query: str, conversation_history: str):
-        """Convert follow-up questions into standalone queries"""
+    def needs_contextualization(self, query: str, session_id: str) -> bool:
+        """Decide locally whether a follow-up question could change when rewritten"""
+        if ANAPHORA_PATTERN.search(query):
+            return True
+
+        # Longer questions without references to earlier turns are self-contained
+        if len(query.split()) > self.short_query_words:
+            return False
+
+        # Short questions need rewriting only when they continue the recent topic
+        recent_turns = [
+            msg["content"] for msg in self.conversation_manager.get_conversation_history(session_id, 2)
+        ]
+        if not recent_turns:
+            return False
+        embeddings = self.db.embedding_service.embed([query] + recent_turns)
+        query_embedding = AnswerCache._normalize(embeddings[0])
+        return any(
+            float(np.dot(query_embedding, AnswerCache._normalize(embedding))) >= self.follow_up_similarity
+            for embedding in embeddings[1:]
+        )
+
+    def contextualization_stats(self) -> dict:
+        """Return how many queries were rewritten by the LLM or skipped"""
+        counts = dict(self.contextualization_counts)
+        with_history = counts["skipped"] + counts["cache_hits"] + counts["rewritten"]
+        counts["skip_rate"] = (counts["skipped"] + counts["cache_hits"]) / with_history if with_history else 0.0
+        return counts
+
+    def clear_session_cache(self, session_id: str):
+        """Drop cached rewrites for a session"""
+        with self.rewrite_lock:
+            self.rewrite_cache.pop(session_id, None)
+    
+    def _session_rewrites(self, session_id: str) -> OrderedDict:
+        """Get (or create) the rewrites of a session, marking it most recently used; call with rewrite_lock held"""
+        session_rewrites = self.rewrite_cache.get(session_id)
+        if session_rewrites is None:
+            session_rewrites = self.rewrite_cache[session_id] = OrderedDict()
+            while len(self.rewrite_cache) > self.rewrite_cache_sessions:
+                self.rewrite_cache.popitem(last=False)
+        else:
+            self.rewrite_cache.move_to_end(session_id)
+        return session_rewrites
+
+    def _plan_contextualization(self, query: str, conversation_history: str, session_id: str = None):
+        """
+        Run the local checks before contextualization.
+        Returns the final query when no LLM call is needed, otherwise None and the rewrite prompt.
+        """
         if not conversation_history.strip():
-            return query
+            self.contextualization_counts["no_history"] += 1
+            return query, None
+
+        if session_id:
+            if self.db and not self.needs_contextualization(query, session_id):
+                self.contextualization_counts["skipped"] += 1
+                return query, None
+
+            # Reuse a previous rewrite of the same question against the same history
+            cache_key = (query, hash(conversation_history))
+            with self.rewrite_lock:
+                session_rewrites = self.rewrite_cache.get(session_id)
+                rewritten = session_rewrites.get(cache_key) if session_rewrites else None
+                if rewritten is not None:
+                    self.rewrite_cache.move_to_end(session_id)
+                    session_rewrites.move_to_end(cache_key)
+            if rewritten is not None:
+                self.contextualization_counts["cache_hits"] += 1
+                return rewritten, None
 
         prompt = f"""Given a chat history and the latest user question
 which might reference context in the chat history, formulate a standalone
@@ -320,16 +1068,54 @@ Chat history:
 Question:
 {query}
 """
+        return None, prompt
+
+    def _remember_rewrite(self, query: str, conversation_history: str, session_id: str, rewritten: str):
+        self.contextualization_counts["rewritten"] += 1
+        if session_id:
+            with self.rewrite_lock:
+                session_rewrites = self._session_rewrites(session_id)
+                session_rewrites[(query, hash(conversation_history))] = rewritten
+                while len(session_rewrites) > self.rewrite_cache_size:
+                    session_rewrites.popitem(last=False)
+        return rewritten
+
+    def contextualize_query(self, query: str, conversation_history: str, session_id: str = None):
+        """Convert follow-up questions into standalone queries"""
+        contextualized_query, prompt = self._plan_contextualization(query, conversation_history, session_id)
+        if prompt is None:
+            return contextualized_query
 
         try:
-            response = self.claude_client.chat([
-                {"role": "user", "content": prompt},
-            ])
-            return response.strip()
+            with timed_stage(STAGE_SECONDS, "rewrite"):
+                response = self.claude_client.chat([
+                    {"role": "user", "content": prompt},
+                ])
+        except Exception as e:
+            print(f"Error contextualizing query: {str(e)}")
+            return query
+
+        return self._remember_rewrite(query, conversation_history, session_id, response.strip())
+
+    async def acontextualize_query(self, query: str, conversation_history: str, session_id: str = None):
+        """Async version of contextualize_query"""
+        contextualized_query, prompt = await asyncio.to_thread(
+            self._plan_contextualization, query, conversation_history, session_id
+        )
+        if prompt is None:
+            return contextualized_query
+
+        try:
+            with timed_stage(STAGE_SECONDS, "rewrite"):
+                response = await self.claude_client.achat([
+                    {"role": "user", "content": prompt},
+                ])
         except Exception as e:
             print(f"Error contextualizing query: {str(e)}")
             return query
 
+        return self._remember_rewrite(query, conversation_history, session_id, response.strip())
+
     def get_prompt(self, context: str, conversation_history: str, query: str):
         return f"""Based on the following context and conversation history,
 please provide a relevant and contextual response. If the answer cannot
@@ -348,44 +1134,323 @@ Assistant:"""
     def generate_response(self, query: str, context: str, conversation_history: str = ""):
         prompt = self.get_prompt(context, conversation_history, query)
         try:
-            response = self.claude_client.chat([
-                {"role": "user", "content": prompt}
-            ])
+            with timed_stage(STAGE_SECONDS, "generate"):
+                response = self.claude_client.chat([
+                    {"role": "user", "content": prompt}
+                ])
+            return response.strip()
+        except Exception as e:
+            return f"{GENERATION_ERROR_PREFIX}: {str(e)}"
+
+    async def agenerate_response(self, query: str, context: str, conversation_history: str = ""):
+        """Async version of generate_response"""
+        prompt = self.get_prompt(context, conversation_history, query)
+        try:
+            with timed_stage(STAGE_SECONDS, "generate"):
+                response = await self.claude_client.achat([
+                    {"role": "user", "content": prompt}
+                ])
             return response.strip()
         except Exception as e:
-            return f"Error generating response: {str(e)}"
+            return f"{GENERATION_ERROR_PREFIX}: {str(e)}"
 
     def create_session(self):
         return self.conversation_manager.create_session()
 
-    def chat(self, query: str, session_id: str, n_chunks: int = 3, verbose: bool = True):
-        conversation_history = self.conversation_manager.format_history_for_prompt(session_id)
-        contextualized_query = self.contextualize_query(query, conversation_history)
-
+    def _start_chat(self, query: str, session_id: str, conversation_history: str,
+                    contextualized_query: str, verbose: bool, where: dict = None) -> dict:
         if verbose:
             print(f"Original Query: {query}")
             print(f"Contextualized Query: {contextualized_query}")
             print(f"Using session_id: {session_id}")
 
-        # Pass the session_id to semantic_search
-        search_results = self.db.semantic_search(contextualized_query, session_id, n_chunks)
-        context, sources = self.db.get_context_with_sources(search_results)
+        return {
+            "query": query,
+            "session_id": session_id,
+            "conversation_history": conversation_history,
+            "contextualized_query": contextualized_query,
+            "where": where,
+            "cache_scope": json.dumps(where, sort_keys=True) if where else None,
+            "collection_version": None,
+            "query_embedding": None,
+            "cached": None,
+            "context": "",
+            "sources": [],
+            "prompt_tokens": 0
+        }
+
+    def _check_answer_cache(self, state: dict, verbose: bool) -> bool:
+        """Serve semantically equivalent questions against an unchanged collection from the cache"""
+        if not self.answer_cache:
+            return False
+
+        state["collection_version"] = self.db.get_collection_version(state["session_id"])
+        if state["query_embedding"] is None:
+            with timed_stage(STAGE_SECONDS, "embed"):
+                state["query_embedding"] = self.db.embedding_service.embed_query(state["contextualized_query"])
+        with timed_stage(STAGE_SECONDS, "cache_lookup"):
+            state["cached"] = self.answer_cache.get(
+                state["collection_version"], state["query_embedding"], state["cache_scope"]
+            )
+        if not state["cached"]:
+            return False
+
+        if verbose:
+            print("Answer served from cache")
+        state["sources"] = state["cached"]["sources"]
+        return True
+
+    def _set_context(self, state: dict, search_results, verbose: bool):
+        with timed_stage(STAGE_SECONDS, "pack"):
+            self._pack_context(state, search_results)
 
         if verbose:
-            print(f"Context: {context[:200]}...")
-            print(f"Sources: {sources}")
+            print(f"Context: {state['context'][:200]}...")
+            print(f"Sources: {state['sources']}")
+            print(f"Prompt tokens: {state['prompt_tokens']}")
+
+    def _pack_context(self, state: dict, search_results):
+        if self.context_packer:
+            packed = self.context_packer.pack(
+                search_results,
+                state["conversation_history"],
+                self.get_prompt("", "", state["contextualized_query"])
+            )
+            search_results = {"documents": [packed["documents"]], "metadatas": [packed["metadatas"]]}
+            state["conversation_history"] = packed["conversation_history"]
+
+        state["context"], state["sources"] = self.db.get_context_with_sources(search_results)
+        state["prompt_tokens"] = count_tokens(
+            self.get_prompt(state["context"], state["conversation_history"], state["contextualized_query"])
+        )
+
+    def prepare_chat(self, query: str, session_id: str, n_chunks: int = 3, verbose: bool = True,
+                     where: dict = None) -> dict:
+        """
+        Run the steps before generation: contextualize the query, check the answer
+        cache and retrieve context, limited to chunks matching where if given.
+        Returns the state needed to generate and record the response; "cached"
+        holds the cached result on a cache hit.
+        """
+        with timed_stage(STAGE_SECONDS, "history"):
+            conversation_history = self.conversation_manager.format_history_for_prompt(session_id)
+        with timed_stage(STAGE_SECONDS, "contextualize"):
+            contextualized_query = self.contextualize_query(query, conversation_history, session_id)
+        state = self._start_chat(query, session_id, conversation_history, contextualized_query, verbose, where)
+
+        if self._check_answer_cache(state, verbose):
+            return state
+
+        # Pass the session_id to semantic_search
+        with timed_stage(STAGE_SECONDS, "retrieve"):
+            search_results = self.db.semantic_search(contextualized_query, session_id, n_chunks, where)
+        self._set_context(state, search_results, verbose)
+        return state
+
+    async def aprepare_chat(self, query: str, session_id: str, n_chunks: int = 3, verbose: bool = True,
+                            where: dict = None) -> dict:
+        """Async version of prepare_chat; history, cache and store access run on worker threads"""
+        with timed_stage(STAGE_SECONDS, "history"):
+            conversation_history = await asyncio.to_thread(
+                self.conversation_manager.format_history_for_prompt, session_id
+            )
+        with timed_stage(STAGE_SECONDS, "contextualize"):
+            contextualized_query = await self.acontextualize_query(query, conversation_history, session_id)
+        state = self._start_chat(query, session_id, conversation_history, contextualized_query, verbose, where)
+
+        if await asyncio.to_thread(self._check_answer_cache, state, verbose):
+            return state
+
+        with timed_stage(STAGE_SECONDS, "retrieve"):
+            search_results = await self.db.asemantic_search(contextualized_query, session_id, n_chunks, where)
+        await asyncio.to_thread(self._set_context, state, search_results, verbose)
+        return state
 
-        response = self.generate_response(contextualized_query, context, conversation_history)
+    def finish_chat(self, state: dict, response: str) -> dict:
+        """Record the exchange in the conversation history and the answer cache"""
+        self.conversation_manager.add_message(state["session_id"], "user", state["query"])
+        self.conversation_manager.add_message(state["session_id"], "assistant", response)
 
-        self.conversation_manager.add_message(session_id, "user", query)
-        self.conversation_manager.add_message(session_id, "assistant", response)
+        if self.answer_cache and not state["cached"] and not response.startswith(GENERATION_ERROR_PREFIX):
+            self.answer_cache.put(state["collection_version"], state["query_embedding"], {
+                "response": response,
+                "sources": state["sources"]
+            }, state["cache_scope"])
 
         return {
             "response": response,
-            "sources": sources,
-            "contextualized_query": contextualized_query
+            "sources": state["sources"],
+            "contextualized_query": state["contextualized_query"],
+            "cached": bool(state["cached"]),
+            "prompt_tokens": state["prompt_tokens"]
         }
 
+    def chat(self, query: str, session_id: str, n_chunks: int = 3, verbose: bool = True, where: dict = None):
+        state = self.prepare_chat(query, session_id, n_chunks, verbose, where)
+
+        if state["cached"]:
+            response = state["cached"]["response"]
+        else:
+            response = self.generate_response(
+                state["contextualized_query"], state["context"], state["conversation_history"]
+            )
+
+        return self.finish_chat(state, response)
+
+    async def achat(self, query: str, session_id: str, n_chunks: int = 3, verbose: bool = True,
+                    where: dict = None):
+        """Async version of chat that never blocks the event loop"""
+        state = await self.aprepare_chat(query, session_id, n_chunks, verbose, where)
+
+        if state["cached"]:
+            response = state["cached"]["response"]
+        else:
+            response = await self.agenerate_response(
+                state["contextualized_query"], state["context"], state["conversation_history"]
+            )
+
+        # Writes to the conversation store (SQLite may hit the disk)
+        return await asyncio.to_thread(self.finish_chat, state, response)
+
+    async def chat_many(self, items: List[dict], n_chunks: int = 3, concurrency: int = 8) -> dict:
+        """
+        Answer a batch of {"query", "session_id", "where"} items (where is optional).
+        All queries are contextualized against the history as it was before the
+        batch, embedded in one call and retrieved with one grouped query per
+        collection; generations then run concurrently, at most concurrency at a
+        time. Exchanges are recorded in item order. Returns per-item results with
+        their generation time and the time spent in each stage of the batch.
+        """
+        timing = {}
+        started = time.perf_counter()
+
+        def lap(stage, since):
+            now = time.perf_counter()
+            timing[stage] = round(now - since, 4)
+            record_stage(STAGE_SECONDS, f"batch_{stage}", now - since)
+            return now
+
+        def load_histories():
+            session_ids = [item.get("session_id") or self.create_session() for item in items]
+            return session_ids, [
+                self.conversation_manager.format_history_for_prompt(session_id) for session_id in session_ids
+            ]
+
+        # Conversation store and cache access runs on worker threads, like retrieval
+        session_ids, histories = await asyncio.to_thread(load_histories)
+
+        limit = asyncio.Semaphore(concurrency)
+
+        async def contextualize(item, history, session_id):
+            async with limit:
+                return await self.acontextualize_query(item["query"], history, session_id)
+
+        contextualized = await asyncio.gather(*(
+            contextualize(item, history, session_id)
+            for item, history, session_id in zip(items, histories, session_ids)
+        ))
+        states = [
+            self._start_chat(item["query"], session_id, history, query, verbose=False, where=item.get("where"))
+            for item, session_id, history, query in zip(items, session_ids, histories, contextualized)
+        ]
+        stage = lap("contextualize", started)
+
+        # One embedding call serves both the answer cache and retrieval
+        embeddings = await asyncio.to_thread(self.db.embedding_service.embed, contextualized)
+
+        def check_answer_cache():
+            for state, embedding in zip(states, embeddings):
+                state["query_embedding"] = embedding
+                self._check_answer_cache(state, verbose=False)
+
+        await asyncio.to_thread(check_answer_cache)
+        stage = lap("embed", stage)
+
+        pending = [state for state in states if not state["cached"]]
+        if pending:
+            search_results = await asyncio.to_thread(
+                self.db.semantic_search_many,
+                [state["contextualized_query"] for state in pending],
+                [state["session_id"] for state in pending],
+                n_chunks,
+                [state["query_embedding"] for state in pending],
+                [state["where"] for state in pending]
+            )
+
+            def set_contexts():
+                for state, results in zip(pending, search_results):
+                    self._set_context(state, results, verbose=False)
+
+            await asyncio.to_thread(set_contexts)
+        stage = lap("retrieve", stage)
+
+        async def generate(state):
+            if state["cached"]:
+                return state["cached"]["response"], 0.0
+            async with limit:
+                generation_started = time.perf_counter()
+                response = await self.agenerate_response(
+                    state["contextualized_query"], state["context"], state["conversation_history"]
+                )
+                return response, time.perf_counter() - generation_started
+
+        generated = await asyncio.gather(*(generate(state) for state in states))
+        lap("generate", stage)
+
+        def finish():
+            results = []
+            for state, (response, seconds) in zip(states, generated):
+                result = self.finish_chat(state, response)
+                result["session_id"] = state["session_id"]
+                result["error"] = response.startswith(GENERATION_ERROR_PREFIX)
+                result["generation_seconds"] = round(seconds, 4)
+                results.append(result)
+            return results
+
+        results = await asyncio.to_thread(finish)
+        lap("total", started)
+
+        return {"results": results, "timing": timing}
+
+    def chat_stream(self, query: str, session_id: str, n_chunks: int = 3, verbose: bool = False,
+                    where: dict = None):
+        """
+        Streaming version of chat.
+        Yields ("sources", {...}) once context is retrieved, then ("token", text) for
+        each piece of the response as Bedrock produces it, then ("done", result).
+        """
+        state = self.prepare_chat(query, session_id, n_chunks, verbose, where)
+
+        yield "sources", {
+            "session_id": session_id,
+            "sources": state["sources"],
+            "contextualized_query": state["contextualized_query"],
+            "prompt_tokens": state["prompt_tokens"]
+        }
+
+        if state["cached"]:
+            response = state["cached"]["response"]
+            yield "token", response
+        else:
+            prompt = self.get_prompt(state["context"], state["conversation_history"], state["contextualized_query"])
+            parts = []
+            started = time.perf_counter()
+            try:
+                for token in self.claude_client.chat_stream([
+                    {"role": "user", "content": prompt}
+                ]):
+                    if not parts:
+                        FIRST_TOKEN_SECONDS.observe(time.perf_counter() - started)
+                    parts.append(token)
+                    yield "token", token
+                response = "".join(parts).strip()
+                record_stage(STAGE_SECONDS, "generate", time.perf_counter() - started)
+            except Exception as e:
+                response = f"{GENERATION_ERROR_PREFIX}: {str(e)}"
+                yield "error", {"message": response}
+
+        yield "done", {"session_id": session_id, **self.finish_chat(state, response)}
+
     def print_search_results(self, results):
         print("\nSearch Results:\n" + "-" * 50)
         for i in range(len(results['documents'][0])):
@@ -402,14 +1467,22 @@ Assistant:"""
 # DOCUMENT UPLOAD AND PROCESSING
 # =============================================================================
 
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the size limit while it is being spooled"""
+
+
 class DocumentProcessor:
-    def __init__(self, upload_dir: str = "uploads", db: RAGDatabase = None):
+    def __init__(self, upload_dir: str = "uploads", db: RAGDatabase = None,
+                 ingestion_executor: IngestionExecutor = None, registry: DocumentRegistry = None):
         """Initialize document processor"""
         self.upload_dir = upload_dir
         self.db = db
-        self.processing_status = {}
-        # Dictionary to track documents by session
-        self.session_documents = {}
+        self.ingestion_executor = ingestion_executor
+        # Processing status of every document, indexed by session, status and content hash
+        self.registry = registry or DocumentRegistry()
+        # Documents of an expired session collection no longer have chunks
+        if db is not None:
+            db.add_session_deletion_listener(self.clear_session_documents)
         
         # Create upload directory if it doesn't exist
         os.makedirs(upload_dir, exist_ok=True)
@@ -420,109 +1493,219 @@ class DocumentProcessor:
         _, file_extension = os.path.splitext(filename)
         return file_extension.lower() in allowed_extensions
     
-    def save_uploaded_file(self, file: UploadFile) -> str:
-        """Save uploaded file to disk and return the file path"""
-        # Generate a unique filename
-        unique_filename = f"{uuid.uuid4()}_{secure_filename(file.filename)}"
-        file_path = os.path.join(self.upload_dir, unique_filename)
+    def spool_upload(self, file: UploadFile, max_size: int, chunk_size: int = 1024 * 1024):
+        """
+        Stream an upload to disk in one pass, hashing it and enforcing max_size as it
+        is written. Files are stored under their content hash, so identical uploads
+        share one file. Returns (file_path, size, sha256).
+        Raises UploadTooLarge as soon as the upload exceeds max_size.
+        """
+        source = file.file
+        # SpooledTemporaryFile has no readinto before Python 3.11; use its underlying file
+        readinto = getattr(source, "readinto", None) or getattr(source, "_file", source).readinto
+        
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        digest = hashlib.sha256()
+        size = 0
+        temp_path = os.path.join(self.upload_dir, f".{uuid.uuid4()}.part")
+        
+        try:
+            with open(temp_path, "wb") as spooled:
+                while True:
+                    n = readinto(view)
+                    if not n:
+                        break
+                    size += n
+                    if size > max_size:
+                        raise UploadTooLarge(f"Upload exceeds {max_size} bytes")
+                    digest.update(view[:n])
+                    spooled.write(view[:n])
+            
+            sha256 = digest.hexdigest()
+            file_path = self.upload_path(file.filename, sha256)
+            os.replace(temp_path, file_path)
+            return file_path, size, sha256
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    
+    def upload_path(self, filename: str, sha256: str) -> str:
+        """Path an upload is stored at; identical uploads of the same name share it"""
+        return os.path.join(self.upload_dir, f"{sha256[:32]}_{secure_filename(filename)}")
+    
+    def discard_upload(self, document_id: str, file_path: str, sha256: str):
+        """
+        Unregister an upload that could not be queued and delete its file, unless
+        another registered document (in any status, e.g. still queued) is stored in it
+        """
+        self.registry.delete(document_id)
+        if not any(self.upload_path(status["filename"] or "", sha256) == file_path
+                   for status in self.registry.find_all_by_sha256(sha256)):
+            os.remove(file_path)
+    
+    def find_duplicate(self, sha256: str):
+        """Get the ID and status of a processed document with the same content, if any"""
+        status = self.registry.find_by_sha256(sha256)
+        if not status:
+            return None, None
+        return status["document_id"], status
+    
+    def reuse_document(self, document_id: str, duplicate_id: str, session_id: str = None) -> bool:
+        """
+        Complete an upload from an already processed document with the same content,
+        copying its indexed chunks when it was uploaded under another name or session.
+        Returns False if the chunks stored under the earlier document's name are gone
+        or were since replaced by another version, so the upload must be processed.
+        """
+        status = self.registry.get(document_id)
+        duplicate = self.registry.get(duplicate_id)
+        filename = status["filename"]
         
-        # Save the file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        if duplicate["filename"] == filename and duplicate.get("session_id") == session_id:
+            # Chunks record the content hash they were indexed from
+            manifest = self.db.get_document_manifest(filename, session_id)
+            if not manifest or any(metadata.get("sha256") != status["sha256"] for metadata in manifest.values()):
+                return False
+            summary = {"chunks": len(manifest), "added": 0, "removed": 0}
+        else:
+            summary = self.db.copy_document(duplicate["filename"], duplicate.get("session_id"),
+                                            filename, session_id, metadata=self.chunk_metadata(document_id, status),
+                                            sha256=status["sha256"])
+            if summary is None:
+                return False
         
-        return file_path
+        self.registry.set(document_id, {
+            **status,
+            "status": "completed",
+            "message": f"Identical to document {duplicate_id}; reused its {summary['chunks']} indexed chunks",
+            "timestamp": datetime.now().isoformat(),
+            "chunks": summary["chunks"],
+            "chunks_added": summary["added"],
+            "chunks_removed": summary["removed"],
+            "duplicate_of": duplicate_id
+        })
+        return True
+    
+    @staticmethod
+    def chunk_metadata(document_id: str, status: dict) -> dict:
+        """Metadata stored with every chunk of a document, used by retrieval filters and duplicate checks"""
+        return {
+            "document_id": document_id,
+            "uploaded_at": status.get("uploaded_at") or int(time.time()),
+            "sha256": status.get("sha256")
+        }
     
     def process_document(self, file_path: str, document_id: str, session_id: str = None):
         """Process a document and add it to the database"""
+        filename = os.path.basename(file_path)
+        started = time.perf_counter()
         try:
-            # Get the current status to preserve filename
-            current_status = self.processing_status.get(document_id, {})
-            filename = current_status.get("filename", os.path.basename(file_path))
+            # Get the current status to preserve filename, size and content hash
+            current_status = self.registry.get(document_id) or {}
+            filename = current_status.get("filename", filename)
+            upload_info = {
+                key: current_status[key] for key in ("file_size", "sha256", "uploaded_at") if key in current_status
+            }
             
             # Update status to processing
-            self.processing_status[document_id] = {
+            self.registry.set(document_id, {
                 "filename": filename,
                 "status": "processing",
                 "message": "Document is being processed",
                 "timestamp": datetime.now().isoformat(),
-                "session_id": session_id
-            }
+                "session_id": session_id,
+                **upload_info
+            })
+            
+            # Content already indexed under another name or session is copied, not re-embedded
+            duplicate_id, _ = self.find_duplicate(upload_info.get("sha256"))
+            if duplicate_id and self.reuse_document(document_id, duplicate_id, session_id):
+                INGESTED_DOCUMENTS.inc("reused")
+                return
             
-            # Track document by session
-            if session_id:
-                if session_id not in self.session_documents:
-                    self.session_documents[session_id] = []
-                self.session_documents[session_id].append(document_id)
+            def report_progress(chunks_added):
+                self.registry.update(document_id, {"chunks": chunks_added})
             
-            # Process the document
-            ids, texts, metadatas = self.db.process_document(file_path, session_id)
+            metadata = self.chunk_metadata(document_id, upload_info)
             
-            # Add to collection
-            self.db.add_to_collection(ids, texts, metadatas, session_id)
+            # Stream the document into the collection batch by batch, parsed and
+            # embedded by the worker processes when an executor is configured
+            # Chunks are stored under the original filename, so re-uploading a
+            # file only embeds the chunks that changed
+            if self.ingestion_executor:
+                batches = self.ingestion_executor.iter_batches(file_path, session_id, filename)
+                summary = self.db.ingest_batches(batches, session_id, on_batch=report_progress, source=filename,
+                                                 metadata=metadata)
+            else:
+                summary = self.db.ingest_document(file_path, session_id, on_batch=report_progress,
+                                                  source_name=filename, metadata=metadata)
             
             # Update status to completed
-            self.processing_status[document_id] = {
+            self.registry.set(document_id, {
                 "filename": filename,
                 "status": "completed",
-                "message": f"Document processed successfully with {len(texts)} chunks",
+                "message": f"Document processed successfully with {summary['chunks']} chunks "
+                           f"({summary['added']} new, {summary['removed']} removed)",
                 "timestamp": datetime.now().isoformat(),
-                "chunks": len(texts),
-                "session_id": session_id
-            }
+                "chunks": summary["chunks"],
+                "chunks_added": summary["added"],
+                "chunks_removed": summary["removed"],
+                "session_id": session_id,
+                **upload_info
+            })
+            
+            seconds = time.perf_counter() - started
+            INGESTED_DOCUMENTS.inc("completed")
+            INGESTED_CHUNKS.inc(amount=summary["chunks"])
+            INGESTION_SECONDS.observe(seconds)
+            if seconds > 0:
+                INGESTION_CHUNKS_PER_SECOND.observe(summary["chunks"] / seconds)
             
         except Exception as e:
+            INGESTED_DOCUMENTS.inc("failed")
             # Update status to failed
-            self.processing_status[document_id] = {
+            self.registry.set(document_id, {
+                "filename": filename,
                 "status": "failed",
                 "message": f"Error processing document: {str(e)}",
                 "timestamp": datetime.now().isoformat(),
                 "session_id": session_id
-            }
+            })
+    
+    def enqueue_document(self, file_path: str, document_id: str, session_id: str = None):
+        """
+        Queue a document for processing on the ingestion executor.
+        Raises IngestQueueFull when the queue is at capacity.
+        """
+        self.ingestion_executor.submit(self.process_document, file_path, document_id, session_id)
+    
+    def has_capacity(self) -> bool:
+        """Check whether the ingestion queue can accept another document"""
+        stats = self.ingestion_executor.stats()
+        return stats["queued"] + stats["active"] < stats["max_queue"]
     
     def get_document_status(self, document_id: str) -> dict:
         """Get the processing status of a document"""
-        return self.processing_status.get(document_id, {
+        return self.registry.get(document_id) or {
             "status": "not_found",
             "message": "Document ID not found"
-        })
+        }
     
-    def get_all_documents(self, session_id: str = None) -> list:
-        """Get a list of all documents and their processing status, optionally filtered by session"""
-        if session_id:
-            return [
-                {
-                    "document_id": doc_id,
-                    **status
-                }
-                for doc_id, status in self.processing_status.items()
-                if status.get("session_id") == session_id
-            ]
-        else:
-            return [
-                {
-                    "document_id": doc_id,
-                    **status
-                }
-                for doc_id, status in self.processing_status.items()
-            ]
+    def get_all_documents(self, session_id: str = None, status: str = None,
+                          limit: int = 100, cursor: int = 0):
+        """
+        Get a page of documents and their processing status, optionally filtered
+        by session and status. Returns the documents and the next page's cursor.
+        """
+        return self.registry.list(session_id, status, limit, cursor)
     
     def clear_session_documents(self, session_id: str) -> bool:
         """Clear all documents associated with a session"""
-        if not session_id or session_id not in self.session_documents:
+        if not session_id:
             return False
-            
-        # Get document IDs for this session
-        doc_ids = self.session_documents[session_id]
-        
-        # Remove documents from processing status
-        for doc_id in doc_ids:
-            if doc_id in self.processing_status:
-                del self.processing_status[doc_id]
-        
-        # Remove session from tracking
-        del self.session_documents[session_id]
-        
-        return True
+        return self.registry.delete_session(session_id) > 0
 
 # =============================================================================
 # FASTAPI APPLICATION
@@ -545,21 +1728,255 @@ UPLOAD_DIR = os.environ.get("UPLOAD_DIR", "uploads")
 DB_PATH = os.environ.get("DB_PATH", "chroma_db")
 COLLECTION_NAME = os.environ.get("COLLECTION_NAME", "documents_collection")
 MAX_FILE_SIZE = int(os.environ.get("MAX_FILE_SIZE", 10 * 1024 * 1024))  # Default: 10MB
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+INGEST_QUEUE_SIZE = int(os.environ.get("INGEST_QUEUE_SIZE", 16))
+CHUNK_TOKENS = int(os.environ.get("CHUNK_TOKENS", 128))
+CHUNK_OVERLAP_TOKENS = int(os.environ.get("CHUNK_OVERLAP_TOKENS", 24))
+HYBRID_SEARCH = os.environ.get("HYBRID_SEARCH", "true").lower() == "true"
+HYBRID_CANDIDATES = int(os.environ.get("HYBRID_CANDIDATES", 20))  # Results per retriever before fusion
+DOCUMENT_REGISTRY_PATH = os.environ.get("DOCUMENT_REGISTRY_PATH", "documents.db")
+STATUS_MAX_WAIT = float(os.environ.get("STATUS_MAX_WAIT", 30))  # Longest long-poll, in seconds
+STATUS_POLL_INTERVAL = float(os.environ.get("STATUS_POLL_INTERVAL", 0.25))  # Seconds between checks while waiting
+COLLECTION_REGISTRY_PATH = os.environ.get("COLLECTION_REGISTRY_PATH", "collection_registry.db")
+SESSION_HANDLE_CACHE_SIZE = int(os.environ.get("SESSION_HANDLE_CACHE_SIZE", 1000))  # Open session collections
+SESSION_HANDLE_IDLE_TTL = float(os.environ.get("SESSION_HANDLE_IDLE_TTL", 900))  # Seconds before closing a handle
+SESSION_COLLECTION_TTL = float(os.environ.get("SESSION_COLLECTION_TTL", 0))  # Seconds before deleting, 0 = never
+CHROMA_MEMORY_LIMIT_BYTES = int(os.environ.get("CHROMA_MEMORY_LIMIT_BYTES", 1024 * 1024 * 1024))  # 0 = unbounded
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", "embedding_cache.db")
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", 10000))
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", 0.95))
+ANSWER_CACHE_TTL = float(os.environ.get("ANSWER_CACHE_TTL", 3600))  # Seconds
+ANSWER_CACHE_SIZE = int(os.environ.get("ANSWER_CACHE_SIZE", 1000))  # 0 disables the cache
+CHAT_BATCH_MAX_ITEMS = int(os.environ.get("CHAT_BATCH_MAX_ITEMS", 1000))
+CHAT_BATCH_CONCURRENCY = int(os.environ.get("CHAT_BATCH_CONCURRENCY", 8))  # Concurrent LLM calls per batch
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", 3000))  # 0 sends all chunks and history
+CONTEXT_HISTORY_TOKENS = int(os.environ.get("CONTEXT_HISTORY_TOKENS", 1000))
+CONTEXT_MAX_DISTANCE = os.environ.get("CONTEXT_MAX_DISTANCE")  # Unset keeps results at any distance
+CONVERSATION_STORE = os.environ.get("CONVERSATION_STORE", "memory")  # "memory" or "sqlite"
+CONVERSATION_DB_PATH = os.environ.get("CONVERSATION_DB_PATH", "conversations.db")
+CONVERSATION_MAX_MESSAGES = int(os.environ.get("CONVERSATION_MAX_MESSAGES", 50))  # Per session
+CONVERSATION_IDLE_TTL = float(os.environ.get("CONVERSATION_IDLE_TTL", 86400))  # Seconds
+CONVERSATION_MAX_SESSIONS = int(os.environ.get("CONVERSATION_MAX_SESSIONS", 10000))  # In-memory store only
+BEDROCK_STUB = os.environ.get("BEDROCK_STUB", "false").lower() == "true"  # Local stand-in for load tests
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "snapshots")
+SNAPSHOT_RESTORE = os.environ.get("SNAPSHOT_RESTORE")  # Snapshot to restore at startup into empty collections
+WARM_UP_COLLECTIONS = int(os.environ.get("WARM_UP_COLLECTIONS", 10))  # Recent session collections to warm at startup
+TIMING_HEADERS = os.environ.get("TIMING_HEADERS", "false").lower() == "true"  # Server-Timing on responses
+SESSION_STORAGE = os.environ.get("SESSION_STORAGE", "collection")  # "collection" per session, or "shared"
+
+# Ingestion worker processes are started by the warm start
+ingestion_executor = IngestionExecutor(
+    model_name=EMBEDDING_MODEL,
+    max_workers=INGEST_WORKERS,
+    max_queue=INGEST_QUEUE_SIZE,
+    cache_path=EMBEDDING_CACHE_PATH,
+    chunk_tokens=CHUNK_TOKENS,
+    overlap_tokens=CHUNK_OVERLAP_TOKENS
+)
+
+# Shared embedding service used by every collection for documents and queries
+embedding_service = EmbeddingService(
+    model_name=EMBEDDING_MODEL,
+    cache_path=EMBEDDING_CACHE_PATH,
+    cache_size=EMBEDDING_CACHE_SIZE
+)
 
 # Initialize RAG database with collection name from environment variables
-rag_database = RAGDatabase(db_path=DB_PATH, collection_name=COLLECTION_NAME)
+rag_database = RAGDatabase(
+    db_path=DB_PATH,
+    collection_name=COLLECTION_NAME,
+    embedding_model_name=EMBEDDING_MODEL,
+    embedding_service=embedding_service,
+    chunk_tokens=CHUNK_TOKENS,
+    overlap_tokens=CHUNK_OVERLAP_TOKENS,
+    hybrid_search=HYBRID_SEARCH,
+    hybrid_candidates=HYBRID_CANDIDATES,
+    registry_path=COLLECTION_REGISTRY_PATH,
+    max_session_handles=SESSION_HANDLE_CACHE_SIZE,
+    session_handle_idle_ttl=SESSION_HANDLE_IDLE_TTL,
+    session_collection_ttl=SESSION_COLLECTION_TTL,
+    shared_sessions=SESSION_STORAGE == "shared",
+    memory_limit_bytes=CHROMA_MEMORY_LIMIT_BYTES
+)
 
 # Initialize document processor with the shared RAG database
-document_processor = DocumentProcessor(upload_dir=UPLOAD_DIR, db=rag_database)
+document_processor = DocumentProcessor(
+    upload_dir=UPLOAD_DIR,
+    db=rag_database,
+    ingestion_executor=ingestion_executor,
+    registry=DocumentRegistry(DOCUMENT_REGISTRY_PATH)
+)
 
-chatbot = RAGChatbot(db=rag_database)
+# Semantic answer cache in front of the chatbot
+answer_cache = AnswerCache(
+    similarity_threshold=ANSWER_CACHE_THRESHOLD,
+    ttl=ANSWER_CACHE_TTL,
+    max_entries=ANSWER_CACHE_SIZE
+) if ANSWER_CACHE_SIZE > 0 else None
+
+# Conversation history store, shared between workers when backed by SQLite
+if CONVERSATION_STORE == "sqlite":
+    conversation_store = SQLiteConversationStore(
+        path=CONVERSATION_DB_PATH,
+        max_messages=CONVERSATION_MAX_MESSAGES,
+        idle_ttl=CONVERSATION_IDLE_TTL
+    )
+else:
+    conversation_store = InMemoryConversationStore(
+        max_messages=CONVERSATION_MAX_MESSAGES,
+        idle_ttl=CONVERSATION_IDLE_TTL,
+        max_sessions=CONVERSATION_MAX_SESSIONS
+    )
+
+chatbot = RAGChatbot(
+    db=rag_database,
+    answer_cache=answer_cache,
+    conversation_manager=ConversationManager(store=conversation_store),
+    context_packer=ContextPacker(
+        token_budget=CONTEXT_TOKEN_BUDGET,
+        history_budget=CONTEXT_HISTORY_TOKENS,
+        max_distance=float(CONTEXT_MAX_DISTANCE) if CONTEXT_MAX_DISTANCE else None
+    ) if CONTEXT_TOKEN_BUDGET > 0 else None,
+    claude_client=StubClaudeClient() if BEDROCK_STUB else None,
+    rewrite_cache_sessions=CONVERSATION_MAX_SESSIONS
+)
+
+# Values owned by other components are read when /metrics is scraped
+def cache_lookups():
+    lookups = {}
+    if answer_cache:
+        stats = answer_cache.stats()
+        lookups[("answer", "hit")] = stats["hits"]
+        lookups[("answer", "miss")] = stats["misses"]
+    stats = embedding_service.stats()
+    lookups[("embedding", "hit")] = stats["hits"]
+    lookups[("embedding", "miss")] = stats["misses"]
+    stats = chatbot.contextualization_stats()
+    lookups[("rewrite", "hit")] = stats["cache_hits"]
+    lookups[("rewrite", "miss")] = stats["rewritten"]
+    return lookups
+
+def cache_hit_ratios():
+    totals = {}
+    for (cache, result), count in cache_lookups().items():
+        hits, lookups = totals.get(cache, (0, 0))
+        totals[cache] = (hits + (count if result == "hit" else 0), lookups + count)
+    return {(cache,): hits / lookups if lookups else 0.0 for cache, (hits, lookups) in totals.items()}
+
+metrics.counter_callback("cache_lookups_total", "Cache lookups by cache and result", cache_lookups, ["cache", "result"])
+metrics.gauge_callback("cache_hit_ratio", "Share of cache lookups that hit, since start", cache_hit_ratios, ["cache"])
+metrics.gauge_callback(
+    "ingestion_queue_depth", "Documents waiting for or being ingested",
+    lambda: {(state,): ingestion_executor.stats()[state] for state in ("queued", "active")}, ["state"]
+)
+metrics.gauge_callback(
+    "embedding_queue_depth", "Embedding requests waiting for the batcher",
+    lambda: embedding_service.stats()["queue_depth"]
+)
+metrics.gauge_callback(
+    "open_session_collections", "Session collection handles kept open",
+    lambda: rag_database.session_collections.stats()["open_handles"] if rag_database.connected else 0
+)
+HTTP_IN_FLIGHT = {"requests": 0}
+metrics.gauge_callback("http_requests_in_flight", "HTTP requests being handled", lambda: HTTP_IN_FLIGHT["requests"])
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Time every request and, with TIMING_HEADERS, report its stages as Server-Timing"""
+    token = start_request_timing()
+    started = time.perf_counter()
+    HTTP_IN_FLIGHT["requests"] += 1
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        if TIMING_HEADERS:
+            timings = request_timings() + [("total", time.perf_counter() - started)]
+            response.headers["Server-Timing"] = server_timing_header(timings)
+        return response
+    finally:
+        HTTP_IN_FLIGHT["requests"] -= 1
+        # Label by route template so per-document paths do not create a series each
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started, request.method, getattr(route, "path", "unmatched"), str(status)
+        )
+        reset_request_timing(token)
 
 class UploadRequest(BaseModel):
     session_id: Optional[str] = None
 
+# Warm start progress, reported by /ready
+readiness = {
+    "ready": False,
+    "stage": "starting",
+    "started_at": datetime.now().isoformat(),
+    "ready_at": None,
+    "restored_chunks": None,
+    "warmed_collections": 0,
+    "error": None
+}
+
+SNAPSHOT_NAME_PATTERN = re.compile(r"^[\w-][\w.-]*$")
+
+def snapshot_path(name: str) -> str:
+    """Resolve a snapshot name to its directory in SNAPSHOT_DIR"""
+    if not SNAPSHOT_NAME_PATTERN.match(name):
+        raise ValueError("Snapshot names may only contain letters, digits, '.', '-' and '_'")
+    return os.path.join(SNAPSHOT_DIR, name)
+
+def warm_start():
+    """
+    Start the ingestion workers, open the database, restore the startup snapshot,
+    load the embedding model and page in the most recently used indexes, then
+    mark the server ready. Runs in the background so the server accepts
+    connections (and health checks) at once.
+    """
+    started = time.perf_counter()
+    try:
+        # Fork the workers first, before the database client starts threads of its own
+        readiness["stage"] = "starting_workers"
+        ingestion_executor.start()
+        
+        readiness["stage"] = "opening_database"
+        rag_database.connect()
+        
+        if SNAPSHOT_RESTORE:
+            readiness["stage"] = "restoring_snapshot"
+            path = SNAPSHOT_RESTORE if os.path.isabs(SNAPSHOT_RESTORE) else snapshot_path(SNAPSHOT_RESTORE)
+            readiness["restored_chunks"] = rag_database.import_snapshot(path)["chunks"]
+        
+        readiness["stage"] = "loading_model"
+        embedding_service.warm_up()
+        
+        readiness["stage"] = "warming_indexes"
+        readiness["warmed_collections"] = rag_database.warm_up(WARM_UP_COLLECTIONS)
+        
+        readiness["stage"] = "ready"
+        readiness["ready_at"] = datetime.now().isoformat()
+        readiness["ready"] = True
+        record_stage(STAGE_SECONDS, "warm_start", time.perf_counter() - started)
+    except Exception as e:
+        print(f"Error during warm start: {str(e)}")
+        readiness["stage"] = "failed"
+        readiness["error"] = str(e)
+
+@app.on_event("startup")
+def start_warm_start():
+    """Warm the server up in the background"""
+    threading.Thread(target=warm_start, name="warm-start", daemon=True).start()
+
+@app.on_event("shutdown")
+def shutdown_ingestion():
+    """Stop the ingestion worker processes and the collection sweeper"""
+    ingestion_executor.shutdown()
+    if rag_database.connected:
+        rag_database.session_collections.close()
+    document_processor.registry.close()
+
 @app.post("/upload", response_model=dict)
 async def upload_document(
-    background_tasks: BackgroundTasks,
     files: List[UploadFile] = File(...),
     session_id: Optional[str] = Form(None),
     max_file_size: int = MAX_FILE_SIZE
@@ -570,10 +1987,12 @@ async def upload_document(
     - Accepts PDF, DOCX, and TXT files
     - Enforces file size limit (default: 10MB)
     - Returns unique identifiers for each document
-    - Processes documents in the background
+    - Processes documents on the ingestion worker pool
     - Associates documents with a session if session_id is provided
+    - Responds with 429 when the ingestion queue is full
     """
     results = []
+    queue_full = False
     
     for file in files:
         # Generate a unique document ID
@@ -589,44 +2008,74 @@ async def upload_document(
             })
             continue
         
-        # Check file size
-        file.file.seek(0, 2)  # Move to end of file to get size
-        file_size = file.file.tell()
-        file.file.seek(0)  # Reset file position
-        
-        if file_size > max_file_size:
+        # Apply backpressure before spending I/O on a file we cannot queue
+        if not document_processor.has_capacity():
+            queue_full = True
             results.append({
                 "filename": file.filename,
                 "document_id": document_id,
                 "status": "rejected",
-                "message": f"File too large. Maximum size: {max_file_size / (1024 * 1024):.1f} MB"
+                "message": "Ingestion queue is full, please retry later"
             })
             continue
         
         try:
-            # Save the file
-            file_path = document_processor.save_uploaded_file(file)
+            # Stream the file to disk, hashing it and checking its size in the same pass
+            try:
+                file_path, file_size, sha256 = await asyncio.to_thread(
+                    document_processor.spool_upload, file, max_file_size
+                )
+            except UploadTooLarge:
+                results.append({
+                    "filename": file.filename,
+                    "document_id": document_id,
+                    "status": "rejected",
+                    "message": f"File too large. Maximum size: {max_file_size / (1024 * 1024):.1f} MB"
+                })
+                continue
             
             # Extract original filename without UUID prefix
             original_filename = file.filename
             
             # Update initial status
-            document_processor.processing_status[document_id] = {
+            await asyncio.to_thread(document_processor.registry.set, document_id, {
                 "filename": original_filename,
                 "status": "queued",
                 "message": "Document queued for processing",
                 "timestamp": datetime.now().isoformat(),
+                "uploaded_at": int(time.time()),
                 "file_size": file_size,
+                "sha256": sha256,
                 "session_id": session_id
-            }
+            })
             
-            # Process document in background
-            background_tasks.add_task(
-                document_processor.process_document,
-                file_path,
-                document_id,
-                session_id
-            )
+            # A re-upload of a document still indexed under the same name needs no work
+            duplicate_id, duplicate = await asyncio.to_thread(document_processor.find_duplicate, sha256)
+            if duplicate and duplicate["filename"] == original_filename \
+                    and duplicate.get("session_id") == session_id \
+                    and await asyncio.to_thread(document_processor.reuse_document, document_id, duplicate_id, session_id):
+                results.append({
+                    "filename": file.filename,
+                    "document_id": document_id,
+                    "status": "accepted",
+                    "message": f"Document is identical to {duplicate_id} and already indexed",
+                    "session_id": session_id
+                })
+                continue
+            
+            # Queue document on the ingestion workers
+            try:
+                document_processor.enqueue_document(file_path, document_id, session_id)
+            except IngestQueueFull:
+                queue_full = True
+                await asyncio.to_thread(document_processor.discard_upload, document_id, file_path, sha256)
+                results.append({
+                    "filename": file.filename,
+                    "document_id": document_id,
+                    "status": "rejected",
+                    "message": "Ingestion queue is full, please retry later"
+                })
+                continue
             
             results.append({
                 "filename": file.filename,
@@ -644,12 +2093,33 @@ async def upload_document(
                 "message": f"Error processing upload: {str(e)}"
             })
     
+    if queue_full and not any(result["status"] == "accepted" for result in results):
+        raise HTTPException(
+            status_code=429,
+            detail="Ingestion queue is full, please retry later",
+            headers={"Retry-After": "5"}
+        )
+    
     return {"documents": results}
 
 @app.get("/document/{document_id}/status")
-async def get_document_status(document_id: str):
-    """Get the processing status of a document"""
-    status = document_processor.get_document_status(document_id)
+async def get_document_status(document_id: str, since: Optional[int] = None, wait: float = 0):
+    """
+    Get the processing status of a document.
+    
+    - With since set to a previously returned version, waits up to wait seconds
+      (long-poll) for the status to change before responding
+    """
+    registry = document_processor.registry
+    if since is not None and wait > 0:
+        deadline = time.monotonic() + min(wait, STATUS_MAX_WAIT)
+        while time.monotonic() < deadline:
+            version = await asyncio.to_thread(registry.get_version, document_id)
+            if version is None or version > since:
+                break
+            await asyncio.sleep(min(STATUS_POLL_INTERVAL, max(deadline - time.monotonic(), 0)))
+    
+    status = await asyncio.to_thread(document_processor.get_document_status, document_id)
     
     if status.get("status") == "not_found":
         raise HTTPException(status_code=404, detail="Document not found")
@@ -657,13 +2127,44 @@ async def get_document_status(document_id: str):
     return status
 
 @app.get("/documents")
-async def list_documents(session_id: Optional[str] = None):
+async def list_documents(
+    session_id: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: int = Query(0, ge=0)
+):
     """
-    Get a list of all documents and their processing status.
+    Get a page of documents and their processing status.
     
     - If session_id is provided, only returns documents for that session
+    - If status is provided, only returns documents with that status
+    - Pass the returned next_cursor to get the next page (null on the last page)
+    """
+    documents, next_cursor = await asyncio.to_thread(
+        document_processor.get_all_documents, session_id, status, limit, cursor
+    )
+    return {"documents": documents, "next_cursor": next_cursor}
+
+@app.get("/documents/changes")
+async def document_changes(
+    since: int = Query(0, ge=0),
+    session_id: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    wait: float = 0
+):
     """
-    return {"documents": document_processor.get_all_documents(session_id)}
+    Get documents whose status changed after version since, oldest change first.
+    
+    - Waits up to wait seconds (long-poll) when there are no changes yet
+    - Pass the returned version as since on the next call
+    """
+    registry = document_processor.registry
+    deadline = time.monotonic() + min(max(wait, 0), STATUS_MAX_WAIT)
+    while True:
+        changes, version = await asyncio.to_thread(registry.changes, since, session_id, limit)
+        if changes or time.monotonic() >= deadline:
+            return {"changes": changes, "version": version}
+        await asyncio.sleep(min(STATUS_POLL_INTERVAL, max(deadline - time.monotonic(), 0)))
 
 class ClearSessionRequest(BaseModel):
     session_id: str
@@ -682,24 +2183,64 @@ async def clear_session(request: ClearSessionRequest):
         raise HTTPException(status_code=400, detail="Session ID is required")
     
     # Clear documents
-    document_processor.clear_session_documents(session_id)
+    await asyncio.to_thread(document_processor.clear_session_documents, session_id)
     
     # Clear vector data
-    rag_database.clear_session_data(session_id)
+    await asyncio.to_thread(rag_database.clear_session_data, session_id)
+    
+    # Clear cached answers
+    if answer_cache:
+        answer_cache.invalidate(rag_database.get_collection_name(session_id))
     
     # Clear conversation history
     try:
-        if session_id in chatbot.conversation_manager.conversations:
-            del chatbot.conversation_manager.conversations[session_id]
+        await asyncio.to_thread(chatbot.conversation_manager.delete_session, session_id)
+        chatbot.clear_session_cache(session_id)
     except Exception as e:
         print(f"Error clearing conversation history: {str(e)}")
     
     return {"success": True, "message": "Session data cleared successfully"}
 
+class RetrievalFilters(BaseModel):
+    sources: Optional[List[str]] = None
+    document_ids: Optional[List[str]] = None
+    uploaded_after: Optional[datetime] = None
+    uploaded_before: Optional[datetime] = None
+    
+    def to_where(self, registry: DocumentRegistry = None) -> Optional[dict]:
+        """
+        Convert to a ChromaDB where clause.
+        With a registry, document IDs are matched by the documents' file names:
+        chunks left unchanged by a re-upload keep the ID of the upload that indexed them.
+        """
+        sources, document_ids = self.sources, self.document_ids
+        if document_ids and registry is not None:
+            names = {
+                status["filename"] for status in map(registry.get, document_ids) if status and status["filename"]
+            }
+            matched = sorted(names & set(sources or names))
+            if matched:
+                sources, document_ids = matched, None
+        return RAGDatabase.build_filter(
+            sources,
+            document_ids,
+            self.uploaded_after.timestamp() if self.uploaded_after else None,
+            self.uploaded_before.timestamp() if self.uploaded_before else None
+        )
+
+async def filter_where(filters: Optional[RetrievalFilters]) -> Optional[dict]:
+    if not filters:
+        return None
+    if not filters.document_ids:
+        return filters.to_where()
+    # Document IDs are looked up in the registry
+    return await asyncio.to_thread(filters.to_where, document_processor.registry)
+
 class ChatRequest(BaseModel):
     query: str
     session_id: Optional[str] = None
     n_chunks: int = 3
+    filters: Optional[RetrievalFilters] = None
 
 
 @app.post("/chat")
@@ -708,20 +2249,196 @@ async def chat(request: ChatRequest):
     Chat with the RAG chatbot.
     
     - If no session_id is provided, a new session will be created
+    - filters limit retrieval to given sources, document IDs or upload dates
     - Returns the chatbot's response and sources
     """
     # Create a new session if none provided
-    session_id = request.session_id or chatbot.create_session()
-    result = chatbot.chat(request.query, session_id, request.n_chunks)
+    session_id = request.session_id or await asyncio.to_thread(chatbot.create_session)
+    result = await chatbot.achat(request.query, session_id, request.n_chunks, where=await filter_where(request.filters))
     
     
     return {
         "session_id": session_id,
         "response": result["response"],
         "sources": result["sources"],
-        "contextualized_query": result["contextualized_query"]
+        "contextualized_query": result["contextualized_query"],
+        "cached": result["cached"],
+        "prompt_tokens": result["prompt_tokens"]
+    }
+
+class BatchChatItem(BaseModel):
+    query: str
+    session_id: Optional[str] = None
+    filters: Optional[RetrievalFilters] = None
+
+
+class BatchChatRequest(BaseModel):
+    items: List[BatchChatItem]
+    n_chunks: int = 3
+    concurrency: Optional[int] = None
+
+
+@app.post("/chat/batch")
+async def chat_batch(request: BatchChatRequest):
+    """
+    Answer a batch of questions in one request.
+    
+    - Items without a session_id each get a new session
+    - Questions are embedded and retrieved together; answers are generated concurrently
+    - Returns per-item results and the time spent in each stage
+    """
+    if len(request.items) > CHAT_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(request.items)} items (maximum {CHAT_BATCH_MAX_ITEMS})"
+        )
+    
+    concurrency = min(request.concurrency or CHAT_BATCH_CONCURRENCY, CHAT_BATCH_CONCURRENCY)
+    return await chatbot.chat_many(
+        [
+            {"query": item.query, "session_id": item.session_id, "where": await filter_where(item.filters)}
+            for item in request.items
+        ],
+        n_chunks=request.n_chunks,
+        concurrency=concurrency
+    )
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Chat with the RAG chatbot, streaming the response as Server-Sent Events.
+    
+    - If no session_id is provided, a new session will be created
+    - Emits a "sources" event first, then "token" events as the answer is generated
+    - Ends with a "done" event carrying the full response
+    """
+    session_id = request.session_id or await asyncio.to_thread(chatbot.create_session)
+    where = await filter_where(request.filters)
+    
+    def event_stream():
+        for event, data in chatbot.chat_stream(request.query, session_id, request.n_chunks, where=where):
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+class SearchRequest(BaseModel):
+    query: str
+    session_id: Optional[str] = None
+    n_results: int = 5
+    filters: Optional[RetrievalFilters] = None
+
+
+@app.post("/search")
+async def search(request: SearchRequest):
+    """
+    Retrieve the chunks most relevant to a query, without generating an answer.
+    
+    - Searches the session's documents, or the shared documents without a session_id
+    - filters limit results to given sources, document IDs or upload dates
+    """
+    with timed_stage(STAGE_SECONDS, "retrieve"):
+        results = await rag_database.asemantic_search(
+            request.query, request.session_id, request.n_results, await filter_where(request.filters)
+        )
+    return {
+        "results": [
+            {"id": id_, "document": document, "metadata": metadata, "distance": distance}
+            for id_, document, metadata, distance in zip(
+                results["ids"][0], results["documents"][0], results["metadatas"][0], results["distances"][0]
+            )
+        ]
+    }
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Get hit/miss counters for the answer and embedding caches"""
+    # The session collection count is read from SQLite
+    session_collections = await asyncio.to_thread(rag_database.session_collections.stats) \
+        if rag_database.connected else None
+    return {
+        "answer_cache": answer_cache.stats() if answer_cache else None,
+        "embedding_cache": embedding_service.stats(),
+        "contextualization": chatbot.contextualization_stats(),
+        "session_collections": session_collections
     }
 
+@app.get("/health")
+async def health():
+    """Liveness check: the process is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """
+    Readiness check for load balancers.
+    
+    - Returns 200 once the ingestion workers are started, the database is open,
+      the startup snapshot is restored, the embedding model is loaded and recent
+      indexes are warm, and 503 until then
+    - stage reports the warm start step in progress
+    """
+    return JSONResponse(status_code=200 if readiness["ready"] else 503, content=readiness)
+
+class SnapshotRequest(BaseModel):
+    name: str
+    session_ids: Optional[List[str]] = None
+
+class RestoreRequest(BaseModel):
+    name: str
+    merge: bool = False
+
+@app.post("/index/snapshot")
+async def create_snapshot(request: SnapshotRequest):
+    """
+    Export collections and their embeddings to a snapshot in SNAPSHOT_DIR.
+    
+    - Exports the default collection and every session collection, or only the given session_ids
+    - New replicas restore it at startup with SNAPSHOT_RESTORE=<name>, without re-embedding
+    """
+    collection_names = None
+    if request.session_ids is not None:
+        collection_names = list(dict.fromkeys(
+            rag_database.get_storage_name(session_id) for session_id in request.session_ids
+        ))
+    
+    try:
+        path = snapshot_path(request.name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    try:
+        manifest = await asyncio.to_thread(rag_database.export_snapshot, path, collection_names)
+    except Exception as e:
+        print(f"Error exporting snapshot: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error exporting snapshot: {str(e)}")
+    return manifest
+
+@app.post("/index/restore")
+async def restore_snapshot(request: RestoreRequest):
+    """
+    Restore a snapshot from SNAPSHOT_DIR into this server's collections.
+    
+    - Collections that already hold data are skipped unless merge is true
+    """
+    try:
+        path = snapshot_path(request.name)
+        if not os.path.isdir(path):
+            raise HTTPException(status_code=404, detail="Snapshot not found")
+        return await asyncio.to_thread(rag_database.import_snapshot, path, request.merge)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/metrics")
+async def get_metrics():
+    """Expose latency histograms, token counts, throughput, queue depths and cache hit rates for Prometheus"""
+    # Some callbacks read SQLite, so rendering runs off the event loop
+    return PlainTextResponse(await asyncio.to_thread(metrics.render), media_type="text/plain; version=0.0.4")
+
 # =============================================================================
 # SERVER STARTUP
 # =============================================================================
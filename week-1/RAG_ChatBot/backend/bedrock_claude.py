@@ -1,20 +1,54 @@
+import asyncio
 import boto3
 import os
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from botocore.config import Config
 
 class BedrockClaudeClient:
-    def __init__(self):
+    # Concurrency limit per model, shared by every client in the process
+    _model_limits = {}
+    _model_limits_lock = threading.Lock()
+
+    def __init__(self, max_connections: int = None, max_concurrency: int = None):
         self.region = os.getenv("AWS_REGION")
         self.model_id = os.getenv("BEDROCK_MODEL_ID")
-        
+        self.max_connections = max_connections or int(os.getenv("BEDROCK_MAX_CONNECTIONS", 50))
+        self.max_concurrency = max_concurrency or int(os.getenv("BEDROCK_MAX_CONCURRENCY", 16))
+
         self.client = boto3.client(
             "bedrock-runtime",
             region_name=self.region,
             aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
+            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+            config=Config(
+                max_pool_connections=self.max_connections,
+                retries={"max_attempts": 4, "mode": "adaptive"},
+                tcp_keepalive=True
+            )
         )
 
-    def chat(self, messages, temperature=0.6, max_tokens=1024):
+        # Threads for the async methods, one per pooled connection
+        self.executor = ThreadPoolExecutor(max_workers=self.max_connections, thread_name_prefix="bedrock")
+
+        with self._model_limits_lock:
+            if self.model_id not in self._model_limits:
+                self._model_limits[self.model_id] = threading.BoundedSemaphore(self.max_concurrency)
+            self.limit = self._model_limits[self.model_id]
+
+        # Optional callback receiving the usage dict ({"input_tokens", "output_tokens"}) of each response
+        self.on_usage = None
+
+    def _report_usage(self, usage):
+        if self.on_usage and usage:
+            try:
+                self.on_usage(usage)
+            except Exception as e:
+                print(f"Error reporting Bedrock usage: {str(e)}")
+
+    def _build_body(self, messages, temperature, max_tokens):
     # Insert the strict instruction into the first user message as a prefix
         instruction_prefix = (
     "You are a helpful assistant. Prioritize answering using the provided document context. "
@@ -27,25 +61,66 @@ class BedrockClaudeClient:
     # Prepend the instruction to the first user message
         full_messages = messages.copy()
         if full_messages and full_messages[0]["role"] == "user":
-          full_messages[0]["content"] = instruction_prefix + full_messages[0]["content"]
+          full_messages[0] = {**full_messages[0], "content": instruction_prefix + full_messages[0]["content"]}
         else:
          full_messages.insert(0, {
             "role": "user",
             "content": instruction_prefix
         })
 
-        body = {
+        return {
         "anthropic_version": "bedrock-2023-05-31",
         "messages": full_messages,
         "max_tokens": max_tokens,
         "temperature": temperature
     }
 
-        response = self.client.invoke_model(
-        modelId=self.model_id,
-        body=json.dumps(body),
-        contentType="application/json"
-    )
+    def chat(self, messages, temperature=0.6, max_tokens=1024):
+        body = self._build_body(messages, temperature, max_tokens)
+
+        # Wait for a free slot so one model cannot exhaust the connection pool
+        with self.limit:
+            response = self.client.invoke_model(
+                modelId=self.model_id,
+                body=json.dumps(body),
+                contentType="application/json"
+            )
+            response_body = json.loads(response["body"].read())
 
-        response_body = json.loads(response["body"].read())
+        self._report_usage(response_body.get("usage"))
         return response_body["content"][0]["text"]
+
+    async def achat(self, messages, temperature=0.6, max_tokens=1024):
+        """Async version of chat that runs the blocking call on the client's thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, partial(self.chat, messages, temperature=temperature, max_tokens=max_tokens)
+        )
+
+    def chat_stream(self, messages, temperature=0.6, max_tokens=1024):
+        """Yield the response text piece by piece as Bedrock generates it"""
+        body = self._build_body(messages, temperature, max_tokens)
+
+        with self.limit:
+            response = self.client.invoke_model_with_response_stream(
+                modelId=self.model_id,
+                body=json.dumps(body),
+                contentType="application/json"
+            )
+
+            for event in response["body"]:
+                chunk = event.get("chunk")
+                if not chunk:
+                    # Any other event is a stream error such as throttling or a model timeout
+                    raise RuntimeError(f"Bedrock stream error: {event}")
+                payload = json.loads(chunk["bytes"])
+                # Input tokens arrive with message_start, output tokens with message_delta
+                if payload.get("type") == "message_start":
+                    usage = payload.get("message", {}).get("usage", {})
+                    self._report_usage({"input_tokens": usage.get("input_tokens")})
+                elif payload.get("type") == "message_delta":
+                    self._report_usage({"output_tokens": payload.get("usage", {}).get("output_tokens")})
+                if payload.get("type") == "content_block_delta":
+                    text = payload.get("delta", {}).get("text")
+                    if text:
+                        yield text
@@ -0,0 +1,88 @@
+import asyncio
+import hashlib
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+WORDS = (
+    "the policy covers annual leave requests which need manager approval before the "
+    "schedule is final and employees should review the document for details on benefits"
+).split()
+
+
+class StubClaudeClient:
+    """
+    Deterministic local stand-in for BedrockClaudeClient, for load tests and benchmarks.
+    Each response waits latency seconds before its first token, then produces
+    output_tokens tokens at tokens_per_second. Text, token counts and jitter are
+    derived from the prompt, so the same prompt always gets the same response.
+    Like the real client, calls run on a thread pool and at most max_concurrency
+    are in flight at once.
+    """
+
+    def __init__(self, latency: float = None, tokens_per_second: float = None, output_tokens: int = None,
+                 jitter: float = None, max_connections: int = None, max_concurrency: int = None):
+        self.latency = latency if latency is not None else float(os.getenv("BEDROCK_STUB_LATENCY", 0.3))
+        self.tokens_per_second = tokens_per_second or float(os.getenv("BEDROCK_STUB_TOKENS_PER_SECOND", 100))
+        self.output_tokens = output_tokens or int(os.getenv("BEDROCK_STUB_OUTPUT_TOKENS", 150))
+        # Latency varies by up to this fraction either way
+        self.jitter = jitter if jitter is not None else float(os.getenv("BEDROCK_STUB_JITTER", 0.1))
+        self.max_connections = max_connections or int(os.getenv("BEDROCK_MAX_CONNECTIONS", 50))
+        self.max_concurrency = max_concurrency or int(os.getenv("BEDROCK_MAX_CONCURRENCY", 16))
+        self.model_id = "stub"
+
+        self.executor = ThreadPoolExecutor(max_workers=self.max_connections, thread_name_prefix="bedrock-stub")
+        self.limit = threading.BoundedSemaphore(self.max_concurrency)
+        self.on_usage = None
+        self.calls = 0
+
+    def _plan(self, messages):
+        """Derive the response tokens, first-token delay and per-token delay from the prompt"""
+        prompt = "".join(message["content"] for message in messages)
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+
+        # Contextualization requests get the question back, like a no-op rewrite
+        if "standalone" in prompt and "Question:\n" in prompt:
+            tokens = prompt.rsplit("Question:\n", 1)[1].strip().split(" ")
+        else:
+            tokens = [rng.choice(WORDS) for _ in range(self.output_tokens)]
+
+        latency = self.latency * (1 + rng.uniform(-self.jitter, self.jitter))
+        input_tokens = max(len(prompt) // 4, 1)
+        return tokens, max(latency, 0.0), 1.0 / self.tokens_per_second, input_tokens
+
+    def _report_usage(self, input_tokens: int, output_tokens: int):
+        if self.on_usage:
+            self.on_usage({"input_tokens": input_tokens, "output_tokens": output_tokens})
+
+    def chat(self, messages, temperature=0.6, max_tokens=1024):
+        tokens, latency, token_delay, input_tokens = self._plan(messages)
+        tokens = tokens[:max_tokens]
+        with self.limit:
+            self.calls += 1
+            time.sleep(latency + token_delay * len(tokens))
+        self._report_usage(input_tokens, len(tokens))
+        return " ".join(tokens)
+
+    async def achat(self, messages, temperature=0.6, max_tokens=1024):
+        """Async version of chat that runs the blocking call on the client's thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, partial(self.chat, messages, temperature=temperature, max_tokens=max_tokens)
+        )
+
+    def chat_stream(self, messages, temperature=0.6, max_tokens=1024):
+        """Yield the response text piece by piece at the configured token rate"""
+        tokens, latency, token_delay, input_tokens = self._plan(messages)
+        tokens = tokens[:max_tokens]
+        with self.limit:
+            self.calls += 1
+            self._report_usage(input_tokens, 0)
+            time.sleep(latency)
+            for i, token in enumerate(tokens):
+                time.sleep(token_delay)
+                yield token if i == 0 else " " + token
+        self._report_usage(0, len(tokens))
@@ -0,0 +1,106 @@
+"""
+Micro-benchmark for the document chunkers.
+Compares the legacy character-based split_text with the token-based
+chunk_text on a synthetic document (or the given files), also fed in 64 KB
+pieces as ingestion streams files, and reports throughput and how many
+source sentences end up cut across chunks.
+
+Usage: python benchmark_chunking.py [--size-mb 5] [--repeat 3] [files ...]
+"""
+
+import argparse
+import random
+import time
+
+from document_loader import chunk_text, iter_chunks, iter_document, split_text
+
+WORDS = (
+    "policy employee leave annual request manager approval team project report "
+    "benefit payroll office remote schedule training review budget quarter client "
+    "process document system access security update meeting deadline"
+).split()
+
+
+def synthetic_document(size_bytes: int, seed: int = 0):
+    """Build a document of headings and paragraphs; returns (text, sentences)"""
+    rng = random.Random(seed)
+    parts = []
+    sentences = []
+    size = 0
+    section = 0
+    while size < size_bytes:
+        section += 1
+        heading = f"# Section {section}\n"
+        parts.append(heading)
+        size += len(heading)
+        for _ in range(rng.randint(2, 5)):
+            paragraph = []
+            for _ in range(rng.randint(3, 8)):
+                words = [rng.choice(WORDS) for _ in range(rng.randint(6, 24))]
+                if rng.random() < 0.1:
+                    words.insert(rng.randint(1, len(words) - 1), "e.g.")
+                sentence = " ".join(words).capitalize() + rng.choice(".....?!")
+                paragraph.append(sentence)
+                sentences.append(sentence)
+            text = " ".join(paragraph) + "\n\n"
+            parts.append(text)
+            size += len(text)
+    return "".join(parts), sentences
+
+
+def read_document(file_path: str) -> str:
+    """Read a whole document as the text stream ingestion chunks"""
+    return "".join(iter_document(file_path))
+
+
+def streamed(text: str, piece_size: int = 64 * 1024):
+    """Split text into the fixed-size pieces iter_text_file yields"""
+    return [text[start:start + piece_size] for start in range(0, len(text), piece_size)]
+
+
+def cut_sentences(chunks, sentences, sample: int = 200, seed: int = 0):
+    """Fraction of a sample of source sentences not contained whole in any chunk"""
+    joined = "\n".join(chunks)
+    sample = random.Random(seed).sample(sentences, min(sample, len(sentences)))
+    return sum(1 for sentence in sample if sentence not in joined) / len(sample)
+
+
+def run(name: str, chunker, text: str, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = chunker(text)
+        best = min(best, time.perf_counter() - start)
+    mb = len(text.encode("utf-8")) / 1e6
+    print(f"{name:<12} {best * 1000:9.1f} ms  {mb / best:7.1f} MB/s  {len(chunks):7d} chunks")
+    return chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="Documents to chunk instead of a synthetic one")
+    parser.add_argument("--size-mb", type=float, default=5.0, help="Size of the synthetic document")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per chunker; the best is reported")
+    parser.add_argument("--chunk-tokens", type=int, default=128)
+    parser.add_argument("--overlap-tokens", type=int, default=24)
+    args = parser.parse_args()
+
+    if args.files:
+        documents = [(path, read_document(path), None) for path in args.files]
+    else:
+        text, sentences = synthetic_document(int(args.size_mb * 1e6))
+        documents = [(f"synthetic {args.size_mb:g} MB", text, sentences)]
+
+    for name, text, sentences in documents:
+        print(f"\n{name}: {len(text):,} characters")
+        legacy = run("split_text", split_text, text, args.repeat)
+        current = run("chunk_text", lambda t: chunk_text(t, args.chunk_tokens, args.overlap_tokens), text, args.repeat)
+        run("streamed", lambda t: list(iter_chunks(streamed(t), args.chunk_tokens, args.overlap_tokens)),
+            text, args.repeat)
+        if sentences:
+            print(f"sentences cut across chunks: split_text {cut_sentences(legacy, sentences):.1%}, "
+                  f"chunk_text {cut_sentences(current, sentences):.1%}")
+
+
+if __name__ == "__main__":
+    main()
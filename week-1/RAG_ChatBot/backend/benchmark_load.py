@@ -0,0 +1,263 @@
+"""
+Offline load test for the RAG backend.
+Runs the FastAPI app in-process against a scratch directory, with Bedrock
+replaced by the deterministic StubClaudeClient, so results are repeatable and
+free. For each synthetic corpus size it uploads the corpus and measures
+ingestion throughput, then runs /chat at each concurrency level and reports
+p50/p95/p99 latency, requests per second and peak RSS.
+
+Requests are sent through httpx's ASGI transport, so client and server share
+one event loop and no network is involved; compare runs with each other
+rather than with production numbers.
+
+Usage: python benchmark_load.py [--docs 10,50] [--doc-kb 20] [--concurrency 1,8,32] [--requests 200]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import glob
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmark_chunking import WORDS, synthetic_document
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def percentile(values, q: float) -> float:
+    """Nearest-rank percentile of values (q in 0-100)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process, in MB"""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def workers_peak_rss_mb() -> float:
+    """Sum of the peak resident set sizes of live child processes (ingestion workers), Linux only"""
+    total = 0.0
+    for path in glob.glob("/proc/self/task/*/children"):
+        try:
+            with open(path) as file:
+                pids = file.read().split()
+        except OSError:
+            continue
+        for pid in pids:
+            try:
+                with open(f"/proc/{pid}/status") as file:
+                    for line in file:
+                        if line.startswith("VmHWM:"):
+                            total += int(line.split()[1]) / 1024
+            except OSError:
+                continue
+    return total
+
+
+async def ingest_corpus(client, n_docs: int, doc_bytes: int, session_id: str, concurrency: int, seed: int) -> dict:
+    """Upload n_docs synthetic documents and wait until all are processed"""
+    documents = [synthetic_document(doc_bytes, seed=seed + i)[0].encode("utf-8") for i in range(n_docs)]
+    limit = asyncio.Semaphore(concurrency)
+
+    async def upload(i, content):
+        async with limit:
+            while True:
+                response = await client.post(
+                    "/upload",
+                    files=[("files", (f"doc_{seed + i}.txt", content, "text/plain"))],
+                    data={"session_id": session_id}
+                )
+                # Back off while the ingestion queue is full
+                if response.status_code == 429:
+                    await asyncio.sleep(0.05)
+                    continue
+                return response.json()["documents"][0]["document_id"]
+
+    started = time.perf_counter()
+    pending = set(await asyncio.gather(*(upload(i, content) for i, content in enumerate(documents))))
+
+    # Follow the status change feed until every upload has finished
+    chunks = 0
+    failed = 0
+    since = 0
+    while pending:
+        response = await client.get(
+            "/documents/changes", params={"since": since, "session_id": session_id, "wait": 5, "limit": 1000}
+        )
+        feed = response.json()
+        since = feed["version"]
+        for change in feed["changes"]:
+            if change["document_id"] in pending and change["status"] in ("completed", "failed"):
+                pending.discard(change["document_id"])
+                chunks += change.get("chunks", 0)
+                failed += change["status"] == "failed"
+    seconds = time.perf_counter() - started
+
+    total_mb = sum(len(content) for content in documents) / (1024 * 1024)
+    return {
+        "documents": n_docs,
+        "corpus_mb": round(total_mb, 2),
+        "failed": failed,
+        "chunks": chunks,
+        "seconds": round(seconds, 3),
+        "documents_per_second": round(n_docs / seconds, 2),
+        "chunks_per_second": round(chunks / seconds, 1),
+        "mb_per_second": round(total_mb / seconds, 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "workers_peak_rss_mb": round(workers_peak_rss_mb(), 1)
+    }
+
+
+async def load_chat(client, session_id: str, concurrency: int, n_requests: int, seed: int) -> dict:
+    """Send n_requests /chat requests from concurrency closed-loop clients"""
+    rng = random.Random(seed)
+    queries = [
+        f"What does the {rng.choice(WORDS)} {rng.choice(WORDS)} say about {rng.choice(WORDS)}?"
+        for _ in range(n_requests)
+    ]
+    queue = asyncio.Queue()
+    for query in queries:
+        queue.put_nowait(query)
+
+    latencies = []
+    errors = 0
+    cached = 0
+
+    async def worker():
+        nonlocal errors, cached
+        while not queue.empty():
+            query = queue.get_nowait()
+            request_started = time.perf_counter()
+            response = await client.post("/chat", json={"query": query, "session_id": session_id})
+            latencies.append(time.perf_counter() - request_started)
+            if response.status_code != 200:
+                errors += 1
+            elif response.json().get("cached"):
+                cached += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    seconds = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": n_requests,
+        "errors": errors,
+        "cached": cached,
+        "rps": round(n_requests / seconds, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1)
+    }
+
+
+async def run(args) -> dict:
+    import httpx
+    import app as server
+
+    results = {"ingestion": [], "chat": []}
+    # Every corpus gets new documents, so none are deduplicated against an earlier one
+    seed = args.seed
+    transport = httpx.ASGITransport(app=server.app)
+    timeout = httpx.Timeout(600)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=timeout) as client:
+            for n_docs in args.docs:
+                session_id = f"benchmark_{n_docs}"
+                ingestion = await ingest_corpus(
+                    client, n_docs, args.doc_kb * 1024, session_id, args.upload_concurrency, seed
+                )
+                seed += n_docs
+                results["ingestion"].append(ingestion)
+                report(f"ingest {n_docs:>5} docs {ingestion['corpus_mb']:>8.2f} MB  "
+                      f"{ingestion['documents_per_second']:>8.2f} docs/s  {ingestion['chunks_per_second']:>9.1f} chunks/s  "
+                      f"{ingestion['mb_per_second']:>7.3f} MB/s  rss {ingestion['peak_rss_mb']:.0f} MB "
+                      f"(+{ingestion['workers_peak_rss_mb']:.0f} MB workers)  failed {ingestion['failed']}")
+
+                for concurrency in args.concurrency:
+                    chat = await load_chat(client, session_id, concurrency, args.requests, args.seed + concurrency)
+                    chat["documents"] = n_docs
+                    results["chat"].append(chat)
+                    report(f"chat   {n_docs:>5} docs  c={concurrency:<4} {chat['rps']:>8.2f} req/s  "
+                          f"p50 {chat['p50_ms']:>8.1f} ms  p95 {chat['p95_ms']:>8.1f} ms  p99 {chat['p99_ms']:>8.1f} ms  "
+                          f"errors {chat['errors']}  cached {chat['cached']}  rss {chat['peak_rss_mb']:.0f} MB")
+    finally:
+        server.shutdown_ingestion()
+
+    return results
+
+
+def report(line: str):
+    """Print a result line even while the server's own output is silenced"""
+    print(line, file=sys.__stdout__, flush=True)
+
+
+def parse_list(value: str):
+    return [int(item) for item in value.split(",") if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=parse_list, default=[10, 50], help="Corpus sizes in documents")
+    parser.add_argument("--doc-kb", type=int, default=20, help="Size of each synthetic document in KB")
+    parser.add_argument("--concurrency", type=parse_list, default=[1, 8, 32], help="Concurrent /chat clients")
+    parser.add_argument("--requests", type=int, default=200, help="/chat requests per concurrency level")
+    parser.add_argument("--upload-concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.3, help="Stub seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=100, help="Stub output token rate")
+    parser.add_argument("--output-tokens", type=int, default=150, help="Stub tokens per response")
+    parser.add_argument("--workers", type=int, default=None, help="Ingestion worker processes (INGEST_WORKERS)")
+    parser.add_argument("--workdir", default=None, help="Directory for databases and uploads (default: temporary)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", default=None, help="Write results to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show the server's own output")
+    args = parser.parse_args()
+
+    json_path = os.path.abspath(args.json_path) if args.json_path else None
+
+    # The app reads its configuration and creates its databases on import,
+    # relative to the working directory
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(args.workdir or tempfile.mkdtemp(prefix="rag_benchmark_"))
+    os.environ.update({
+        "BEDROCK_STUB": "true",
+        "BEDROCK_STUB_LATENCY": str(args.latency),
+        "BEDROCK_STUB_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "BEDROCK_STUB_OUTPUT_TOKENS": str(args.output_tokens),
+        "AWS_REGION": os.environ.get("AWS_REGION", "us-east-1")
+    })
+    if args.workers is not None:
+        os.environ["INGEST_WORKERS"] = str(args.workers)
+    print(f"Working directory: {os.getcwd()}")
+
+    if args.verbose:
+        results = asyncio.run(run(args))
+    else:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            results = asyncio.run(run(args))
+
+    if json_path:
+        with open(json_path, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
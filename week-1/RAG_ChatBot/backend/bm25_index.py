@@ -0,0 +1,103 @@
+"""
+In-process BM25 keyword index.
+Kept alongside a vector collection so exact terms such as policy names, codes
+and numbers can be matched, and fused with dense results by reciprocal rank.
+"""
+
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+from typing import Collection, Dict, Iterable, List, Optional, Tuple
+
+# Words and numbers, plus compound codes such as "HR-101" or "v2.3" kept whole
+TERM_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase text into index terms; compound codes also yield their parts"""
+    terms = []
+    for term in TERM_PATTERN.findall(text.lower()):
+        terms.append(term)
+        if not term.isalnum():
+            terms.extend(re.split(r"[-_./]", term))
+    return terms
+
+
+class BM25Index:
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """Initialize an empty index with the usual BM25 parameters"""
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_terms: Dict[str, Counter] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.total_length = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.doc_terms)
+
+    def add(self, ids: Iterable[str], texts: Iterable[str]):
+        """Index documents, replacing any already indexed under the same ID"""
+        with self.lock:
+            for id_, text in zip(ids, texts):
+                if id_ in self.doc_terms:
+                    self._remove(id_)
+                terms = Counter(tokenize(text))
+                self.doc_terms[id_] = terms
+                self.doc_lengths[id_] = sum(terms.values())
+                self.total_length += self.doc_lengths[id_]
+                for term, tf in terms.items():
+                    self.postings.setdefault(term, {})[id_] = tf
+
+    def remove(self, ids: Iterable[str]):
+        """Remove documents from the index"""
+        with self.lock:
+            for id_ in ids:
+                self._remove(id_)
+
+    def _remove(self, id_: str):
+        terms = self.doc_terms.pop(id_, None)
+        if terms is None:
+            return
+        self.total_length -= self.doc_lengths.pop(id_)
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(id_, None)
+                if not posting:
+                    del self.postings[term]
+
+    def search(self, query: str, n_results: int = 10,
+               allowed_ids: Optional[Collection[str]] = None) -> List[Tuple[str, float]]:
+        """Return up to n_results (id, score) pairs, best first, only scoring allowed_ids if given"""
+        with self.lock:
+            n_docs = len(self.doc_terms)
+            if not n_docs:
+                return []
+            avg_length = self.total_length / n_docs
+
+            scores = {}
+            for term in set(tokenize(query)):
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                for id_, tf in posting.items():
+                    if allowed_ids is not None and id_ not in allowed_ids:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[id_] / avg_length)
+                    scores[id_] = scores.get(id_, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(n_results, scores.items(), key=lambda item: item[1])
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked ID lists; each ID scores the sum of 1 / (k + rank) over the lists"""
+    scores = {}
+    for ranking in rankings:
+        for rank, id_ in enumerate(ranking, start=1):
+            scores[id_] = scores.get(id_, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
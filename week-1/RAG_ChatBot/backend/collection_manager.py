@@ -0,0 +1,244 @@
+"""
+Lifecycle management for per-session ChromaDB collections.
+Keeps a bounded LRU cache of open collection handles, records when each
+collection was last used in a small SQLite registry (so existence checks
+never list every collection), and deletes collections idle beyond a TTL.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+
+class _Handle:
+    __slots__ = ("collection", "last_access", "persisted_access")
+
+    def __init__(self, collection, now: float):
+        self.collection = collection
+        self.last_access = now
+        self.persisted_access = now
+
+
+class SessionCollectionManager:
+    def __init__(self, client, embedding_function, registry_path: str = "collection_registry.db",
+                 max_handles: int = 1000, handle_idle_ttl: float = 900, collection_ttl: float = 0,
+                 sweep_interval: float = 300, touch_interval: float = 60, prefix: str = "session_",
+                 on_evict: Optional[Callable[[str], None]] = None,
+                 on_delete: Optional[Callable[[str], None]] = None):
+        """
+        Initialize the collection manager.
+        At most max_handles collection handles stay open; handles unused for
+        handle_idle_ttl seconds are closed (the data stays on disk). Collections
+        whose name starts with prefix and that are unused for collection_ttl seconds
+        are deleted (0 keeps them forever). Last access times are written to the
+        registry at most every touch_interval seconds per collection. on_evict(name)
+        and on_delete(name) let callers drop state kept per collection.
+        """
+        self.client = client
+        self.embedding_function = embedding_function
+        self.max_handles = max_handles
+        self.handle_idle_ttl = handle_idle_ttl
+        self.collection_ttl = collection_ttl
+        self.sweep_interval = sweep_interval
+        self.touch_interval = touch_interval
+        self.prefix = prefix
+        self.on_evict = on_evict
+        self.on_delete = on_delete
+
+        self.handles = OrderedDict()
+        self.lock = threading.RLock()
+
+        self.registry = sqlite3.connect(registry_path, timeout=30, check_same_thread=False)
+        self.registry.execute("PRAGMA journal_mode=WAL")
+        self.registry.executescript("""
+            CREATE TABLE IF NOT EXISTS collections (
+                name TEXT PRIMARY KEY,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_collections_last_access ON collections (last_access);
+        """)
+        self.registry.commit()
+        self._seed_registry()
+
+        self._stop = threading.Event()
+        self._sweeper = None
+        if sweep_interval > 0 and (handle_idle_ttl > 0 or collection_ttl > 0):
+            self._sweeper = threading.Thread(target=self._run_sweeper, name="collection-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def _seed_registry(self):
+        """Register collections created before the registry existed (one listing, on first start only)"""
+        with self.lock:
+            if self.registry.execute("SELECT 1 FROM collections LIMIT 1").fetchone():
+                return
+            now = time.time()
+            names = [collection.name for collection in self.client.list_collections()]
+            self.registry.executemany(
+                "INSERT OR IGNORE INTO collections (name, last_access) VALUES (?, ?)",
+                [(name, now) for name in names if name.startswith(self.prefix)]
+            )
+            self.registry.commit()
+
+    # -------------------------------------------------------------------------
+    # Public API
+    # -------------------------------------------------------------------------
+
+    def get(self, name: str):
+        """Get a collection handle, creating the collection if needed"""
+        now = time.time()
+        with self.lock:
+            handle = self.handles.get(name)
+            if handle is not None:
+                handle.last_access = now
+                self.handles.move_to_end(name)
+                if now - handle.persisted_access >= self.touch_interval:
+                    self._persist_access(name, now)
+                    handle.persisted_access = now
+                return handle.collection
+
+        collection = self.client.get_or_create_collection(
+            name=name,
+            embedding_function=self.embedding_function
+        )
+
+        with self.lock:
+            handle = self.handles.get(name)
+            if handle is None:
+                handle = self.handles[name] = _Handle(collection, now)
+                self._persist_access(name, now)
+            self.handles.move_to_end(name)
+            evicted = self._evict_lru()
+
+        for evicted_name in evicted:
+            self._notify(self.on_evict, evicted_name)
+        return handle.collection
+
+    def exists(self, name: str) -> bool:
+        """Check whether a collection exists without listing all collections"""
+        with self.lock:
+            if name in self.handles:
+                return True
+            row = self.registry.execute("SELECT 1 FROM collections WHERE name = ?", (name,)).fetchone()
+        return row is not None
+
+    def delete(self, name: str) -> bool:
+        """Delete a collection and its registry entry; returns False if it did not exist"""
+        with self.lock:
+            self.handles.pop(name, None)
+            existed = self.exists(name)
+            self.registry.execute("DELETE FROM collections WHERE name = ?", (name,))
+            self.registry.commit()
+
+        if existed:
+            try:
+                self.client.delete_collection(name)
+            except Exception as e:
+                # Already deleted, e.g. by another worker process
+                print(f"Error deleting collection {name}: {str(e)}")
+        self._notify(self.on_delete, name)
+        return existed
+
+    def evict(self, name: str):
+        """Close a collection handle, keeping its data on disk"""
+        with self.lock:
+            handle = self.handles.pop(name, None)
+            if handle is not None:
+                self._persist_access(name, handle.last_access)
+        if handle is not None:
+            self._notify(self.on_evict, name)
+
+    def sweep(self) -> dict:
+        """Close idle handles and delete expired collections; returns how many of each"""
+        now = time.time()
+        idle = []
+        if self.handle_idle_ttl > 0:
+            with self.lock:
+                idle = [
+                    name for name, handle in self.handles.items()
+                    if now - handle.last_access >= self.handle_idle_ttl
+                ]
+            for name in idle:
+                self.evict(name)
+
+        expired = []
+        if self.collection_ttl > 0:
+            with self.lock:
+                # Flush in-memory access times first so active collections are not expired
+                self._flush_access()
+                expired = [
+                    row[0] for row in self.registry.execute(
+                        "SELECT name FROM collections WHERE last_access < ?", (now - self.collection_ttl,)
+                    )
+                ]
+            for name in expired:
+                self.delete(name)
+
+        return {"evicted": len(idle), "deleted": len(expired)}
+
+    def recent(self, limit: int = None) -> list:
+        """Names of registered collections, most recently used first"""
+        with self.lock:
+            self._flush_access()
+            return [
+                row[0] for row in self.registry.execute(
+                    "SELECT name FROM collections ORDER BY last_access DESC LIMIT ?",
+                    (-1 if limit is None else limit,)
+                )
+            ]
+
+    def stats(self) -> dict:
+        """Return the number of open handles and registered collections"""
+        with self.lock:
+            registered = self.registry.execute("SELECT COUNT(*) FROM collections").fetchone()[0]
+            return {
+                "open_handles": len(self.handles),
+                "max_handles": self.max_handles,
+                "registered_collections": registered
+            }
+
+    def close(self):
+        """Stop the sweeper thread"""
+        self._stop.set()
+
+    # -------------------------------------------------------------------------
+    # Internals
+    # -------------------------------------------------------------------------
+
+    def _persist_access(self, name: str, last_access: float):
+        self.registry.execute(
+            "INSERT INTO collections (name, last_access) VALUES (?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET last_access = MAX(last_access, excluded.last_access)",
+            (name, last_access)
+        )
+        self.registry.commit()
+
+    def _flush_access(self):
+        for name, handle in self.handles.items():
+            if handle.last_access > handle.persisted_access:
+                self._persist_access(name, handle.last_access)
+                handle.persisted_access = handle.last_access
+
+    def _evict_lru(self):
+        evicted = []
+        while len(self.handles) > self.max_handles:
+            name, handle = self.handles.popitem(last=False)
+            self._persist_access(name, handle.last_access)
+            evicted.append(name)
+        return evicted
+
+    @staticmethod
+    def _notify(callback, name: str):
+        if callback:
+            try:
+                callback(name)
+            except Exception as e:
+                print(f"Error in collection callback for {name}: {str(e)}")
+
+    def _run_sweeper(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Error sweeping session collections: {str(e)}")
@@ -0,0 +1,130 @@
+"""
+Token-budget context packing for RAG prompts.
+Measures retrieved chunks and conversation history in tokens, drops weak and
+overlapping chunks, and greedily fills a fixed prompt budget.
+"""
+
+import re
+from typing import Callable, List, Optional, Tuple
+
+HISTORY_TURN_PATTERN = re.compile(r"\n\n(?=(?:Human|Assistant): )")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimate the number of model tokens in text.
+    Uses about four characters per token, the usual rate for English prose,
+    but at least one token per word.
+    """
+    if not text:
+        return 0
+    return max(-(-len(text) // 4), text.count(" ") + 1)
+
+
+class ContextPacker:
+    def __init__(self, token_budget: int = 3000, history_budget: int = 1000,
+                 max_distance: Optional[float] = None, overlap_threshold: float = 0.8,
+                 shingle_size: int = 8, token_counter: Callable[[str], int] = count_tokens):
+        """
+        Initialize the context packer.
+        A packed prompt holds at most token_budget tokens, of which conversation
+        history may use history_budget. Search results further than max_distance
+        from the query are dropped, as are chunks sharing at least
+        overlap_threshold of their shingle_size-word shingles with a chunk
+        already packed.
+        """
+        self.token_budget = token_budget
+        self.history_budget = history_budget
+        self.max_distance = max_distance
+        self.overlap_threshold = overlap_threshold
+        self.shingle_size = shingle_size
+        self.token_counter = token_counter
+
+    def _shingles(self, text: str) -> set:
+        words = text.lower().split()
+        if len(words) <= self.shingle_size:
+            return {" ".join(words)}
+        return {
+            " ".join(words[i:i + self.shingle_size])
+            for i in range(len(words) - self.shingle_size + 1)
+        }
+
+    def pack_history(self, conversation_history: str, budget: int) -> Tuple[str, int]:
+        """Keep the most recent turns of the history that fit in budget tokens"""
+        if not conversation_history or budget <= 0:
+            return "", 0
+
+        kept = []
+        used = 0
+        for turn in reversed(HISTORY_TURN_PATTERN.split(conversation_history)):
+            # Joining turns adds a blank line, roughly one token
+            tokens = self.token_counter(turn) + 1
+            if used + tokens > budget:
+                break
+            kept.append(turn)
+            used += tokens
+
+        return "\n\n".join(reversed(kept)), used
+
+    def pack_chunks(self, documents: List[str], metadatas: List[dict],
+                    distances: Optional[List[float]], budget: int) -> Tuple[List[str], List[dict], int]:
+        """
+        Greedily pack distinct chunks, in ranked order, that fit in budget tokens.
+        Chunks without a distance (e.g. keyword-only matches) are never cut off.
+        """
+        distances = distances or [None] * len(documents)
+
+        packed_documents = []
+        packed_metadatas = []
+        packed_shingles = []
+        used = 0
+        for document, metadata, distance in zip(documents, metadatas, distances):
+            if self.max_distance is not None and distance is not None and distance > self.max_distance:
+                continue
+
+            shingles = self._shingles(document)
+            if not shingles or any(
+                len(shingles & previous) >= self.overlap_threshold * len(shingles)
+                for previous in packed_shingles
+            ):
+                continue
+
+            tokens = self.token_counter(document) + 1
+            if used + tokens > budget:
+                # A shorter chunk further down may still fit
+                continue
+
+            packed_documents.append(document)
+            packed_metadatas.append(metadata)
+            packed_shingles.append(shingles)
+            used += tokens
+
+        return packed_documents, packed_metadatas, used
+
+    def pack(self, search_results: dict, conversation_history: str, fixed_text: str) -> dict:
+        """
+        Pack search results and conversation history into the token budget.
+        fixed_text is the part of the prompt that is always sent (template and query).
+        History is packed first, up to its own budget; chunks fill what remains.
+        """
+        fixed_tokens = self.token_counter(fixed_text)
+        remaining = max(self.token_budget - fixed_tokens, 0)
+
+        history, history_tokens = self.pack_history(conversation_history, min(self.history_budget, remaining))
+        remaining -= history_tokens
+
+        documents, metadatas, context_tokens = self.pack_chunks(
+            search_results["documents"][0],
+            search_results["metadatas"][0],
+            (search_results.get("distances") or [None])[0],
+            remaining
+        )
+
+        return {
+            "documents": documents,
+            "metadatas": metadatas,
+            "conversation_history": history,
+            "context_tokens": context_tokens,
+            "history_tokens": history_tokens,
+            "prompt_tokens": fixed_tokens + history_tokens + context_tokens
+        }
@@ -0,0 +1,279 @@
+"""
+Conversation history stores.
+InMemoryConversationStore keeps a bounded ring buffer per session in the
+process; SQLiteConversationStore keeps history in a SQLite file that every
+uvicorn worker can share and that survives restarts.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Callable, List, Optional
+
+
+class Message:
+    """A single conversation message"""
+
+    __slots__ = ("role", "content", "timestamp", "seq")
+
+    def __init__(self, role: str, content: str, timestamp: str = None, seq: int = 0):
+        self.role = role
+        self.content = content
+        self.timestamp = timestamp or datetime.now().isoformat()
+        self.seq = seq
+
+    def to_dict(self) -> dict:
+        return {
+            "role": self.role,
+            "content": self.content,
+            "timestamp": self.timestamp
+        }
+
+
+# =============================================================================
+# IN-MEMORY STORE
+# =============================================================================
+
+def _notify_evicted(callback: Optional[Callable[[str], None]], session_ids: List[str]):
+    """Tell the owner of per-session state which sessions were evicted"""
+    if not callback:
+        return
+    for session_id in session_ids:
+        try:
+            callback(session_id)
+        except Exception as e:
+            print(f"Error in eviction callback for session {session_id}: {str(e)}")
+
+
+class _Session:
+    __slots__ = ("messages", "last_seq", "last_access")
+
+    def __init__(self, max_messages: int):
+        self.messages = deque(maxlen=max_messages)
+        self.last_seq = 0
+        self.last_access = time.monotonic()
+
+
+class InMemoryConversationStore:
+    def __init__(self, max_messages: int = 50, idle_ttl: float = 86400, max_sessions: int = 10000,
+                 on_evict: Optional[Callable[[str], None]] = None):
+        """
+        Initialize the in-memory store.
+        Each session keeps its last max_messages messages; sessions idle for longer
+        than idle_ttl seconds are evicted, as are the least recently used sessions
+        beyond max_sessions. on_evict(session_id) is called for every evicted session.
+        """
+        self.max_messages = max_messages
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.on_evict = on_evict
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _touch(self, session_id: str, create: bool = False) -> Optional[_Session]:
+        session = self.sessions.get(session_id)
+        if session is None:
+            if not create:
+                return None
+            session = self.sessions[session_id] = _Session(self.max_messages)
+        session.last_access = time.monotonic()
+        self.sessions.move_to_end(session_id)
+        return session
+
+    def _evict(self) -> List[str]:
+        """Evict idle and excess sessions; returns their IDs"""
+        # Sessions are ordered by last access, so idle ones are at the front
+        cutoff = time.monotonic() - self.idle_ttl
+        evicted = []
+        while self.sessions:
+            session_id, session = next(iter(self.sessions.items()))
+            if len(self.sessions) <= self.max_sessions and session.last_access >= cutoff:
+                break
+            del self.sessions[session_id]
+            evicted.append(session_id)
+        return evicted
+
+    def create_session(self, session_id: str):
+        with self.lock:
+            self._touch(session_id, create=True)
+            evicted = self._evict()
+        _notify_evicted(self.on_evict, evicted)
+
+    def append(self, session_id: str, role: str, content: str) -> Message:
+        with self.lock:
+            session = self._touch(session_id, create=True)
+            session.last_seq += 1
+            message = Message(role, content, seq=session.last_seq)
+            session.messages.append(message)
+            evicted = self._evict()
+        _notify_evicted(self.on_evict, evicted)
+        return message
+
+    def get_messages(self, session_id: str, max_messages: int = None) -> List[Message]:
+        with self.lock:
+            session = self._touch(session_id)
+            if session is None:
+                return []
+            messages = list(session.messages)
+        return messages[-max_messages:] if max_messages else messages
+
+    def last_seq(self, session_id: str) -> int:
+        with self.lock:
+            session = self.sessions.get(session_id)
+            return session.last_seq if session else 0
+
+    def has_session(self, session_id: str) -> bool:
+        with self.lock:
+            return session_id in self.sessions
+
+    def delete_session(self, session_id: str) -> bool:
+        with self.lock:
+            return self.sessions.pop(session_id, None) is not None
+
+    def evict_idle(self):
+        with self.lock:
+            evicted = self._evict()
+        _notify_evicted(self.on_evict, evicted)
+
+    def session_count(self) -> int:
+        with self.lock:
+            return len(self.sessions)
+
+
+# =============================================================================
+# SQLITE STORE
+# =============================================================================
+
+class SQLiteConversationStore:
+    def __init__(self, path: str = "conversations.db", max_messages: int = 50, idle_ttl: float = 86400,
+                 evict_interval: float = 300, on_evict: Optional[Callable[[str], None]] = None):
+        """
+        Initialize the SQLite store.
+        Each session keeps its last max_messages messages. Sessions idle for longer
+        than idle_ttl seconds are deleted, checked at most every evict_interval seconds.
+        on_evict(session_id) is called for every session this process deletes.
+        """
+        self.path = path
+        self.max_messages = max_messages
+        self.idle_ttl = idle_ttl
+        self.evict_interval = evict_interval
+        self.on_evict = on_evict
+        self.last_evicted = 0.0
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                last_seq INTEGER NOT NULL DEFAULT 0,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_sessions_last_access ON sessions (last_access);
+            CREATE TABLE IF NOT EXISTS messages (
+                session_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                PRIMARY KEY (session_id, seq)
+            );
+        """)
+        self.conn.commit()
+
+    def _maybe_evict(self) -> List[str]:
+        if time.time() - self.last_evicted >= self.evict_interval:
+            return self._evict()
+        return []
+
+    def _evict(self) -> List[str]:
+        """Delete idle sessions; returns their IDs"""
+        self.last_evicted = time.time()
+        cutoff = self.last_evicted - self.idle_ttl
+        evicted = [
+            row[0] for row in self.conn.execute("SELECT session_id FROM sessions WHERE last_access < ?", (cutoff,))
+        ]
+        if evicted:
+            self.conn.execute(
+                "DELETE FROM messages WHERE session_id IN (SELECT session_id FROM sessions WHERE last_access < ?)",
+                (cutoff,)
+            )
+            self.conn.execute("DELETE FROM sessions WHERE last_access < ?", (cutoff,))
+        return evicted
+
+    def create_session(self, session_id: str):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO sessions (session_id, last_access) VALUES (?, ?) "
+                "ON CONFLICT (session_id) DO UPDATE SET last_access = excluded.last_access",
+                (session_id, time.time())
+            )
+            evicted = self._maybe_evict()
+        _notify_evicted(self.on_evict, evicted)
+
+    def append(self, session_id: str, role: str, content: str) -> Message:
+        with self.lock, self.conn:
+            # Allocate the next sequence number atomically across workers
+            seq = self.conn.execute(
+                "INSERT INTO sessions (session_id, last_seq, last_access) VALUES (?, 1, ?) "
+                "ON CONFLICT (session_id) DO UPDATE SET last_seq = last_seq + 1, last_access = excluded.last_access "
+                "RETURNING last_seq",
+                (session_id, time.time())
+            ).fetchone()[0]
+            message = Message(role, content, seq=seq)
+            self.conn.execute(
+                "INSERT INTO messages (session_id, seq, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+                (session_id, seq, role, content, message.timestamp)
+            )
+            self.conn.execute(
+                "DELETE FROM messages WHERE session_id = ? AND seq <= ?",
+                (session_id, seq - self.max_messages)
+            )
+            evicted = self._maybe_evict()
+        _notify_evicted(self.on_evict, evicted)
+        return message
+
+    def get_messages(self, session_id: str, max_messages: int = None) -> List[Message]:
+        limit = min(max_messages or self.max_messages, self.max_messages)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE sessions SET last_access = ? WHERE session_id = ?", (time.time(), session_id)
+            )
+            rows = self.conn.execute(
+                "SELECT role, content, timestamp, seq FROM messages WHERE session_id = ? "
+                "ORDER BY seq DESC LIMIT ?",
+                (session_id, limit)
+            ).fetchall()
+        return [Message(*row) for row in reversed(rows)]
+
+    def last_seq(self, session_id: str) -> int:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT last_seq FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def has_session(self, session_id: str) -> bool:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row is not None
+
+    def delete_session(self, session_id: str) -> bool:
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            deleted = self.conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount
+        return deleted > 0
+
+    def evict_idle(self):
+        with self.lock, self.conn:
+            evicted = self._evict()
+        _notify_evicted(self.on_evict, evicted)
+
+    def session_count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
@@ -0,0 +1,353 @@
+"""
+Document reading and chunking utilities.
+Kept free of server state so ingestion worker processes can import it cheaply.
+"""
+
+import codecs
+import hashlib
+import io
+import mmap
+import os
+import re
+from contextlib import contextmanager
+import docx
+import PyPDF2
+
+from context_packer import count_tokens
+
+# Paragraph breaks, form feeds (section breaks) and the line break before a markdown heading
+BLOCK_BOUNDARY = re.compile(r'(\n[ \t]*\n\s*|\f\s*|\n(?=#{1,6}[ \t]))')
+# Sentence ends in whitespace-collapsed text; a period followed by a lowercase
+# word (e.g. an abbreviation) does not end a sentence. Matching the space first
+# lets the regex engine skip straight to candidate positions
+SENTENCE_END = re.compile(r' (?=[^a-z])(?:(?<=[.!?] )|(?<=[.!?]["\'\)\]] ))')
+MARKDOWN_HEADING = re.compile(r'\s*#{1,6}[ \t]')
+
+# A form feed in the text stream starts a new section
+SECTION_BREAK = "\f"
+
+class MappedFile(mmap.mmap):
+    """Read-only memory map that also reports itself as a seekable, readable file"""
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+@contextmanager
+def open_mapped(file_path: str):
+    """
+    Open a file as a read-only memory map, which parsers can read and seek like
+    a file without copying it into process memory. Empty files, which cannot
+    be mapped, are opened as an empty buffer.
+    """
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            yield io.BytesIO()
+            return
+        with MappedFile(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+def iter_text_file(file_path: str, block_size: int = 64 * 1024):
+    """Yield content from a text file in fixed-size blocks, decoded from a memory map"""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    with open_mapped(file_path) as mapped:
+        view = memoryview(mapped) if isinstance(mapped, mmap.mmap) else mapped.getbuffer()
+        try:
+            for start in range(0, len(view), block_size):
+                block = decoder.decode(view[start:start + block_size])
+                if block:
+                    yield block
+            block = decoder.decode(b"", final=True)
+            if block:
+                yield block
+        finally:
+            # The map cannot be closed while a view of it is exported
+            view.release()
+
+def iter_pdf_file(file_path: str):
+    """Yield content from a PDF file one page at a time"""
+    with open_mapped(file_path) as mapped:
+        pdf_reader = PyPDF2.PdfReader(mapped)
+        for page in pdf_reader.pages:
+            yield (page.extract_text() or "") + "\n"
+
+def iter_docx_file(file_path: str):
+    """
+    Yield content from a Word document one paragraph at a time.
+    Paragraphs end with a blank line and headings start a new section.
+    """
+    with open_mapped(file_path) as mapped:
+        doc = docx.Document(mapped)
+    for paragraph in doc.paragraphs:
+        if not paragraph.text:
+            continue
+        style = paragraph.style.name if paragraph.style is not None else ""
+        if style.startswith(("Heading", "Title")):
+            yield SECTION_BREAK + paragraph.text + "\n\n"
+        else:
+            yield paragraph.text + "\n\n"
+
+def iter_document(file_path: str):
+    """Yield document content in pieces based on file extension"""
+    _, file_extension = os.path.splitext(file_path)
+    file_extension = file_extension.lower()
+    
+    if file_extension == '.txt':
+        return iter_text_file(file_path)
+    elif file_extension == '.pdf':
+        return iter_pdf_file(file_path)
+    elif file_extension == '.docx':
+        return iter_docx_file(file_path)
+    else:
+        raise ValueError(f"Unsupported file format: {file_extension}")
+
+def split_text(text: str, chunk_size: int = 500):
+    """
+    Split text into chunks while preserving sentence boundaries.
+    Legacy character-based chunker, kept for comparison with chunk_text.
+    """
+    sentences = text.replace('\n', ' ').split('. ')
+    chunks = []
+    current_chunk = []
+    current_size = 0
+    
+    for sentence in sentences:
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+            
+        # Ensure proper sentence ending
+        if not sentence.endswith('.'):
+            sentence += '.'
+            
+        sentence_size = len(sentence)
+        
+        # Check if adding this sentence would exceed chunk size
+        if current_size + sentence_size > chunk_size and current_chunk:
+            chunks.append(' '.join(current_chunk))
+            current_chunk = [sentence]
+            current_size = sentence_size
+        else:
+            current_chunk.append(sentence)
+            current_size += sentence_size
+    
+    # Add the last chunk if it exists
+    if current_chunk:
+        chunks.append(' '.join(current_chunk))
+    
+    return chunks
+
+def _collapse_whitespace(text: str) -> str:
+    """Collapse runs of whitespace into single spaces, returning text that has none as is"""
+    # The space is the only whitespace character str.isprintable() accepts
+    if text.isprintable() and "  " not in text and text[:1] != " " and text[-1:] != " ":
+        return text
+    return " ".join(text.split())
+
+def iter_blocks(pieces, structure_aware: bool = True, max_buffer: int = 64 * 1024):
+    """
+    Split a stream of text pieces into paragraphs in a single pass.
+    Yields (text, starts_section) with whitespace collapsed. With structure_aware
+    set, markdown heading lines are yielded on their own and, like the first
+    paragraph after a form feed, start a new section. Only the current partial
+    paragraph is buffered; one longer than max_buffer is flushed up to its last
+    sentence end.
+    """
+    # The current partial paragraph, as the raw pieces it arrived in
+    pending = []
+    pending_size = 0
+    section_pending = False
+    
+    def blocks(texts, separators=()):
+        # separators holds the separator that ended each text, if any was captured
+        nonlocal section_pending
+        for i, text in enumerate(texts):
+            if structure_aware and MARKDOWN_HEADING.match(text):
+                heading, _, text = text.strip().partition("\n")
+                yield _collapse_whitespace(heading), True
+                section_pending = False
+            text = _collapse_whitespace(text)
+            if text:
+                yield text, section_pending
+                section_pending = False
+            if structure_aware and i < len(separators) and SECTION_BREAK in separators[i]:
+                section_pending = True
+    
+    for piece in pieces:
+        if not piece:
+            continue
+        if pending:
+            # A paragraph break or heading may start at the last line break of the
+            # buffer; only the text from there is split again with the new piece
+            last = pending[-1]
+            cut = last.rfind("\n")
+            if cut >= 0 and not last[cut:].strip().strip("#"):
+                pending[-1] = last[:cut]
+                pending_size -= len(last) - cut
+                piece = last[cut:] + piece
+        if "\f" in piece or "\n " in piece or "\n\t" in piece or piece.count("\n#") != piece.count("\n\n#"):
+            parts = BLOCK_BOUNDARY.split(piece)
+            texts, separators = parts[::2], parts[1::2]
+        else:
+            # Paragraphs only end at plain blank lines, which a literal split finds several
+            # times faster; extra newlines are collapsed with the rest of the whitespace
+            texts, separators = piece.split("\n\n"), ()
+        
+        if len(texts) == 1:
+            pending.append(piece)
+            pending_size += len(piece)
+        else:
+            # The text after the last paragraph break may continue in the next piece
+            texts[0] = "".join(pending) + texts[0]
+            pending = [texts.pop()]
+            pending_size = len(pending[0])
+            yield from blocks(texts, separators)
+        
+        if pending_size >= max_buffer:
+            # Cut the raw text after its last sentence end; the whitespace after it
+            # stays buffered, so a break it starts is still found
+            text = "".join(pending)
+            end = max(text.rfind(mark) for mark in (". ", "? ", "! ", ".\n", "?\n", "!\n"))
+            if end > 0:
+                yield from blocks([text[:end + 1]])
+                pending = [text[end + 1:]]
+            else:
+                yield from blocks([text])
+                pending = []
+            pending_size = len(pending[0]) if pending else 0
+    
+    yield from blocks(["".join(pending)])
+
+def _split_long_word(word: str, max_tokens: int, token_counter=count_tokens):
+    """Cut a word longer than max_tokens into the longest slices that fit"""
+    while word:
+        # Binary search for the longest prefix within the budget (at least one character)
+        low, high = 1, len(word)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if token_counter(word[:middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        yield word[:low]
+        word = word[low:]
+
+def _split_long_sentence(sentence: str, max_tokens: int, token_counter=count_tokens):
+    """Split a sentence longer than max_tokens at word boundaries into parts that fit"""
+    part = ""
+    for word in sentence.split(" "):
+        pieces = (word,) if token_counter(word) <= max_tokens else \
+            _split_long_word(word, max_tokens, token_counter)
+        for piece in pieces:
+            # Token counts are not additive across the joining space, so measure the joined text
+            candidate = f"{part} {piece}" if part else piece
+            if part and token_counter(candidate) > max_tokens:
+                yield part
+                candidate = piece
+            part = candidate
+    if part:
+        yield part
+
+def iter_chunks(pieces, chunk_tokens: int = 128, overlap_tokens: int = 24, structure_aware: bool = True,
+                max_buffer: int = 64 * 1024, token_counter=count_tokens):
+    """
+    Group a stream of text pieces into chunks of whole sentences.
+    Chunks hold at most chunk_tokens tokens and repeat up to overlap_tokens tokens
+    of trailing sentences from the previous chunk. With structure_aware set, a new
+    chunk is started at every heading and overlap does not cross sections.
+    Sentences longer than chunk_tokens are split at word boundaries, and words
+    longer than chunk_tokens are cut.
+    """
+    texts = []
+    sizes = []
+    chunk = ""
+    
+    for block, starts_section in iter_blocks(pieces, structure_aware, max_buffer):
+        if starts_section and texts:
+            yield chunk
+            texts, sizes, chunk = [], [], ""
+        
+        for sentence in SENTENCE_END.split(block):
+            tokens = token_counter(sentence)
+            parts = (sentence,) if tokens <= chunk_tokens else \
+                _split_long_sentence(sentence, chunk_tokens, token_counter)
+            
+            for text in parts:
+                # Token counts are not additive across joined sentences, so measure
+                # the candidate chunk rather than summing sentence sizes
+                candidate = f"{chunk} {text}" if texts else text
+                if texts and token_counter(candidate) > chunk_tokens:
+                    yield chunk
+                    
+                    # Carry the trailing sentences that fit in the overlap into the next chunk
+                    keep = 0
+                    overlap = 0
+                    while keep < len(texts) - 1:
+                        size = sizes[-1 - keep]
+                        if overlap + size > overlap_tokens:
+                            break
+                        overlap += size
+                        keep += 1
+                    texts = texts[len(texts) - keep:]
+                    sizes = sizes[len(sizes) - keep:]
+                    candidate = " ".join(texts + [text])
+                    
+                    # Drop carried sentences until the new text fits alongside them
+                    while texts and token_counter(candidate) > chunk_tokens:
+                        del texts[0], sizes[0]
+                        candidate = " ".join(texts + [text])
+                
+                texts.append(text)
+                sizes.append(tokens if text is sentence else token_counter(text))
+                chunk = candidate
+    
+    # Yield the last chunk if it exists
+    if texts:
+        yield chunk
+
+def chunk_text(text: str, chunk_tokens: int = 128, overlap_tokens: int = 24, structure_aware: bool = True):
+    """Split text into token-sized chunks of whole sentences (replacement for split_text)"""
+    return list(iter_chunks([text], chunk_tokens, overlap_tokens, structure_aware))
+
+def chunk_id(source: str, text: str, session_id: str = None) -> str:
+    """Derive a stable chunk ID from the document name and the chunk content"""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+    # Include session_id in the document IDs if provided
+    if session_id:
+        return f"{session_id}_{source}_{digest}"
+    return f"{source}_{digest}"
+
+def iter_document_batches(file_path: str, session_id: str = None, batch_size: int = 100,
+                          source_name: str = None, chunk_tokens: int = 128, overlap_tokens: int = 24):
+    """
+    Stream a document as (ids, texts, metadatas) batches of at most batch_size chunks
+    of up to chunk_tokens tokens, overlapping by up to overlap_tokens.
+    Chunk IDs are content hashes, so unchanged chunks keep their ID across re-ingestion;
+    repeated chunks within the document are emitted once.
+    """
+    source = source_name or os.path.basename(file_path)
+    ids, texts, metadatas = [], [], []
+    seen = set()
+    
+    for i, chunk in enumerate(iter_chunks(iter_document(file_path), chunk_tokens, overlap_tokens)):
+        id_ = chunk_id(source, chunk, session_id)
+        if id_ in seen:
+            continue
+        seen.add(id_)
+        
+        ids.append(id_)
+        texts.append(chunk)
+        metadata = {"source": source, "chunk": i}
+        # ChromaDB rejects None metadata values
+        if session_id:
+            metadata["session_id"] = session_id
+        metadatas.append(metadata)
+        
+        if len(texts) >= batch_size:
+            yield ids, texts, metadatas
+            ids, texts, metadatas = [], [], []
+    
+    if texts:
+        yield ids, texts, metadatas
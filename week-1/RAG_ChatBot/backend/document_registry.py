@@ -0,0 +1,209 @@
+"""
+Durable document status registry.
+Keeps the processing status of every uploaded document in SQLite (WAL mode),
+indexed by session, status and content hash, so lookups and listings stay
+cheap as documents accumulate and every worker process sees the same status.
+Each write stamps the document with a new change sequence number, which
+clients use to long-poll for changes.
+"""
+
+import json
+import sqlite3
+import threading
+from typing import List, Optional, Tuple
+
+# Status fields stored in their own (indexed) columns; the rest is kept as JSON
+_COLUMNS = ("filename", "status", "session_id", "sha256")
+
+
+class DocumentRegistry:
+    def __init__(self, path: str = "documents.db"):
+        """Open (or create) the registry database at path"""
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                document_id TEXT NOT NULL UNIQUE,
+                filename TEXT,
+                status TEXT NOT NULL,
+                session_id TEXT,
+                sha256 TEXT,
+                seq INTEGER NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_documents_session ON documents (session_id);
+            CREATE INDEX IF NOT EXISTS idx_documents_status ON documents (status);
+            CREATE INDEX IF NOT EXISTS idx_documents_sha256 ON documents (sha256, status);
+            CREATE INDEX IF NOT EXISTS idx_documents_seq ON documents (seq);
+            CREATE INDEX IF NOT EXISTS idx_documents_session_seq ON documents (session_id, seq);
+        """)
+
+    @staticmethod
+    def _row_to_status(row) -> dict:
+        document_id, filename, status, session_id, sha256, seq, data = row
+        result = json.loads(data)
+        result.update({"filename": filename, "status": status, "session_id": session_id, "version": seq})
+        if sha256:
+            result["sha256"] = sha256
+        result["document_id"] = document_id
+        return result
+
+    def _write(self, document_id: str, status: dict):
+        # Runs inside an IMMEDIATE transaction, so the sequence is unique across processes
+        seq = self.db.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM documents").fetchone()[0]
+        data = {
+            key: value for key, value in status.items()
+            if key not in _COLUMNS and key not in ("document_id", "version")
+        }
+        self.db.execute(
+            "INSERT INTO documents (document_id, filename, status, session_id, sha256, seq, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (document_id) DO UPDATE SET filename = excluded.filename, "
+            "status = excluded.status, session_id = excluded.session_id, sha256 = excluded.sha256, "
+            "seq = excluded.seq, data = excluded.data",
+            (document_id, status.get("filename"), status.get("status", "unknown"),
+             status.get("session_id"), status.get("sha256"), seq, json.dumps(data))
+        )
+        return seq
+
+    def set(self, document_id: str, status: dict) -> int:
+        """Replace a document's status; returns its new version"""
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                seq = self._write(document_id, status)
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+            return seq
+
+    def update(self, document_id: str, fields: dict) -> Optional[int]:
+        """Merge fields into a document's status; returns its new version, or None if not found"""
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                current = self.get(document_id)
+                seq = None
+                if current is not None:
+                    seq = self._write(document_id, {**current, **fields})
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+            return seq
+
+    def get(self, document_id: str) -> Optional[dict]:
+        """Get a document's status, or None if it is not registered"""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT document_id, filename, status, session_id, sha256, seq, data "
+                "FROM documents WHERE document_id = ?", (document_id,)
+            ).fetchone()
+        return self._row_to_status(row) if row else None
+
+    def get_version(self, document_id: str) -> Optional[int]:
+        """Get a document's current version without decoding its status"""
+        with self.lock:
+            row = self.db.execute("SELECT seq FROM documents WHERE document_id = ?", (document_id,)).fetchone()
+        return row[0] if row else None
+
+    def find_by_sha256(self, sha256: str, status: str = "completed") -> Optional[dict]:
+        """Get the most recently updated document with the given content hash and status"""
+        if not sha256:
+            return None
+        with self.lock:
+            row = self.db.execute(
+                "SELECT document_id, filename, status, session_id, sha256, seq, data FROM documents "
+                "WHERE sha256 = ? AND status = ? ORDER BY seq DESC LIMIT 1", (sha256, status)
+            ).fetchone()
+        return self._row_to_status(row) if row else None
+
+    def find_all_by_sha256(self, sha256: str) -> List[dict]:
+        """Get every document with the given content hash, in any status"""
+        if not sha256:
+            return []
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT document_id, filename, status, session_id, sha256, seq, data FROM documents "
+                "WHERE sha256 = ? ORDER BY seq", (sha256,)
+            ).fetchall()
+        return [self._row_to_status(row) for row in rows]
+
+    def list(self, session_id: str = None, status: str = None, limit: int = 100,
+             cursor: int = 0) -> Tuple[List[dict], Optional[int]]:
+        """
+        List documents in upload order, optionally filtered by session and status.
+        Returns a page of at most limit documents after cursor, and the cursor of
+        the next page (None on the last page).
+        """
+        clauses = ["id > ?"]
+        params = [cursor]
+        if session_id:
+            clauses.append("session_id = ?")
+            params.append(session_id)
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT id, document_id, filename, status, session_id, sha256, seq, data FROM documents "
+                f"WHERE {' AND '.join(clauses)} ORDER BY id LIMIT ?", (*params, limit + 1)
+            ).fetchall()
+
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return [self._row_to_status(row[1:]) for row in rows[:limit]], next_cursor
+
+    def changes(self, since: int = 0, session_id: str = None, limit: int = 100) -> Tuple[List[dict], int]:
+        """
+        Get documents changed after version since, oldest change first.
+        Returns the changes and the version to pass as since on the next call.
+        """
+        query = "SELECT document_id, filename, status, session_id, sha256, seq, data FROM documents WHERE seq > ?"
+        params = [since]
+        if session_id:
+            query += " AND session_id = ?"
+            params.append(session_id)
+
+        with self.lock:
+            rows = self.db.execute(query + " ORDER BY seq LIMIT ?", (*params, limit)).fetchall()
+
+        changes = [self._row_to_status(row) for row in rows]
+        return changes, (changes[-1]["version"] if changes else since)
+
+    def latest_version(self) -> int:
+        """Get the version of the most recent change"""
+        with self.lock:
+            return self.db.execute("SELECT COALESCE(MAX(seq), 0) FROM documents").fetchone()[0]
+
+    def delete(self, document_id: str) -> bool:
+        """Remove a document; returns False if it was not registered"""
+        with self.lock:
+            return self.db.execute("DELETE FROM documents WHERE document_id = ?", (document_id,)).rowcount > 0
+
+    def delete_session(self, session_id: str) -> int:
+        """Remove every document of a session; returns how many were removed"""
+        with self.lock:
+            return self.db.execute("DELETE FROM documents WHERE session_id = ?", (session_id,)).rowcount
+
+    def count(self, session_id: str = None, status: str = None) -> int:
+        """Count documents, optionally filtered by session and status"""
+        query = "SELECT COUNT(*) FROM documents WHERE 1 = 1"
+        params = []
+        if session_id:
+            query += " AND session_id = ?"
+            params.append(session_id)
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        with self.lock:
+            return self.db.execute(query, params).fetchone()[0]
+
+    def close(self):
+        """Close the database connection"""
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,296 @@
+"""
+Shared sentence-transformer embedding service.
+Embeds texts through a single model with micro-batching across concurrent
+callers and a content-hash keyed cache (in-memory LRU plus optional SQLite
+file), with an adapter for ChromaDB collections.
+"""
+
+import hashlib
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+
+class _EmbeddingRequest:
+    """Texts waiting to be embedded by the batcher thread"""
+
+    __slots__ = ("texts", "embeddings", "error", "done")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.embeddings = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class EmbeddingService:
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", cache_path: Optional[str] = None,
+                 cache_size: int = 10000, max_batch_size: int = 64, max_wait: float = 0.005,
+                 device: str = "cpu", normalize_embeddings: bool = False):
+        """
+        Initialize the embedding service.
+        Requests arriving within max_wait seconds of each other are embedded in
+        one model call of up to max_batch_size texts. The model is loaded on first use.
+        """
+        self.model_name = model_name
+        self.device = device
+        self.normalize_embeddings = normalize_embeddings
+        self.cache_size = cache_size
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self._model = None
+        self._model_lock = threading.Lock()
+
+        self._memory_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._disk_cache = None
+        if cache_path:
+            self._disk_cache = sqlite3.connect(cache_path, timeout=30, check_same_thread=False)
+            self._disk_cache.execute("PRAGMA journal_mode=WAL")
+            self._disk_cache.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._disk_cache.commit()
+
+        self._requests = queue.Queue()
+        self._batcher = None
+        self._batcher_lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.model_calls = 0
+
+    # -------------------------------------------------------------------------
+    # Public API
+    # -------------------------------------------------------------------------
+
+    def embed(self, texts: List[str]) -> List[np.ndarray]:
+        """Embed texts, serving repeated content from the cache"""
+        texts = list(texts)
+        keys = [self._cache_key(text) for text in texts]
+        results = [None] * len(texts)
+
+        # Group cache misses by key so duplicate texts are embedded once
+        missing = OrderedDict()
+        for i, key in enumerate(keys):
+            embedding = self._cache_get(key)
+            if embedding is not None:
+                results[i] = embedding
+            else:
+                missing.setdefault(key, []).append(i)
+
+        with self._cache_lock:
+            self.hits += len(texts) - sum(len(indices) for indices in missing.values())
+            self.misses += len(missing)
+
+        if missing:
+            embeddings = self._embed_batched([texts[indices[0]] for indices in missing.values()])
+            self._cache_put(list(missing), embeddings)
+            for indices, embedding in zip(missing.values(), embeddings):
+                for i in indices:
+                    results[i] = embedding
+
+        return results
+
+    def embed_query(self, text: str) -> np.ndarray:
+        """Embed a single query text"""
+        return self.embed([text])[0]
+
+    def warm_up(self):
+        """Load the model and run one encode, so the first request does not pay for either"""
+        self._encode(["warm up"])
+
+    def stats(self) -> dict:
+        """Return cache and batching counters"""
+        with self._cache_lock:
+            return {
+                "model": self.model_name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "model_calls": self.model_calls,
+                "memory_entries": len(self._memory_cache),
+                "queue_depth": self._requests.qsize()
+            }
+
+    def as_chroma_embedding_function(self):
+        """Return an adapter for the embedding_function slot of ChromaDB collections"""
+        return _chroma_adapter_class()(self)
+
+    # -------------------------------------------------------------------------
+    # Cache
+    # -------------------------------------------------------------------------
+
+    def _cache_key(self, text: str) -> str:
+        content = f"{self.model_name}\0{int(self.normalize_embeddings)}\0{text}"
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[np.ndarray]:
+        with self._cache_lock:
+            embedding = self._memory_cache.get(key)
+            if embedding is not None:
+                self._memory_cache.move_to_end(key)
+                return embedding
+
+            if self._disk_cache is None:
+                return None
+            row = self._disk_cache.execute(
+                "SELECT vector FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+
+        if row is None:
+            return None
+        embedding = np.frombuffer(row[0], dtype=np.float32)
+        self._remember(key, embedding)
+        return embedding
+
+    def _cache_put(self, keys: List[str], embeddings: List[np.ndarray]):
+        for key, embedding in zip(keys, embeddings):
+            self._remember(key, embedding)
+
+        if self._disk_cache is not None:
+            with self._cache_lock:
+                self._disk_cache.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, embedding.tobytes()) for key, embedding in zip(keys, embeddings)]
+                )
+                self._disk_cache.commit()
+
+    def _remember(self, key: str, embedding: np.ndarray):
+        with self._cache_lock:
+            self._memory_cache[key] = embedding
+            self._memory_cache.move_to_end(key)
+            while len(self._memory_cache) > self.cache_size:
+                self._memory_cache.popitem(last=False)
+
+    # -------------------------------------------------------------------------
+    # Model and micro-batching
+    # -------------------------------------------------------------------------
+
+    def _get_model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name, device=self.device)
+        return self._model
+
+    def _encode(self, texts: List[str]) -> List[np.ndarray]:
+        embeddings = self._get_model().encode(
+            texts,
+            convert_to_numpy=True,
+            normalize_embeddings=self.normalize_embeddings
+        )
+        with self._cache_lock:
+            self.model_calls += 1
+        return [np.asarray(embedding, dtype=np.float32) for embedding in embeddings]
+
+    def _embed_batched(self, texts: List[str]) -> List[np.ndarray]:
+        """Hand texts to the batcher thread and wait for their embeddings"""
+        self._ensure_batcher()
+        request = _EmbeddingRequest(texts)
+        self._requests.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.embeddings
+
+    def _ensure_batcher(self):
+        if self._batcher is None:
+            with self._batcher_lock:
+                if self._batcher is None:
+                    self._batcher = threading.Thread(
+                        target=self._run_batcher, name="embedding-batcher", daemon=True
+                    )
+                    self._batcher.start()
+
+    def _run_batcher(self):
+        while True:
+            batch = [self._requests.get()]
+            size = len(batch[0].texts)
+            deadline = time.monotonic() + self.max_wait
+
+            # Collect requests from other callers until the batch is full or the wait expires
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                size += len(request.texts)
+
+            try:
+                # Texts requested by several callers at once are encoded only once
+                unique_texts = list(dict.fromkeys(text for request in batch for text in request.texts))
+                embeddings = dict(zip(unique_texts, self._encode(unique_texts)))
+                for request in batch:
+                    request.embeddings = [embeddings[text] for text in request.texts]
+            except Exception as e:
+                for request in batch:
+                    request.error = e
+            finally:
+                for request in batch:
+                    request.done.set()
+
+
+# =============================================================================
+# ADAPTERS
+# =============================================================================
+
+_adapter_classes = {}
+
+def _chroma_adapter_class():
+    """Build the ChromaDB adapter class on first use so chromadb stays optional"""
+    if "chroma" not in _adapter_classes:
+        from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+        from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+
+        class ChromaEmbeddingAdapter(EmbeddingFunction[Documents]):
+            """
+            ChromaDB embedding function backed by an EmbeddingService.
+            Reports itself as the sentence_transformer function with the same
+            config, so it is interchangeable with collections created by it.
+            """
+
+            def __init__(self, service: EmbeddingService):
+                self.service = service
+
+            def __call__(self, input: Documents) -> Embeddings:
+                return self.service.embed(list(input))
+
+            @staticmethod
+            def name() -> str:
+                return SentenceTransformerEmbeddingFunction.name()
+
+            def default_space(self):
+                return "cosine"
+
+            def supported_spaces(self):
+                return ["cosine", "l2", "ip"]
+
+            @staticmethod
+            def build_from_config(config):
+                return SentenceTransformerEmbeddingFunction.build_from_config(config)
+
+            def get_config(self):
+                return {
+                    "model_name": self.service.model_name,
+                    "device": self.service.device,
+                    "normalize_embeddings": self.service.normalize_embeddings,
+                    "kwargs": {}
+                }
+
+            @staticmethod
+            def validate_config(config):
+                SentenceTransformerEmbeddingFunction.validate_config(config)
+
+        _adapter_classes["chroma"] = ChromaEmbeddingAdapter
+    return _adapter_classes["chroma"]
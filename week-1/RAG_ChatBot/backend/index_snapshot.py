@@ -0,0 +1,111 @@
+"""
+Portable snapshots of vector collections.
+A snapshot is a directory holding manifest.json and, per collection, a
+subdirectory with records.jsonl (id, document and metadata per line) and
+embeddings.npy (a float32 matrix with one row per record). Restoring a
+snapshot adds the stored embeddings directly, so a new replica builds its
+index without embedding any text; embeddings.npy is memory-mapped, so
+collections larger than memory can be restored.
+"""
+
+import json
+import os
+from datetime import datetime
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+RECORDS_FILE = "records.jsonl"
+EMBEDDINGS_FILE = "embeddings.npy"
+
+
+def export_collection(collection, directory: str, batch_size: int = 1000) -> dict:
+    """Write every record of a collection to directory; returns its manifest entry"""
+    os.makedirs(directory, exist_ok=True)
+    count = collection.count()
+    embeddings = None
+    written = records_written = 0
+
+    with open(os.path.join(directory, RECORDS_FILE), "w", encoding="utf-8") as records:
+        for offset in range(0, count, batch_size):
+            stored = collection.get(
+                include=["documents", "metadatas", "embeddings"], limit=batch_size, offset=offset
+            )
+            batch = np.asarray(stored["embeddings"], dtype=np.float32)
+            if embeddings is None and len(batch):
+                embeddings = np.lib.format.open_memmap(
+                    os.path.join(directory, EMBEDDINGS_FILE), mode="w+",
+                    dtype=np.float32, shape=(count, batch.shape[1])
+                )
+            # Records added while exporting are left for the next snapshot
+            remaining = count - written
+            ids = stored["ids"][:remaining]
+            documents = stored["documents"][:remaining]
+            metadatas = stored["metadatas"][:remaining]
+            batch = batch[:remaining]
+            if not len(ids) == len(documents) == len(metadatas) == len(batch):
+                raise RuntimeError(f"Collection {collection.name} returned mismatched records and embeddings")
+            for id_, document, metadata in zip(ids, documents, metadatas):
+                records.write(json.dumps({"id": id_, "document": document, "metadata": metadata}) + "\n")
+                records_written += 1
+            embeddings[written:written + len(batch)] = batch
+            written += len(batch)
+            if written >= count:
+                break
+
+    # iter_collection_batches pairs records.jsonl lines with embeddings rows by position
+    if records_written != written:
+        raise RuntimeError(f"Exported {records_written} records but {written} embeddings from {collection.name}")
+    dimension = 0
+    if embeddings is not None:
+        dimension = embeddings.shape[1]
+        embeddings.flush()
+        del embeddings
+    return {"name": collection.name, "count": written, "dimension": dimension}
+
+
+def iter_collection_batches(directory: str, batch_size: int = 1000) -> Iterator[Tuple[List[str], List[str], List[dict], np.ndarray]]:
+    """Yield (ids, documents, metadatas, embeddings) batches from an exported collection"""
+    embeddings_path = os.path.join(directory, EMBEDDINGS_FILE)
+    if not os.path.exists(embeddings_path):
+        return
+    embeddings = np.load(embeddings_path, mmap_mode="r")
+
+    ids, documents, metadatas = [], [], []
+    start = 0
+    with open(os.path.join(directory, RECORDS_FILE), encoding="utf-8") as records:
+        for line in records:
+            record = json.loads(line)
+            ids.append(record["id"])
+            documents.append(record["document"])
+            metadatas.append(record["metadata"])
+            if len(ids) >= batch_size:
+                yield ids, documents, metadatas, np.array(embeddings[start:start + len(ids)])
+                start += len(ids)
+                ids, documents, metadatas = [], [], []
+    if ids:
+        yield ids, documents, metadatas, np.array(embeddings[start:start + len(ids)])
+
+
+def write_manifest(path: str, collections: List[dict], **settings) -> dict:
+    """Write the snapshot manifest listing the exported collections and the settings they were built with"""
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "created_at": datetime.now().isoformat(),
+        **settings,
+        "collections": collections
+    }
+    with open(os.path.join(path, MANIFEST_FILE), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+    return manifest
+
+
+def read_manifest(path: str) -> dict:
+    """Read and check a snapshot manifest"""
+    with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as file:
+        manifest = json.load(file)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format version: {manifest.get('format_version')}")
+    return manifest
@@ -0,0 +1,220 @@
+"""
+Process-pool ingestion for uploaded documents.
+Worker processes parse and embed documents in parallel and stream the
+resulting batches back to the API process, which writes them to ChromaDB.
+"""
+
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from document_loader import iter_document_batches
+from embedding_service import EmbeddingService
+
+
+class IngestQueueFull(Exception):
+    """Raised when the ingestion queue has no free slot for another document"""
+
+
+# =============================================================================
+# WORKER PROCESS
+# =============================================================================
+
+_worker_embedding_service = None
+
+def _init_worker(model_name: str, cache_path: str = None):
+    """Create the embedding service once per worker process"""
+    global _worker_embedding_service
+    _worker_embedding_service = EmbeddingService(model_name=model_name, cache_path=cache_path)
+
+def _warm_up():
+    """No-op task used to start the worker processes eagerly"""
+    return True
+
+def _put(results, cancel, message, poll_seconds: float = 1.0) -> bool:
+    """Put a message on the results queue unless cancel is set; returns False when cancelled"""
+    while not cancel.is_set():
+        try:
+            results.put(message, timeout=poll_seconds)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _ingest_worker(file_path: str, session_id: str, batch_size: int, source_name: str,
+                   chunk_tokens: int, overlap_tokens: int, results, cancel):
+    """
+    Parse and embed a document, putting messages on the results queue:
+    ("batch", ids, texts, metadatas, embeddings) for every batch, then
+    ("done", None) or ("error", message). Stops as soon as cancel is set,
+    so a consumer that gives up never leaves the worker blocked on a full queue.
+    """
+    try:
+        batches = iter_document_batches(file_path, session_id, batch_size, source_name, chunk_tokens, overlap_tokens)
+        for ids, texts, metadatas in batches:
+            # Unchanged chunks of a re-ingested document are served from the embedding cache
+            embeddings = _worker_embedding_service.embed(texts)
+            if not _put(results, cancel, ("batch", ids, texts, metadatas, embeddings)):
+                return
+        _put(results, cancel, ("done", None))
+    except Exception as e:
+        _put(results, cancel, ("error", str(e)))
+
+# =============================================================================
+# INGESTION EXECUTOR
+# =============================================================================
+
+class IngestionExecutor:
+    def __init__(self, model_name: str, max_workers: int = 2, max_queue: int = 16,
+                 batch_size: int = 100, cache_path: str = None, chunk_tokens: int = 128,
+                 overlap_tokens: int = 24):
+        """
+        Initialize the ingestion executor.
+        max_workers processes parse and embed documents; at most max_queue
+        documents may be queued or in progress at once. With max_workers=0
+        documents are parsed in the calling thread and embedded by the collection.
+        Workers share the embedding cache at cache_path with the API process.
+        Documents are split into chunks of chunk_tokens tokens overlapping by overlap_tokens.
+        The worker processes are started by start(), or by the first document.
+        """
+        self.model_name = model_name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self.cache_path = cache_path
+        self._coordinators = ThreadPoolExecutor(max_workers=max_queue, thread_name_prefix="ingest")
+        self._pool = None
+        self._manager = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """
+        Start the worker processes, if not started yet. Call it early, before the
+        process starts many threads of its own, as workers are forked where possible.
+        """
+        if self.max_workers <= 0 or self._pool is not None:
+            return
+        with self._start_lock:
+            if self._pool is not None:
+                return
+            start_methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("fork" if "fork" in start_methods else "spawn")
+            self._manager = context.Manager()
+            pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self.model_name, self.cache_path)
+            )
+            for _ in range(self.max_workers):
+                pool.submit(_warm_up)
+            self._pool = pool
+
+    def submit(self, fn, *args):
+        """
+        Queue fn(*args) to run on an ingestion coordinator thread.
+        Raises IngestQueueFull instead of blocking when all slots are taken.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise IngestQueueFull(f"Ingestion queue is full ({self.max_queue} documents pending)")
+
+        with self._lock:
+            self._queued += 1
+
+        def run():
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._active -= 1
+                self._slots.release()
+
+        try:
+            return self._coordinators.submit(run)
+        except Exception:
+            with self._lock:
+                self._queued -= 1
+            self._slots.release()
+            raise
+
+    def iter_batches(self, file_path: str, session_id: str = None, source_name: str = None):
+        """
+        Yield (ids, texts, metadatas, embeddings) batches for a document as a
+        worker process produces them. embeddings is None when running in-process.
+        """
+        if self.max_workers <= 0:
+            batches = iter_document_batches(
+                file_path, session_id, self.batch_size, source_name, self.chunk_tokens, self.overlap_tokens
+            )
+            for ids, texts, metadatas in batches:
+                yield ids, texts, metadatas, None
+            return
+
+        self.start()
+        # A small bounded queue keeps the worker at most a couple of batches ahead
+        results = self._manager.Queue(maxsize=2)
+        cancel = self._manager.Event()
+        future = self._pool.submit(
+            _ingest_worker, file_path, session_id, self.batch_size, source_name,
+            self.chunk_tokens, self.overlap_tokens, results, cancel
+        )
+
+        finished = False
+        try:
+            while True:
+                try:
+                    message = results.get(timeout=1)
+                except queue.Empty:
+                    if future.done():
+                        # The worker exited without a final message (e.g. it crashed)
+                        finished = True
+                        future.result()
+                        raise RuntimeError("Ingestion worker exited unexpectedly")
+                    continue
+
+                kind = message[0]
+                if kind == "batch":
+                    yield message[1], message[2], message[3], message[4]
+                else:
+                    finished = True
+                    if kind == "done":
+                        return
+                    raise RuntimeError(message[1])
+        finally:
+            if not finished:
+                # The consumer stopped early (an error writing a batch, or the generator
+                # was closed): stop the worker and free the queue so it cannot block
+                cancel.set()
+                while True:
+                    try:
+                        results.get_nowait()
+                    except queue.Empty:
+                        break
+
+    def stats(self) -> dict:
+        """Return current queue depth and worker configuration"""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queued": self._queued,
+                "active": self._active
+            }
+
+    def shutdown(self):
+        """Stop accepting work and shut down coordinators and worker processes"""
+        self._coordinators.shutdown(wait=False, cancel_futures=True)
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        if self._manager:
+            self._manager.shutdown()
@@ -0,0 +1,215 @@
+"""
+Lightweight in-process metrics in the Prometheus text exposition format.
+Counters and histograms are updated on the request path with one lock and a
+bisect per observation; values owned by other components (queue depths,
+cache counters) are read through callbacks only when metrics are scraped.
+Stage timings of the current request are also collected per request so they
+can be returned as Server-Timing headers.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Seconds; spans sub-millisecond cache lookups to multi-second generations
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Stage durations of the request being handled, as a list of (stage, seconds)
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        """A monotonically increasing count, optionally split by label values"""
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[tuple, float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def collect(self) -> List[str]:
+        with self.lock:
+            values = list(self.values.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        """A distribution of observed values (usually seconds) in cumulative buckets"""
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label values: [count per bucket (+Inf last), sum]
+        self.values: Dict[tuple, list] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.values.get(labels)
+            if series is None:
+                series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        """Observe the duration of the with block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def collect(self) -> List[str]:
+        with self.lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self.values.items()]
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    def __init__(self, name: str, documentation: str, callback: Callable[[], object],
+                 metric_type: str = "gauge", labelnames: Iterable[str] = ()):
+        """
+        A gauge or counter read from callback() at scrape time.
+        callback returns a number, or a dict of label value tuples to numbers.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.metric_type = metric_type
+        self.labelnames = tuple(labelnames)
+
+    def collect(self) -> List[str]:
+        try:
+            value = self.callback()
+        except Exception as e:
+            print(f"Error collecting metric {self.name}: {str(e)}")
+            return []
+        if value is None:
+            return []
+        values = value.items() if isinstance(value, dict) else [((), value)]
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        for labels, number in values:
+            labels = labels if isinstance(labels, tuple) else (labels,)
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(number)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self, prefix: str = ""):
+        """Holds metrics and renders them; names are prefixed with prefix"""
+        self.prefix = prefix
+        self.metrics = []
+        self.lock = threading.Lock()
+
+    def _register(self, metric):
+        with self.lock:
+            self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(self.prefix + name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self.prefix + name, documentation, labelnames, buckets))
+
+    def gauge_callback(self, name: str, documentation: str, callback: Callable[[], object],
+                       labelnames: Iterable[str] = ()) -> CallbackMetric:
+        return self._register(CallbackMetric(self.prefix + name, documentation, callback, "gauge", labelnames))
+
+    def counter_callback(self, name: str, documentation: str, callback: Callable[[], object],
+                         labelnames: Iterable[str] = ()) -> CallbackMetric:
+        return self._register(CallbackMetric(self.prefix + name, documentation, callback, "counter", labelnames))
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text format"""
+        with self.lock:
+            metrics = list(self.metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+# -----------------------------------------------------------------------------
+# Per-request stage timing
+# -----------------------------------------------------------------------------
+
+def start_request_timing():
+    """Start collecting stage timings for the current request; returns a token for reset"""
+    return _request_timings.set([])
+
+
+def request_timings() -> List[Tuple[str, float]]:
+    """Stage timings recorded so far in the current request"""
+    return list(_request_timings.get() or [])
+
+
+def reset_request_timing(token):
+    _request_timings.reset(token)
+
+
+def record_stage(histogram: Histogram, stage: str, seconds: float):
+    """Observe a stage duration and add it to the current request's timings"""
+    histogram.observe(seconds, stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def timed_stage(histogram: Histogram, stage: str):
+    """Time the with block as a stage of the current request"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(histogram, stage, time.perf_counter() - started)
+
+
+def server_timing_header(timings: List[Tuple[str, float]]) -> str:
+    """Format stage timings as a Server-Timing header value (durations in milliseconds)"""
+    totals = {}
+    for stage, seconds in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in totals.items())
@@ -0,0 +1,31 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+# The backend modules are imported as top-level modules, as app.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    """The API module, imported with every file it opens kept in a temporary directory"""
+    for module in ("chromadb", "fastapi", "boto3"):
+        pytest.importorskip(module)
+    directory = tmp_path_factory.mktemp("app")
+    with pytest.MonkeyPatch.context() as patch:
+        for name, value in {
+            "UPLOAD_DIR": "uploads",
+            "DB_PATH": "chroma_db",
+            "DOCUMENT_REGISTRY_PATH": "documents.db",
+            "COLLECTION_REGISTRY_PATH": "collection_registry.db",
+            "EMBEDDING_CACHE_PATH": "embedding_cache.db",
+            "CONVERSATION_DB_PATH": "conversations.db",
+            "SNAPSHOT_DIR": "snapshots",
+        }.items():
+            patch.setenv(name, str(directory / value))
+        patch.setenv("INGEST_WORKERS", "0")
+        patch.setenv("BEDROCK_STUB", "true")
+        patch.setenv("AWS_REGION", "us-east-1")
+        return importlib.import_module("app")
@@ -0,0 +1,63 @@
+from bm25_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+def test_tokenize_keeps_compound_codes_and_their_parts():
+    assert tokenize("See HR-101, v2.3") == ["see", "hr-101", "hr", "101", "v2.3", "v2", "3"]
+
+
+def test_search_ranks_exact_term_matches_first():
+    index = BM25Index()
+    index.add(["a", "b", "c"], [
+        "Leave policy HR-101 covers annual leave",
+        "Expense policy for travel",
+        "Annual report of the team",
+    ])
+
+    results = index.search("HR-101 leave")
+
+    assert results[0][0] == "a"
+    assert "b" not in [id_ for id_, _ in results]
+
+
+def test_add_replaces_and_remove_drops_documents():
+    index = BM25Index()
+    index.add(["a"], ["alpha beta"])
+    index.add(["a"], ["gamma"])
+
+    assert index.search("alpha") == []
+    assert [id_ for id_, _ in index.search("gamma")] == ["a"]
+    assert index.total_length == 1
+
+    index.remove(["a", "missing"])
+    assert len(index) == 0
+    assert index.postings == {}
+    assert index.search("gamma") == []
+
+
+def test_search_only_scores_allowed_ids():
+    index = BM25Index()
+    index.add(["a", "b"], ["budget review", "budget review"])
+
+    assert [id_ for id_, _ in index.search("budget", allowed_ids={"b"})] == ["b"]
+
+
+def test_search_limits_results():
+    index = BM25Index()
+    index.add([str(i) for i in range(5)], ["budget"] * 5)
+
+    assert len(index.search("budget", n_results=3)) == 3
+
+
+def test_reciprocal_rank_fusion_sums_reciprocal_ranks():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]], k=60)
+
+    scores = dict(fused)
+    assert scores["b"] == 1 / 62 + 1 / 61
+    assert scores["a"] == 1 / 61
+    assert scores["d"] == 1 / 62
+    assert [id_ for id_, _ in fused][:2] == ["b", "a"]
+
+
+def test_reciprocal_rank_fusion_of_nothing_is_empty():
+    assert reciprocal_rank_fusion([]) == []
+    assert reciprocal_rank_fusion([[], []]) == []
@@ -0,0 +1,123 @@
+import pytest
+
+import collection_manager
+from collection_manager import SessionCollectionManager
+
+
+class FakeCollection:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeClient:
+    """The part of the ChromaDB client API the manager uses"""
+
+    def __init__(self, names=()):
+        self.collections = {name: FakeCollection(name) for name in names}
+        self.created = []
+        self.listed = 0
+
+    def list_collections(self):
+        self.listed += 1
+        return list(self.collections.values())
+
+    def get_or_create_collection(self, name, embedding_function=None):
+        if name not in self.collections:
+            self.created.append(name)
+            self.collections[name] = FakeCollection(name)
+        return self.collections[name]
+
+    def delete_collection(self, name):
+        del self.collections[name]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(collection_manager.time, "time", clock.time)
+    return clock
+
+
+def make_manager(tmp_path, client, **kwargs):
+    kwargs.setdefault("sweep_interval", 0)
+    return SessionCollectionManager(client, None, registry_path=str(tmp_path / "registry.db"), **kwargs)
+
+
+def test_existing_collections_are_registered_once(tmp_path):
+    client = FakeClient(["session_a", "other"])
+    manager = make_manager(tmp_path, client)
+
+    assert manager.exists("session_a")
+    assert not manager.exists("other")
+    make_manager(tmp_path, client)
+    assert client.listed == 1
+
+
+def test_get_reuses_open_handles_and_evicts_least_recently_used(tmp_path):
+    client = FakeClient()
+    evicted = []
+    manager = make_manager(tmp_path, client, max_handles=2, on_evict=evicted.append)
+
+    first = manager.get("session_a")
+    assert manager.get("session_a") is first
+    manager.get("session_b")
+    manager.get("session_a")
+    manager.get("session_c")
+
+    assert client.created == ["session_a", "session_b", "session_c"]
+    assert evicted == ["session_b"]
+    assert list(manager.handles) == ["session_a", "session_c"]
+    # An evicted collection still exists on disk
+    assert manager.exists("session_b")
+
+
+def test_sweep_closes_idle_handles_and_deletes_expired_collections(tmp_path, clock):
+    client = FakeClient()
+    deleted = []
+    manager = make_manager(tmp_path, client, handle_idle_ttl=60, collection_ttl=3600,
+                           touch_interval=0, on_delete=deleted.append)
+    manager.get("session_old")
+    clock.now += 1800
+    manager.get("session_new")
+
+    clock.now += 120
+    assert manager.sweep() == {"evicted": 2, "deleted": 0}
+
+    clock.now += 1800
+    assert manager.sweep() == {"evicted": 0, "deleted": 1}
+    assert deleted == ["session_old"]
+    assert "session_old" not in client.collections
+    assert manager.exists("session_new")
+
+
+def test_handle_in_use_keeps_collection_from_expiring(tmp_path, clock):
+    client = FakeClient()
+    # Access times are only written to the registry once an hour
+    manager = make_manager(tmp_path, client, handle_idle_ttl=0, collection_ttl=3600, touch_interval=3600)
+    manager.get("session_a")
+    clock.now += 3000
+    manager.get("session_a")
+
+    clock.now += 1000
+    assert manager.sweep()["deleted"] == 0
+
+
+def test_delete_and_recent(tmp_path, clock):
+    manager = make_manager(tmp_path, FakeClient())
+    manager.get("session_a")
+    clock.now += 1
+    manager.get("session_b")
+
+    assert manager.recent() == ["session_b", "session_a"]
+    assert manager.delete("session_a")
+    assert not manager.delete("session_a")
+    assert manager.recent() == ["session_b"]
+    assert manager.stats() == {"open_handles": 1, "max_handles": 1000, "registered_collections": 1}
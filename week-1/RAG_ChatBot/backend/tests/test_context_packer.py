@@ -0,0 +1,118 @@
+import random
+
+from context_packer import ContextPacker, count_tokens
+
+
+def results(documents, distances=None):
+    return {
+        "documents": [documents],
+        "metadatas": [[{"chunk": i} for i in range(len(documents))]],
+        "distances": [distances] if distances is not None else None,
+    }
+
+
+WORDS = "policy leave annual request manager approval team project report benefit payroll office".split()
+
+
+def sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words)) + "."
+
+
+def test_count_tokens():
+    assert count_tokens("") == 0
+    assert count_tokens("abcdefgh") == 2
+    # At least one token per word
+    assert count_tokens("a b c d e") == 5
+
+
+def test_near_duplicates_are_dropped():
+    base = "Annual leave is 25 days and must be requested from your manager two weeks in advance"
+    packer = ContextPacker(token_budget=1000)
+
+    documents, metadatas, _ = packer.pack_chunks(
+        [base, base + " please.", "Expenses are reimbursed monthly through the payroll system once approved"],
+        [{"chunk": 0}, {"chunk": 1}, {"chunk": 2}], None, 1000
+    )
+
+    assert [metadata["chunk"] for metadata in metadatas] == [0, 2]
+
+
+def test_chunks_sharing_few_shingles_are_kept():
+    rng = random.Random(0)
+    first, second = sentence(rng, 20), sentence(rng, 20)
+    packer = ContextPacker(token_budget=1000)
+
+    documents, _, _ = packer.pack_chunks([first, first[:40] + " " + second], [{}, {}], None, 1000)
+
+    assert len(documents) == 2
+
+
+def test_results_beyond_max_distance_are_dropped():
+    packer = ContextPacker(max_distance=0.5)
+
+    documents, _, _ = packer.pack_chunks(
+        ["close match here", "far away match", "keyword only match"], [{}, {}, {}], [0.2, 0.9, None], 1000
+    )
+
+    # Chunks without a distance are never cut off
+    assert documents == ["close match here", "keyword only match"]
+
+
+def test_without_max_distance_every_result_is_kept():
+    documents, _, _ = ContextPacker().pack_chunks(["one thing", "other thing"], [{}, {}], [0.1, 5.0], 1000)
+
+    assert documents == ["one thing", "other thing"]
+
+
+def test_packing_keeps_rank_order_and_skips_chunks_that_do_not_fit():
+    long = "word " * 50
+    packer = ContextPacker()
+
+    documents, metadatas, used = packer.pack_chunks(
+        ["first chunk", long, "third chunk", "last"],
+        [{"chunk": i} for i in range(4)], None, 10
+    )
+
+    assert [metadata["chunk"] for metadata in metadatas] == [0, 2, 3]
+    assert used <= 10
+
+
+def test_pack_never_exceeds_the_budget():
+    rng = random.Random(1)
+    for _ in range(50):
+        budget = rng.randint(20, 400)
+        packer = ContextPacker(token_budget=budget, history_budget=rng.randint(0, budget))
+        documents = [" ".join(sentence(rng) for _ in range(rng.randint(1, 6))) for _ in range(rng.randint(0, 10))]
+        history = "\n\n".join(f"{role}: {sentence(rng)}" for role in ["Human", "Assistant"] * rng.randint(0, 4))
+        fixed = "Answer the question from the context. " + sentence(rng)
+
+        packed = packer.pack(results(documents, [rng.random() for _ in documents]), history, fixed)
+
+        if packed["prompt_tokens"] > count_tokens(fixed):
+            assert packed["prompt_tokens"] <= budget
+        assert packed["history_tokens"] <= packer.history_budget
+        assert count_tokens("\n\n".join(packed["documents"])) <= packed["context_tokens"]
+        # Packed chunks stay in rank order
+        order = [documents.index(document) for document in packed["documents"]]
+        assert order == sorted(order)
+
+
+def test_history_keeps_the_most_recent_turns():
+    history = "Human: first question\n\nAssistant: first answer\n\nHuman: second question\n\nAssistant: second answer"
+    packer = ContextPacker()
+
+    packed, used = packer.pack_history(history, 14)
+
+    assert packed == "Human: second question\n\nAssistant: second answer"
+    assert used <= 14
+    assert packer.pack_history(history, 0) == ("", 0)
+
+
+def test_pack_fills_chunks_after_history():
+    packer = ContextPacker(token_budget=30, history_budget=10)
+
+    packed = packer.pack(results(["alpha beta gamma"] * 1 + ["delta " * 40]), "Human: hi", "Question?")
+
+    assert packed["conversation_history"] == "Human: hi"
+    assert packed["documents"] == ["alpha beta gamma"]
+    assert packed["prompt_tokens"] == packed["history_tokens"] + packed["context_tokens"] + count_tokens("Question?")
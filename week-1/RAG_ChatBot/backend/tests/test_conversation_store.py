@@ -0,0 +1,89 @@
+import pytest
+
+from conversation_store import InMemoryConversationStore, SQLiteConversationStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    stores = []
+
+    def make(**kwargs):
+        if request.param == "memory":
+            store = InMemoryConversationStore(**kwargs)
+        else:
+            kwargs.pop("max_sessions", None)
+            store = SQLiteConversationStore(str(tmp_path / "conversations.db"), evict_interval=0, **kwargs)
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        if isinstance(store, SQLiteConversationStore):
+            store.conn.close()
+
+
+def test_history_keeps_last_messages_in_order(make_store):
+    store = make_store(max_messages=3)
+    for i in range(5):
+        store.append("s1", "user", f"message {i}")
+
+    assert [message.content for message in store.get_messages("s1")] == ["message 2", "message 3", "message 4"]
+    assert [message.seq for message in store.get_messages("s1", max_messages=2)] == [4, 5]
+    assert store.last_seq("s1") == 5
+
+
+def test_unknown_session_is_empty(make_store):
+    store = make_store()
+
+    assert store.get_messages("missing") == []
+    assert store.last_seq("missing") == 0
+    assert not store.has_session("missing")
+
+
+def test_delete_session(make_store):
+    store = make_store()
+    store.append("s1", "user", "hello")
+
+    assert store.delete_session("s1")
+    assert not store.delete_session("s1")
+    assert store.get_messages("s1") == []
+    assert store.session_count() == 0
+
+
+def test_idle_sessions_are_evicted_and_reported(make_store):
+    evicted = []
+    store = make_store(idle_ttl=-1, on_evict=evicted.append)
+    store.create_session("s1")
+
+    store.evict_idle()
+
+    assert "s1" in evicted
+    assert not store.has_session("s1")
+
+
+def test_in_memory_store_evicts_least_recently_used_sessions():
+    evicted = []
+    store = InMemoryConversationStore(max_sessions=2, on_evict=evicted.append)
+    store.append("s1", "user", "a")
+    store.append("s2", "user", "b")
+    # Reading a session counts as using it
+    store.get_messages("s1")
+    store.append("s3", "user", "c")
+
+    assert evicted == ["s2"]
+    assert store.has_session("s1") and store.has_session("s3")
+
+
+def test_sqlite_store_persists_across_instances(tmp_path):
+    path = str(tmp_path / "conversations.db")
+    first = SQLiteConversationStore(path)
+    first.append("s1", "user", "hello")
+    first.append("s1", "assistant", "hi")
+    first.conn.close()
+
+    second = SQLiteConversationStore(path)
+    try:
+        assert [(m.role, m.content) for m in second.get_messages("s1")] == [("user", "hello"), ("assistant", "hi")]
+        assert second.append("s1", "user", "again").seq == 3
+    finally:
+        second.conn.close()
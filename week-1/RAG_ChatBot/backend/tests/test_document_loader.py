@@ -0,0 +1,109 @@
+import random
+
+import pytest
+
+from context_packer import count_tokens
+from document_loader import chunk_id, iter_blocks, iter_chunks
+
+
+def words(text):
+    return len(text.split())
+
+
+def chunks(pieces, **kwargs):
+    return list(iter_chunks(pieces, token_counter=words, **kwargs))
+
+
+TEXT = (
+    "# Leave\n\nAnnual leave is 25 days. Requests go to your manager. Unused days expire in March.\n\n"
+    "Sick leave needs a note after three days, e.g. from a doctor.\n\n"
+    "# Expenses\n\nSubmit receipts within a month. Travel is booked through the portal."
+)
+
+
+def test_blocks_split_paragraphs_and_headings():
+    assert list(iter_blocks([TEXT])) == [
+        ("# Leave", True),
+        ("Annual leave is 25 days. Requests go to your manager. Unused days expire in March.", False),
+        ("Sick leave needs a note after three days, e.g. from a doctor.", False),
+        ("# Expenses", True),
+        ("Submit receipts within a month. Travel is booked through the portal.", False),
+    ]
+
+
+def test_form_feed_starts_a_section_and_whitespace_is_collapsed():
+    assert list(iter_blocks(["Intro  text\n\f Next\n section"])) == [("Intro text", False), ("Next section", True)]
+
+
+@pytest.mark.parametrize("size", [1, 7, 64])
+def test_streamed_pieces_give_the_same_chunks(size):
+    pieces = [TEXT[i:i + size] for i in range(0, len(TEXT), size)]
+
+    assert chunks(pieces, chunk_tokens=12, overlap_tokens=6) == chunks([TEXT], chunk_tokens=12, overlap_tokens=6)
+
+
+def test_chunks_respect_size_and_sections():
+    result = chunks([TEXT], chunk_tokens=12, overlap_tokens=0)
+
+    assert all(words(chunk) <= 12 for chunk in result)
+    assert [chunk for chunk in result if chunk.startswith("#")] == [
+        "# Leave Annual leave is 25 days. Requests go to your manager.", "# Expenses Submit receipts within a month."
+    ]
+    # An abbreviation followed by a lowercase word does not end a sentence
+    assert "Sick leave needs a note after three days, e.g. from a doctor." in result
+
+
+def test_overlap_repeats_trailing_sentences_within_a_section():
+    result = chunks(["One two three. Four five six. Seven eight nine. Ten eleven twelve."],
+                    chunk_tokens=6, overlap_tokens=3)
+
+    assert result == ["One two three. Four five six.", "Four five six. Seven eight nine.",
+                      "Seven eight nine. Ten eleven twelve."]
+
+
+def test_overlap_does_not_cross_headings():
+    result = chunks(["# A\n\nOne two three.\n\n# B\n\nFour five six."], chunk_tokens=5, overlap_tokens=4)
+
+    assert result == ["# A One two three.", "# B Four five six."]
+
+
+def test_long_sentences_are_split_at_words():
+    result = chunks(["a b c d e f g h i j"], chunk_tokens=4, overlap_tokens=0)
+
+    assert result == ["a b c d", "e f g h", "i j"]
+
+
+def test_words_longer_than_a_chunk_are_cut():
+    result = chunks(["a " + "x" * 10 + " b"], chunk_tokens=1, overlap_tokens=0)
+
+    assert result == ["a", "x" * 10, "b"]
+    assert list(iter_chunks(["x" * 10], chunk_tokens=2, overlap_tokens=0)) == ["x" * 8, "xx"]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_chunks_never_exceed_the_budget(seed):
+    # count_tokens is not additive across joined sentences, so check the joined chunks
+    rng = random.Random(seed)
+    words = [rng.choice(["a", "to", "leave", "manager", "approval", "x" * rng.randint(1, 80)]) for _ in range(2000)]
+    text = " ".join(word + ("." if rng.random() < 0.15 else "") for word in words)
+    chunk_tokens = rng.randint(1, 40)
+
+    result = list(iter_chunks([text], chunk_tokens=chunk_tokens, overlap_tokens=rng.randint(0, chunk_tokens)))
+
+    assert result
+    assert all(count_tokens(chunk) <= chunk_tokens for chunk in result)
+    assert "".join(result).replace(" ", "").count("x") >= text.count("x")
+
+
+def test_long_paragraph_is_flushed_at_a_sentence_end():
+    text = "Alpha beta. " * 20 + "Gamma"
+    blocks = list(iter_blocks([text[i:i + 10] for i in range(0, len(text), 10)], max_buffer=64))
+
+    assert "".join(block for block, _ in blocks).replace(" ", "") == text.replace(" ", "")
+    assert all(block.endswith(".") for block, _ in blocks[:-1])
+
+
+def test_chunk_id_is_stable_and_scoped_by_session():
+    assert chunk_id("a.txt", "text") == chunk_id("a.txt", "text")
+    assert chunk_id("a.txt", "text") != chunk_id("a.txt", "other")
+    assert chunk_id("a.txt", "text", "s1").startswith("s1_a.txt_")
@@ -0,0 +1,127 @@
+import pytest
+
+from document_registry import DocumentRegistry
+
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = DocumentRegistry(str(tmp_path / "documents.db"))
+    yield registry
+    registry.close()
+
+
+def test_set_and_get_round_trip(registry):
+    version = registry.set("doc1", {"filename": "a.txt", "status": "queued", "session_id": "s1",
+                                    "sha256": "abc", "chunks": 3})
+
+    status = registry.get("doc1")
+    assert status == {"filename": "a.txt", "status": "queued", "session_id": "s1", "sha256": "abc",
+                      "chunks": 3, "version": version, "document_id": "doc1"}
+    assert registry.get_version("doc1") == version
+    assert registry.get("missing") is None
+
+
+def test_update_merges_fields_and_bumps_version(registry):
+    first = registry.set("doc1", {"filename": "a.txt", "status": "queued", "progress": 0})
+
+    second = registry.update("doc1", {"status": "completed", "progress": 100})
+
+    assert second > first
+    status = registry.get("doc1")
+    assert status["filename"] == "a.txt"
+    assert status["status"] == "completed"
+    assert status["progress"] == 100
+    assert registry.update("missing", {"status": "completed"}) is None
+
+
+def test_changes_feed_returns_each_document_once_in_change_order(registry):
+    registry.set("doc1", {"status": "queued", "session_id": "s1"})
+    registry.set("doc2", {"status": "queued", "session_id": "s2"})
+    since = registry.latest_version()
+    registry.update("doc1", {"status": "processing"})
+    registry.update("doc2", {"status": "completed"})
+    registry.update("doc1", {"status": "completed"})
+
+    changes, cursor = registry.changes(since)
+
+    assert [(change["document_id"], change["status"]) for change in changes] == [
+        ("doc2", "completed"), ("doc1", "completed")
+    ]
+    assert cursor == registry.latest_version()
+    assert registry.changes(cursor) == ([], cursor)
+
+
+def test_changes_feed_filters_by_session_and_pages(registry):
+    for i in range(5):
+        registry.set(f"doc{i}", {"status": "queued", "session_id": "s1" if i % 2 else "s2"})
+
+    changes, cursor = registry.changes(0, session_id="s1")
+    assert [change["document_id"] for change in changes] == ["doc1", "doc3"]
+
+    page, cursor = registry.changes(0, limit=2)
+    assert [change["document_id"] for change in page] == ["doc0", "doc1"]
+    page, cursor = registry.changes(cursor, limit=2)
+    assert [change["document_id"] for change in page] == ["doc2", "doc3"]
+
+
+def test_find_by_sha256_returns_latest_document_with_status(registry):
+    registry.set("old", {"status": "completed", "sha256": "abc"})
+    registry.set("new", {"status": "completed", "sha256": "abc"})
+    registry.set("failed", {"status": "failed", "sha256": "abc"})
+
+    assert registry.find_by_sha256("abc")["document_id"] == "new"
+    assert registry.find_by_sha256("abc", status="failed")["document_id"] == "failed"
+    assert registry.find_by_sha256("def") is None
+    assert registry.find_by_sha256("") is None
+
+
+def test_find_all_by_sha256_matches_any_status(registry):
+    registry.set("queued", {"status": "queued", "sha256": "abc"})
+    registry.set("completed", {"status": "completed", "sha256": "abc"})
+    registry.set("other", {"status": "queued", "sha256": "def"})
+
+    assert [status["document_id"] for status in registry.find_all_by_sha256("abc")] == ["queued", "completed"]
+    assert registry.find_all_by_sha256("") == []
+
+
+def test_list_pages_in_upload_order(registry):
+    for i in range(5):
+        registry.set(f"doc{i}", {"status": "completed" if i < 3 else "queued", "session_id": "s1"})
+    # An update does not move a document in the listing
+    registry.update("doc0", {"progress": 100})
+
+    page, cursor = registry.list(limit=2)
+    assert [status["document_id"] for status in page] == ["doc0", "doc1"]
+    page, cursor = registry.list(limit=2, cursor=cursor)
+    assert [status["document_id"] for status in page] == ["doc2", "doc3"]
+    page, cursor = registry.list(limit=2, cursor=cursor)
+    assert [status["document_id"] for status in page] == ["doc4"]
+    assert cursor is None
+
+    page, _ = registry.list(status="queued")
+    assert [status["document_id"] for status in page] == ["doc3", "doc4"]
+
+
+def test_delete_and_count(registry):
+    registry.set("doc1", {"status": "completed", "session_id": "s1"})
+    registry.set("doc2", {"status": "queued", "session_id": "s1"})
+    registry.set("doc3", {"status": "completed", "session_id": "s2"})
+
+    assert registry.count() == 3
+    assert registry.count(session_id="s1", status="completed") == 1
+    assert registry.delete("doc3")
+    assert not registry.delete("doc3")
+    assert registry.delete_session("s1") == 2
+    assert registry.count() == 0
+
+
+def test_registry_is_shared_between_connections(tmp_path):
+    path = str(tmp_path / "documents.db")
+    writer, reader = DocumentRegistry(path), DocumentRegistry(path)
+    try:
+        version = writer.set("doc1", {"status": "completed"})
+        assert reader.get("doc1")["version"] == version
+        assert writer.set("doc2", {"status": "queued"}) > version
+    finally:
+        writer.close()
+        reader.close()
@@ -0,0 +1,106 @@
+import threading
+
+import numpy as np
+import pytest
+
+from embedding_service import EmbeddingService
+
+
+class FakeModel:
+    """Embeds a text as its length and word count, recording every encode call"""
+
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+        self.lock = threading.Lock()
+
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=False):
+        with self.lock:
+            self.calls.append(list(texts))
+        if self.fail:
+            raise RuntimeError("model failed")
+        return np.array([[len(text), len(text.split())] for text in texts], dtype=np.float32)
+
+
+def make_service(model=None, **kwargs):
+    service = EmbeddingService(**kwargs)
+    # Skip loading a sentence-transformers model
+    service._model = model or FakeModel()
+    return service
+
+
+def test_embed_caches_and_deduplicates():
+    model = FakeModel()
+    service = make_service(model)
+
+    first = service.embed(["a b", "c", "a b"])
+    second = service.embed(["c", "d e f"])
+
+    assert [embedding.tolist() for embedding in first] == [[3, 2], [1, 1], [3, 2]]
+    assert [embedding.tolist() for embedding in second] == [[1, 1], [5, 3]]
+    assert model.calls == [["a b", "c"], ["d e f"]]
+    stats = service.stats()
+    assert (stats["hits"], stats["misses"], stats["model_calls"]) == (1, 3, 2)
+
+
+def test_memory_cache_is_bounded():
+    model = FakeModel()
+    service = make_service(model, cache_size=2)
+
+    service.embed(["a"])
+    service.embed(["b"])
+    service.embed(["c"])
+    service.embed(["a"])
+
+    assert service.stats()["memory_entries"] == 2
+    assert model.calls == [["a"], ["b"], ["c"], ["a"]]
+
+
+def test_disk_cache_is_shared_across_instances(tmp_path):
+    path = str(tmp_path / "embeddings.db")
+    make_service(cache_path=path).embed(["hello world"])
+
+    model = FakeModel()
+    embedding = make_service(model, cache_path=path).embed_query("hello world")
+
+    assert embedding.tolist() == [11, 2]
+    assert model.calls == []
+
+
+def test_cache_key_depends_on_model_and_normalization():
+    plain = make_service()
+    other = make_service(model_name="other")
+    normalized = make_service(normalize_embeddings=True)
+
+    assert len({service._cache_key("text") for service in (plain, other, normalized)}) == 3
+
+
+def test_concurrent_requests_are_batched():
+    model = FakeModel()
+    service = make_service(model, max_wait=0.2, max_batch_size=64)
+    barrier = threading.Barrier(4)
+    results = {}
+
+    def embed(i):
+        barrier.wait()
+        results[i] = service.embed([f"text {i}", "shared"])
+
+    threads = [threading.Thread(target=embed, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(model.calls) < 4
+    # Each text is encoded once even when several callers ask for it
+    assert sorted(text for call in model.calls for text in call) == \
+        sorted({f"text {i}" for i in range(4)} | {"shared"})
+    assert all(results[i][0].tolist() == [6, 2] for i in range(4))
+
+
+def test_model_errors_reach_the_caller():
+    service = make_service(FakeModel(fail=True))
+
+    with pytest.raises(RuntimeError, match="model failed"):
+        service.embed(["a"])
+    assert service.stats()["memory_entries"] == 0
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from index_snapshot import (FORMAT_VERSION, export_collection, iter_collection_batches, read_manifest,
+                            write_manifest)
+
+
+class FakeCollection:
+    """A collection paged like ChromaDB's get(limit, offset); added records are appended"""
+
+    def __init__(self, name, count, dimension=4):
+        self.name = name
+        self.ids = [f"id{i}" for i in range(count)]
+        self.documents = [f"document {i}" for i in range(count)]
+        self.metadatas = [{"source": "a.txt", "chunk": i} for i in range(count)]
+        self.embeddings = np.arange(count * dimension, dtype=np.float32).reshape(count, dimension)
+        self.on_get = None
+
+    def count(self):
+        return len(self.ids)
+
+    def get(self, include, limit, offset):
+        if self.on_get:
+            self.on_get()
+        page = slice(offset, offset + limit)
+        return {"ids": self.ids[page], "documents": self.documents[page],
+                "metadatas": self.metadatas[page], "embeddings": self.embeddings[page]}
+
+    def add(self, id_):
+        self.ids.append(id_)
+        self.documents.append(id_)
+        self.metadatas.append({})
+        self.embeddings = np.vstack([self.embeddings, np.zeros((1, self.embeddings.shape[1]), np.float32)])
+
+
+def read_back(directory, batch_size=1000):
+    ids, documents, metadatas, embeddings = [], [], [], []
+    for batch in iter_collection_batches(directory, batch_size):
+        ids += batch[0]
+        documents += batch[1]
+        metadatas += batch[2]
+        embeddings.append(batch[3])
+    return ids, documents, metadatas, np.concatenate(embeddings) if embeddings else None
+
+
+@pytest.mark.parametrize("count, batch_size", [(10, 3), (10, 5), (1, 1000)])
+def test_export_round_trip(tmp_path, count, batch_size):
+    collection = FakeCollection("session_a", count)
+
+    entry = export_collection(collection, str(tmp_path / "session_a"), batch_size=batch_size)
+
+    assert entry == {"name": "session_a", "count": count, "dimension": 4}
+    ids, documents, metadatas, embeddings = read_back(str(tmp_path / "session_a"), batch_size=4)
+    assert ids == collection.ids
+    assert documents == collection.documents
+    assert metadatas == collection.metadatas
+    np.testing.assert_array_equal(embeddings, collection.embeddings)
+
+
+def test_records_added_during_export_are_left_out(tmp_path):
+    collection = FakeCollection("session_a", 5)
+    collection.on_get = lambda: collection.add(f"new{collection.count()}")
+
+    entry = export_collection(collection, str(tmp_path / "session_a"), batch_size=3)
+
+    assert entry["count"] == 5
+    ids, _, _, embeddings = read_back(str(tmp_path / "session_a"))
+    assert ids == [f"id{i}" for i in range(5)]
+    assert embeddings.shape == (5, 4)
+
+
+def test_mismatched_records_are_rejected(tmp_path):
+    collection = FakeCollection("session_a", 4)
+    collection.documents.pop()
+
+    with pytest.raises(RuntimeError):
+        export_collection(collection, str(tmp_path / "session_a"), batch_size=10)
+
+
+def test_empty_collection_exports_nothing(tmp_path):
+    entry = export_collection(FakeCollection("session_a", 0), str(tmp_path / "session_a"))
+
+    assert entry == {"name": "session_a", "count": 0, "dimension": 0}
+    assert list(iter_collection_batches(str(tmp_path / "session_a"))) == []
+
+
+def test_manifest_round_trip(tmp_path):
+    written = write_manifest(str(tmp_path), [{"name": "session_a", "count": 1, "dimension": 4}],
+                             embedding_model="model")
+
+    manifest = read_manifest(str(tmp_path))
+    assert manifest == written
+    assert manifest["format_version"] == FORMAT_VERSION
+    assert manifest["embedding_model"] == "model"
+
+
+def test_manifest_of_other_format_is_rejected(tmp_path):
+    (tmp_path / "manifest.json").write_text('{"format_version": 0}')
+
+    with pytest.raises(ValueError):
+        read_manifest(str(tmp_path))
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from document_registry import DocumentRegistry
+from embedding_service import EmbeddingService
+
+
+class FakeModel:
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=False):
+        return np.array([[len(text), len(text.split()), 1] for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def database(app_module, tmp_path):
+    service = EmbeddingService()
+    # Skip loading a sentence-transformers model
+    service._model = FakeModel()
+    return app_module.RAGDatabase(
+        db_path=str(tmp_path / "chroma"), registry_path=str(tmp_path / "collections.db"),
+        embedding_service=service, chunk_tokens=8, overlap_tokens=0, hybrid_search=False
+    )
+
+
+SECTIONS = ["Annual leave is 25 days.", "Requests go to your manager.", "Unused days expire in March.",
+            "Sick leave needs a note.", "Expenses are paid monthly."]
+
+
+def ingest(database, path, sections, document_id, uploaded_at):
+    path.write_text("\n\n".join(sections))
+    return database.ingest_document(str(path), source_name="policy.txt", metadata={
+        "document_id": document_id, "uploaded_at": uploaded_at, "sha256": document_id
+    })
+
+
+def test_reingest_only_writes_changed_chunks(database, tmp_path, monkeypatch):
+    path = tmp_path / "policy.txt"
+    ingest(database, path, SECTIONS, "first", 1)
+    before = database.get_document_manifest("policy.txt")
+    assert len(before) == len(SECTIONS)
+
+    collection = database.get_collection_for_session(None)
+    updated = []
+    monkeypatch.setattr(type(collection), "update", lambda self, ids, metadatas: updated.extend(ids))
+    edited = SECTIONS[:2] + ["Unused days expire in April."] + SECTIONS[3:]
+    summary = ingest(database, path, edited, "second", 2)
+    after = database.get_document_manifest("policy.txt")
+
+    assert (summary["added"], summary["removed"], summary["unchanged"]) == (1, 1, 4)
+    assert set(before) - set(after) == {id_ for id_ in before if before[id_]["chunk"] == 2}
+    assert [after[id_]["document_id"] for id_ in set(after) - set(before)] == ["second"]
+    # Per-upload metadata alone does not rewrite the chunks that survived
+    assert updated == []
+    assert all(after[id_] == before[id_] for id_ in set(after) & set(before))
+
+
+def test_moved_chunks_are_updated(database, tmp_path):
+    path = tmp_path / "policy.txt"
+    ingest(database, path, SECTIONS, "first", 1)
+
+    summary = ingest(database, path, SECTIONS[1:], "second", 2)
+    after = database.get_document_manifest("policy.txt")
+
+    assert (summary["added"], summary["removed"]) == (0, 1)
+    assert sorted(metadata["chunk"] for metadata in after.values()) == [0, 1, 2, 3]
+
+
+def test_document_filter_matches_chunks_kept_from_earlier_uploads(app_module, database, tmp_path):
+    path = tmp_path / "policy.txt"
+    registry = DocumentRegistry(str(tmp_path / "documents.db"))
+    for document_id in ("first", "second"):
+        registry.set(document_id, {"filename": "policy.txt", "status": "completed"})
+    ingest(database, path, SECTIONS, "first", 1)
+    ingest(database, path, SECTIONS[:4] + ["Expenses are paid weekly."], "second", 2)
+
+    where = app_module.RetrievalFilters(document_ids=["second"]).to_where(registry)
+    results = database.semantic_search("leave", n_results=10, where=where)
+
+    assert len(results["ids"][0]) == len(SECTIONS)
+    assert app_module.RetrievalFilters(document_ids=["missing"]).to_where(registry) == {
+        "document_id": {"$in": ["missing"]}
+    }
+    registry.close()
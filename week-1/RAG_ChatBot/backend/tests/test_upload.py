@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+from document_registry import DocumentRegistry
+from ingestion import IngestQueueFull
+
+
+class FakeExecutor:
+    """Accepts documents without running them until full is set"""
+
+    def __init__(self):
+        self.full = False
+        self.submitted = []
+
+    def stats(self):
+        return {"workers": 0, "max_queue": 16, "queued": len(self.submitted), "active": 0}
+
+    def submit(self, fn, *args):
+        if self.full:
+            raise IngestQueueFull("Ingestion queue is full")
+        self.submitted.append(args)
+
+
+@pytest.fixture
+def processor(app_module, tmp_path, monkeypatch):
+    registry = DocumentRegistry(str(tmp_path / "documents.db"))
+    processor = app_module.DocumentProcessor(
+        upload_dir=str(tmp_path / "uploads"), ingestion_executor=FakeExecutor(), registry=registry
+    )
+    monkeypatch.setattr(app_module, "document_processor", processor)
+    yield processor
+    registry.close()
+
+
+@pytest.fixture
+def client(app_module):
+    from fastapi.testclient import TestClient
+    # Not entered as a context manager, so the warm start does not run
+    return TestClient(app_module.app)
+
+
+def upload(client, name, content, session_id=None):
+    return client.post("/upload", files=[("files", (name, content, "text/plain"))],
+                       data={"session_id": session_id} if session_id else {})
+
+
+def uploaded_files(processor):
+    return sorted(name for name in os.listdir(processor.upload_dir) if not name.startswith("."))
+
+
+def test_queue_full_removes_an_unshared_upload(client, processor):
+    processor.ingestion_executor.full = True
+
+    response = upload(client, "a.txt", b"Annual leave is 25 days.")
+
+    assert response.status_code == 429
+    assert uploaded_files(processor) == []
+    assert processor.registry.count() == 0
+
+
+def test_queue_full_keeps_a_file_still_queued_for_another_upload(client, processor):
+    assert upload(client, "a.txt", b"Annual leave is 25 days.").json()["documents"][0]["status"] == "accepted"
+    queued_path = processor.ingestion_executor.submitted[0][0]
+
+    processor.ingestion_executor.full = True
+    response = upload(client, "a.txt", b"Annual leave is 25 days.", session_id="s1")
+
+    assert response.status_code == 429
+    assert os.path.exists(queued_path)
+    assert processor.registry.count() == 1
+
+
+def test_queue_full_removes_an_upload_whose_duplicate_has_another_name(client, processor):
+    upload(client, "a.txt", b"Annual leave is 25 days.")
+    document_id = processor.registry.list()[0][0]["document_id"]
+    processor.registry.update(document_id, {"status": "completed"})
+
+    processor.ingestion_executor.full = True
+    assert upload(client, "b.txt", b"Annual leave is 25 days.").status_code == 429
+
+    assert uploaded_files(processor) == [os.path.basename(processor.ingestion_executor.submitted[0][0])]
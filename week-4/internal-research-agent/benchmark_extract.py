@@ -0,0 +1,183 @@
+"""
+Micro-benchmark for Google Docs text extraction and chunking.
+Compares the legacy nested-loop extractor followed by chunk_text with the
+single-pass extract_document followed by chunk_blocks on a synthetic Docs
+API document (or the given JSON files, e.g. saved documents().get results)
+and reports throughput and how many chunks span two sections.
+
+Usage: python benchmark_extract.py [--size-mb 5] [--repeat 3] [files ...]
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+
+from doc_extract import chunk_blocks, extract_document
+
+WORDS = (
+    "policy employee leave annual request manager approval team project report "
+    "benefit payroll office remote schedule training review budget quarter client "
+    "process document system access security update meeting deadline"
+).split()
+
+
+def legacy_extract(doc):
+    """The extractor this module replaced: paragraphs and one level of tables, no structure"""
+    text_parts = []
+    for element in doc.get('body', {}).get('content', []):
+        if 'paragraph' in element:
+            for elem in element['paragraph'].get('elements', []):
+                if 'textRun' in elem:
+                    text_parts.append(elem['textRun'].get('content', ''))
+        elif 'table' in element:
+            for row in element['table'].get('tableRows', []):
+                for cell in row.get('tableCells', []):
+                    for cell_content in cell.get('content', []):
+                        if 'paragraph' in cell_content:
+                            for elem in cell_content['paragraph'].get('elements', []):
+                                if 'textRun' in elem:
+                                    text_parts.append(elem['textRun'].get('content', ''))
+    return ''.join(text_parts)
+
+
+def chunk_text(text: str, max_chars: int = 1000, overlap_chars: int = 150) -> list:
+    """
+    The chunker chunk_blocks replaced: chunks of at most max_chars, broken at
+    paragraph and sentence boundaries of the plain text, each repeating up to
+    overlap_chars of trailing sentences from the previous one
+    """
+    sentences = [
+        sentence.strip()
+        for paragraph in re.split(r"\n\s*\n|\n", text)
+        for sentence in re.split(r"(?<=[.!?])\s+", paragraph)
+        if sentence.strip()
+    ]
+    chunks, current, size = [], [], 0
+    for sentence in sentences:
+        # Sentences longer than a chunk are split hard
+        while len(sentence) > max_chars:
+            head, sentence = sentence[:max_chars], sentence[max_chars:]
+            if current:
+                chunks.append(" ".join(current))
+                current, size = [], 0
+            chunks.append(head)
+        if current and size + len(sentence) + 1 > max_chars:
+            chunks.append(" ".join(current))
+            overlap, overlap_size = [], 0
+            for previous in reversed(current):
+                if overlap_size + len(previous) > overlap_chars:
+                    break
+                overlap.insert(0, previous)
+                overlap_size += len(previous) + 1
+            current, size = overlap, overlap_size
+        current.append(sentence)
+        size += len(sentence) + 1
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def _paragraph(text, style=None, bullet=None):
+    paragraph = {"elements": [{"textRun": {"content": text + "\n"}}]}
+    if style:
+        paragraph["paragraphStyle"] = {"namedStyleType": style}
+    if bullet:
+        paragraph["bullet"] = bullet
+    return {"paragraph": paragraph}
+
+
+def _sentences(rng, count):
+    return " ".join(
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 24))).capitalize() + "."
+        for _ in range(count)
+    )
+
+
+def synthetic_document(size_bytes: int, seed: int = 0):
+    """Build a Docs API document of headings, paragraphs, lists and (nested) tables; returns (doc, sections)"""
+    rng = random.Random(seed)
+    content = []
+    size = 0
+    section = 0
+    while size < size_bytes:
+        section += 1
+        content.append(_paragraph(f"Section {section}", "HEADING_1"))
+        for subsection in range(rng.randint(1, 3)):
+            content.append(_paragraph(f"Topic {section}.{subsection}", "HEADING_2"))
+            for _ in range(rng.randint(1, 4)):
+                text = _sentences(rng, rng.randint(3, 8))
+                content.append(_paragraph(text))
+                size += len(text)
+            for level in (0, 1, 1, 0):
+                text = _sentences(rng, 1)
+                content.append(_paragraph(text, bullet={"listId": "list", "nestingLevel": level}))
+                size += len(text)
+            if rng.random() < 0.3:
+                inner = {"table": {"tableRows": [
+                    {"tableCells": [{"content": [_paragraph(rng.choice(WORDS))]} for _ in range(2)]}
+                ]}}
+                content.append({"table": {"tableRows": [
+                    {"tableCells": [
+                        {"content": [_paragraph(_sentences(rng, 1))]},
+                        {"content": [_paragraph(_sentences(rng, 1)), inner]}
+                    ]}
+                    for _ in range(3)
+                ]}})
+                size += 600
+    return {"body": {"content": content}}, section
+
+
+def run(name: str, pipeline, doc, repeat: int, size_mb: float):
+    best_extract = best_chunk = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        extracted = pipeline[0](doc)
+        middle = time.perf_counter()
+        chunks = pipeline[1](extracted)
+        end = time.perf_counter()
+        best_extract, best_chunk = min(best_extract, middle - start), min(best_chunk, end - middle)
+    total = best_extract + best_chunk
+    print(f"{name:<16} extract {best_extract * 1000:8.1f} ms  chunk {best_chunk * 1000:8.1f} ms  "
+          f"{size_mb / total:6.1f} MB/s  {len(chunks):6d} chunks")
+    return chunks
+
+
+SYNTHETIC_HEADING = re.compile(r"\b(?:Section \d+|Topic \d+\.\d+)\b")
+
+
+def mixed_sections(chunks):
+    """Fraction of chunks containing more than one heading of the synthetic document"""
+    return sum(1 for chunk in chunks if len(SYNTHETIC_HEADING.findall(chunk)) > 1) / len(chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="Docs API JSON documents to use instead of a synthetic one")
+    parser.add_argument("--size-mb", type=float, default=5.0, help="Text size of the synthetic document")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per pipeline; the best is reported")
+    args = parser.parse_args()
+
+    if args.files:
+        documents = []
+        for path in args.files:
+            with open(path) as f:
+                documents.append((path, json.load(f), False))
+    else:
+        doc, sections = synthetic_document(int(args.size_mb * 1e6))
+        documents = [(f"synthetic {args.size_mb:g} MB, {sections} sections", doc, True)]
+
+    for name, doc, synthetic in documents:
+        size_mb = len(extract_document(doc)[0].encode("utf-8")) / 1e6
+        print(f"\n{name}: {size_mb:.1f} MB of text")
+        legacy = run("legacy", (legacy_extract, chunk_text), doc, args.repeat, size_mb)
+        current = run("extract_document", (extract_document, lambda extracted: chunk_blocks(*extracted)),
+                      doc, args.repeat, size_mb)
+        if synthetic:
+            print(f"chunks spanning sections: legacy {mixed_sections(legacy):.1%}, "
+                  f"extract_document {mixed_sections([chunk['text'] for chunk in current]):.1%}")
+
+
+if __name__ == "__main__":
+    main()
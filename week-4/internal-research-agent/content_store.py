@@ -0,0 +1,94 @@
+"""
+Local store of extracted Google Docs text.
+Holds the text of every synced document with its Drive modifiedTime, plus
+small pieces of sync state such as the Drive changes page token, so reads
+are served locally and only changed documents are fetched again.
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Iterator, Optional
+
+
+class ContentStore:
+    def __init__(self, path: str = ".gdocs_store.db"):
+        """Open (or create) the store in the SQLite database at path"""
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                modified_time TEXT,
+                text TEXT NOT NULL,
+                synced_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS sync_state (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        self.conn.commit()
+
+    def get(self, doc_id: str) -> Optional[dict]:
+        """Get a stored document as a dict with doc_id, name, modified_time, text and synced_at"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT doc_id, name, modified_time, text, synced_at FROM documents WHERE doc_id = ?", (doc_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("doc_id", "name", "modified_time", "text", "synced_at"), row))
+
+    def put(self, doc_id: str, name: str, modified_time: Optional[str], text: str):
+        """Store or replace the text of a document"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO documents (doc_id, name, modified_time, text, synced_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (doc_id, name, modified_time, text, time.time())
+            )
+
+    def remove(self, doc_ids: Iterable[str]) -> int:
+        """Remove documents; returns the number removed"""
+        doc_ids = [(doc_id,) for doc_id in doc_ids]
+        if not doc_ids:
+            return 0
+        with self.lock, self.conn:
+            return self.conn.executemany("DELETE FROM documents WHERE doc_id = ?", doc_ids).rowcount
+
+    def versions(self) -> Dict[str, str]:
+        """Get the stored modifiedTime of every document"""
+        with self.lock:
+            return dict(self.conn.execute("SELECT doc_id, modified_time FROM documents"))
+
+    def iter_documents(self) -> Iterator[dict]:
+        """Yield every stored document"""
+        with self.lock:
+            doc_ids = [row[0] for row in self.conn.execute("SELECT doc_id FROM documents")]
+        for doc_id in doc_ids:
+            document = self.get(doc_id)
+            if document is not None:
+                yield document
+
+    def get_state(self, key: str) -> Optional[str]:
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, key: str, value: Optional[str]):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, value))
+
+    def stats(self) -> dict:
+        with self.lock:
+            documents, last_synced = self.conn.execute(
+                "SELECT COUNT(*), MAX(synced_at) FROM documents"
+            ).fetchone()
+        return {"documents": documents, "last_synced": last_synced}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,214 @@
+"""
+Structure-preserving text extraction from Google Docs API documents.
+The document body is walked once, iteratively, into blocks (headings, list
+items, paragraphs and table rows, tables nested to any depth) rendered as
+lines of Markdown-like text. Each block records its character offsets in
+the text and the heading path of its section, so chunks can be cut at
+block boundaries within a section without splitting the text again.
+"""
+
+import bisect
+import re
+from typing import Any, Dict, List, Tuple
+
+# Stored with synced text; documents extracted by another version are fetched again
+EXTRACT_VERSION = 2
+
+HEADING_LEVELS = {"TITLE": 1, **{f"HEADING_{level}": level for level in range(1, 7)}}
+ORDERED_GLYPHS = {"DECIMAL", "ZERO_DECIMAL", "ALPHA", "UPPER_ALPHA", "ROMAN", "UPPER_ROMAN"}
+
+_HEADING_LINE = re.compile(r"(#{1,6}) (.*)")
+_LIST_LINE = re.compile(r"\s*(?:- |\d+\. )")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_CELL_SEPARATOR = " | "
+
+# Stack markers for the end of a table cell, row and table
+_CELL_END, _ROW_END, _TABLE_END = object(), object(), object()
+
+
+def _paragraph_text(paragraph: Dict[str, Any]) -> str:
+    elements = paragraph.get("elements", [])
+    if len(elements) == 1:
+        # Most paragraphs are a single run
+        text = elements[0].get("textRun", {}).get("content", "")
+    else:
+        text = "".join(element["textRun"].get("content", "") for element in elements if "textRun" in element)
+    # Soft line breaks (vertical tabs) and the closing newline keep a block on one line
+    return text.replace("\x0b", " ").replace("\n", " ").strip()
+
+
+def _section(path: List[str]) -> str:
+    return " > ".join(path)
+
+
+def extract_document(doc: Dict[str, Any]) -> Tuple[str, List[dict]]:
+    """
+    Extract the text of a document and its blocks. Headings are rendered as
+    "#" lines, list items as indented "- " or "1. " lines and table rows as
+    cells joined by " | " (nested tables are flattened into their cell).
+    Returns (text, blocks); each block is a dict with kind ("heading",
+    "paragraph", "list_item" or "table_row"), start and end offsets in the
+    text and section (the heading path, e.g. "Policies > Leave").
+    """
+    lists = doc.get("lists", {})
+    lines, blocks = [], []
+    offset = 0
+    path, section = [], ""
+    list_counters = {}
+
+    def add(kind: str, line: str):
+        nonlocal offset
+        blocks.append({"kind": kind, "start": offset, "end": offset + len(line), "section": section})
+        lines.append(line)
+        offset += len(line) + 1
+
+    stack = list(reversed(doc.get("body", {}).get("content", [])))
+    table_depth = 0
+    cell_parts, row_cells = [], []
+    while stack:
+        item = stack.pop()
+
+        if item is _CELL_END:
+            if table_depth == 1:
+                row_cells.append(" ".join(cell_parts))
+                cell_parts = []
+        elif item is _ROW_END:
+            if table_depth == 1:
+                if any(row_cells):
+                    add("table_row", _CELL_SEPARATOR.join(row_cells))
+                row_cells = []
+        elif item is _TABLE_END:
+            table_depth -= 1
+
+        elif "paragraph" in item:
+            paragraph = item["paragraph"]
+            text = _paragraph_text(paragraph)
+            if not text:
+                continue
+            if table_depth:
+                cell_parts.append(text)
+                continue
+
+            style = paragraph.get("paragraphStyle", {}).get("namedStyleType")
+            bullet = paragraph.get("bullet")
+            if style in HEADING_LEVELS:
+                level = HEADING_LEVELS[style]
+                path = path[:level - 1] + [text]
+                section = _section(path)
+                list_counters.clear()
+                add("heading", "#" * level + " " + text)
+            elif bullet is not None:
+                list_id, level = bullet.get("listId"), bullet.get("nestingLevel", 0)
+                nesting_levels = lists.get(list_id, {}).get("listProperties", {}).get("nestingLevels", [])
+                glyph = nesting_levels[level].get("glyphType") if level < len(nesting_levels) else None
+                # Items of a deeper level start counting again after an item of this one
+                if list_counters:
+                    for key in [key for key in list_counters if key[0] == list_id and key[1] > level]:
+                        del list_counters[key]
+                if glyph in ORDERED_GLYPHS:
+                    list_counters[list_id, level] = list_counters.get((list_id, level), 0) + 1
+                    marker = f"{list_counters[list_id, level]}. "
+                else:
+                    marker = "- "
+                add("list_item", "  " * level + marker + text)
+            else:
+                add("paragraph", text)
+
+        elif "table" in item:
+            table_depth += 1
+            stack.append(_TABLE_END)
+            for row in reversed(item["table"].get("tableRows", [])):
+                stack.append(_ROW_END)
+                for cell in reversed(row.get("tableCells", [])):
+                    stack.append(_CELL_END)
+                    stack.extend(reversed(cell.get("content", [])))
+        # Tables of contents repeat the headings; section breaks carry no text
+
+    return "\n".join(lines), blocks
+
+
+def parse_blocks(text: str) -> List[dict]:
+    """Recover the blocks of text rendered by extract_document (e.g. from the content store)"""
+    blocks, path, section = [], [], ""
+    offset = 0
+    for line in text.split("\n"):
+        start, offset = offset, offset + len(line) + 1
+        if not line.strip():
+            continue
+        heading = _HEADING_LINE.fullmatch(line) if line[0] == "#" else None
+        if heading:
+            path = path[:len(heading.group(1)) - 1] + [heading.group(2)]
+            section = _section(path)
+            kind = "heading"
+        elif _LIST_LINE.match(line):
+            kind = "list_item"
+        elif _CELL_SEPARATOR in line:
+            kind = "table_row"
+        else:
+            kind = "paragraph"
+        blocks.append({"kind": kind, "start": start, "end": start + len(line), "section": section})
+    return blocks
+
+
+def _split_block(text: str, block: dict, max_chars: int, first_chars: int = None) -> List[dict]:
+    """
+    Split a block into pieces of at most max_chars (first_chars for the first
+    one) at sentence boundaries, hard within longer sentences
+    """
+    pieces = []
+    start = block["start"]
+    limit = first_chars or max_chars
+    breaks = [match.end() for match in _SENTENCE_END.finditer(text, block["start"], block["end"])]
+    for end in breaks + [block["end"]]:
+        while end - start > limit:
+            # Last sentence boundary that fits, else a hard split
+            i = bisect.bisect_right(breaks, start + limit) - 1
+            cut = breaks[i] if i >= 0 and breaks[i] > start else start + limit
+            pieces.append({**block, "start": start, "end": cut})
+            start = cut
+            limit = max_chars
+        if end == block["end"]:
+            pieces.append({**block, "start": start, "end": end})
+    return pieces
+
+
+def chunk_blocks(text: str, blocks: List[dict], max_chars: int = 1000, overlap_chars: int = 150) -> List[dict]:
+    """
+    Pack consecutive blocks of the same section into chunks of at most
+    max_chars; a chunk never spans two sections and repeats up to
+    overlap_chars of trailing blocks from the previous chunk of its section.
+    A heading starts the chunk of the text that follows it.
+    Returns dicts with text (text[start:end]), start, end and section.
+    """
+    chunks, current = [], []
+
+    def flush():
+        start, end = current[0]["start"], current[-1]["end"]
+        chunks.append({"text": text[start:end], "start": start, "end": end, "section": current[0]["section"]})
+
+    for block in blocks:
+        limit = max_chars
+        if current and block["section"] == current[0]["section"] \
+                and all(previous["kind"] == "heading" for previous in current):
+            # A heading alone is not worth a chunk, so the block's first piece leaves
+            # room for it (unless the heading takes more than half a chunk)
+            room = max_chars - (block["start"] - current[0]["start"])
+            if room >= max_chars // 2:
+                limit = room
+        pieces = _split_block(text, block, max_chars, limit) if block["end"] - block["start"] > limit else [block]
+        for piece in pieces:
+            if current and (piece["section"] != current[0]["section"] or piece["end"] - current[0]["start"] > max_chars):
+                same_section = piece["section"] == current[0]["section"]
+                flush()
+                overlap = []
+                if same_section:
+                    for previous in reversed(current):
+                        if current[-1]["end"] - previous["start"] > overlap_chars \
+                                or piece["end"] - previous["start"] > max_chars:
+                            break
+                        overlap.insert(0, previous)
+                current = overlap
+            current.append(piece)
+    if current:
+        flush()
+    return chunks
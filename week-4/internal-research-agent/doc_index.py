@@ -0,0 +1,204 @@
+"""
+Persistent local vector index of Google Docs content.
+Each document is stored as text chunks (with their section and character
+offsets when known) and their embeddings, keyed by document ID and Drive
+modifiedTime, so a document is only re-embedded when
+it changes. Embeddings are kept in SQLite and loaded into one normalized
+matrix, so a search is a single matrix-vector product over all chunks.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from collections import Counter
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = os.getenv("GDOCS_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+
+
+@lru_cache(maxsize=None)
+def _load_model(model_name: str):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+def embed_texts(texts: List[str], model_name: str = EMBEDDING_MODEL_NAME) -> np.ndarray:
+    """Embed texts with a sentence-transformers model (loaded on first use)"""
+    return np.asarray(_load_model(model_name).encode(texts, batch_size=32), dtype=np.float32)
+
+
+class DocumentIndex:
+    def __init__(self, path: str = ".gdocs_index.db", embed: Callable[[List[str]], np.ndarray] = None):
+        """
+        Open (or create) the index stored in the SQLite database at path.
+        embed(texts) returns one embedding row per text; by default the
+        sentence-transformers model EMBEDDING_MODEL_NAME is used.
+        """
+        self.embed = embed or embed_texts
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                modified_time TEXT
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                doc_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                section TEXT,
+                start_offset INTEGER,
+                end_offset INTEGER,
+                PRIMARY KEY (doc_id, position)
+            );
+        """)
+        # Indexes created before chunks carried sections and offsets
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(chunks)")}
+        for column, column_type in (("section", "TEXT"), ("start_offset", "INTEGER"), ("end_offset", "INTEGER")):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE chunks ADD COLUMN {column} {column_type}")
+        self.conn.commit()
+
+        # Search matrix and the (doc_id, position, text, section, start, end) row of each of its rows, loaded on demand
+        self._matrix = None
+        self._rows = []
+        # Document names by doc_id, loaded with the matrix
+        self._names = {}
+
+    def versions(self) -> Dict[str, str]:
+        """Get the indexed modifiedTime of every document"""
+        with self.lock:
+            return dict(self.conn.execute("SELECT doc_id, modified_time FROM documents"))
+
+    def needs_update(self, doc_id: str, modified_time: Optional[str]) -> bool:
+        """Check whether a document is missing from the index or indexed at another modifiedTime"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT modified_time FROM documents WHERE doc_id = ?", (doc_id,)
+            ).fetchone()
+        return row is None or row[0] != modified_time
+
+    def upsert(self, doc_id: str, name: str, modified_time: Optional[str],
+               chunks: List[Union[str, dict]]) -> int:
+        """
+        Replace the indexed chunks of a document; returns the number of chunks
+        indexed. Chunks are strings or dicts with text and optionally section,
+        start and end; a chunk's section is embedded along with its text.
+        """
+        chunks = [chunk if isinstance(chunk, dict) else {"text": chunk} for chunk in chunks]
+        texts = [
+            f"{chunk['section']}\n{chunk['text']}" if chunk.get("section") else chunk["text"]
+            for chunk in chunks
+        ]
+        embeddings = self.embed(texts) if texts else np.zeros((0, 0), dtype=np.float32)
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+            self.conn.executemany(
+                "INSERT INTO chunks (doc_id, position, text, embedding, section, start_offset, end_offset) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (doc_id, i, chunk["text"], embedding.tobytes(), chunk.get("section"), chunk.get("start"), chunk.get("end"))
+                    for i, (chunk, embedding) in enumerate(zip(chunks, embeddings))
+                ]
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO documents (doc_id, name, modified_time) VALUES (?, ?, ?)",
+                (doc_id, name, modified_time)
+            )
+            self._matrix = None
+        return len(chunks)
+
+    def remove(self, doc_ids: Iterable[str]) -> int:
+        """Remove documents from the index; returns the number removed"""
+        doc_ids = [(doc_id,) for doc_id in doc_ids]
+        if not doc_ids:
+            return 0
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM chunks WHERE doc_id = ?", doc_ids)
+            removed = self.conn.executemany("DELETE FROM documents WHERE doc_id = ?", doc_ids).rowcount
+            self._matrix = None
+        return removed
+
+    def _load(self):
+        """Build the normalized search matrix from the stored embeddings and load the document names"""
+        self._names = dict(self.conn.execute("SELECT doc_id, name FROM documents"))
+        rows = self.conn.execute(
+            "SELECT doc_id, position, text, section, start_offset, end_offset, embedding "
+            "FROM chunks ORDER BY doc_id, position"
+        ).fetchall()
+        self._rows = [row[:-1] for row in rows]
+        if not rows:
+            self._matrix = np.zeros((0, 0), dtype=np.float32)
+            return
+        matrix = np.stack([np.frombuffer(embedding, dtype=np.float32) for *_, embedding in rows])
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self._matrix = matrix / np.where(norms == 0, 1, norms)
+
+    def search(self, query: str, max_results: int = 5, max_per_document: int = 3) -> List[dict]:
+        """
+        Return the chunks most similar to query, best first, as dicts with
+        doc_id, name, position, text, section, start, end (None for chunks
+        indexed without them) and score (cosine similarity); at most
+        max_per_document chunks are returned per document
+        """
+        query_embedding = np.asarray(self.embed([query]), dtype=np.float32)[0]
+        norm = np.linalg.norm(query_embedding)
+        if norm:
+            query_embedding = query_embedding / norm
+
+        with self.lock:
+            if self._matrix is None:
+                self._load()
+            matrix, rows, names = self._matrix, self._rows, self._names
+        if not rows:
+            return []
+
+        scores = matrix @ query_embedding
+        # Usually enough candidates to fill max_results after the per-document limit
+        n_candidates = min(len(rows), max_results * max_per_document)
+        candidates = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+        candidates = candidates[np.argsort(-scores[candidates])]
+        if n_candidates < len(rows):
+            counts = Counter(rows[i][0] for i in candidates)
+            if sum(min(count, max_per_document) for count in counts.values()) < max_results:
+                candidates = np.argsort(-scores)
+
+        results, per_document = [], {}
+        for i in candidates:
+            doc_id, position, text, section, start, end = rows[i]
+            if per_document.get(doc_id, 0) >= max_per_document:
+                continue
+            per_document[doc_id] = per_document.get(doc_id, 0) + 1
+            results.append({
+                "doc_id": doc_id,
+                "name": names.get(doc_id, doc_id),
+                "position": position,
+                "text": text,
+                "section": section,
+                "start": start,
+                "end": end,
+                "score": float(scores[i])
+            })
+            if len(results) >= max_results:
+                break
+        return results
+
+    def stats(self) -> dict:
+        with self.lock:
+            documents = self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            chunks = self.conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        return {"documents": documents, "chunks": chunks}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
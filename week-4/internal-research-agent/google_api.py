@@ -0,0 +1,132 @@
+"""
+Concurrent, rate-limited execution of Google API requests.
+googleapiclient requests are blocking and their default httplib2 transport
+is not thread-safe, so requests run on a bounded thread pool, each worker
+thread with its own authorized HTTP client (carrying the socket timeout),
+and a token bucket keeps the request rate, retries included, under the
+API quota.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List
+
+import google_auth_httplib2
+import httplib2
+from googleapiclient.errors import HttpError
+
+# 403 reasons Google APIs use for quota errors, which are retried like 429
+_RATE_LIMIT_REASONS = (b"rateLimitExceeded", b"userRateLimitExceeded")
+
+
+def _is_retryable(error: HttpError) -> bool:
+    """Whether a failed request may succeed when sent again (rate limited or a server error)"""
+    status = int(error.resp.status)
+    if status == 429 or status >= 500:
+        return True
+    return status == 403 and any(reason in (error.content or b"") for reason in _RATE_LIMIT_REASONS)
+
+
+class RateLimiter:
+    def __init__(self, rate: float, burst: int = None):
+        """
+        Token bucket allowing rate requests per second on average and bursts of
+        up to burst requests (at least one; by default one second's worth).
+        A rate of 0 disables the limit.
+        """
+        self.rate = rate
+        self.capacity = max(1, int(rate) if burst is None else burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class GoogleApiExecutor:
+    def __init__(self, credentials=None, max_workers: int = 8, timeout: float = 30,
+                 requests_per_second: float = 5, num_retries: int = 2):
+        """
+        Run requests on up to max_workers threads, at most requests_per_second
+        on average. Each HTTP attempt times out after timeout seconds; timeouts,
+        429 and 5xx responses are retried num_retries times with backoff, each
+        retry taking its turn in the rate limit. Without credentials, requests
+        use the HTTP client of the service they were built from.
+        """
+        self.credentials = credentials
+        self.timeout = timeout
+        self.num_retries = num_retries
+        self.limiter = RateLimiter(requests_per_second)
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="google-api")
+        self.local = threading.local()
+
+    def _http(self):
+        """The calling thread's authorized HTTP client"""
+        http = getattr(self.local, "http", None)
+        if http is None:
+            http = google_auth_httplib2.AuthorizedHttp(self.credentials, http=httplib2.Http(timeout=self.timeout))
+            self.local.http = http
+        return http
+
+    def execute_sync(self, request) -> Any:
+        """Execute a request on the calling thread; every attempt, retries included, is rate limited"""
+        for attempt in range(self.num_retries + 1):
+            if attempt:
+                # The randomized exponential backoff googleapiclient uses for its own retries
+                time.sleep(random.random() * 2 ** attempt)
+            self.limiter.acquire()
+            try:
+                if self.credentials is None:
+                    return request.execute()
+                return request.execute(http=self._http())
+            except HttpError as e:
+                if attempt == self.num_retries or not _is_retryable(e):
+                    raise
+            except (OSError, httplib2.ServerNotFoundError):
+                # Timeouts and dropped connections
+                if attempt == self.num_retries:
+                    raise
+
+    async def execute(self, request) -> Any:
+        """Execute a request on the pool without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        # Generous deadline covering the retries and their backoff; each attempt is
+        # also bounded by the socket timeout
+        return await asyncio.wait_for(
+            loop.run_in_executor(self.pool, self.execute_sync, request),
+            timeout=self.timeout * (self.num_retries + 1) + 2 ** (self.num_retries + 1)
+        )
+
+    def execute_many(self, requests: List) -> List[Any]:
+        """
+        Execute requests concurrently on the pool, blocking until all finish.
+        Returns results in request order; a failed request's entry is its exception.
+        """
+        futures = [self.pool.submit(self.execute_sync, request) for request in requests]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
@@ -4,10 +4,14 @@ MCP Server for Google Docs integration
 Provides tools and resources for accessing Google Drive documents
 """
 
+import asyncio
+import base64
+import bisect
 import json
 import os
 import logging
-from typing import Any, Dict, List, Optional, Sequence
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
 from urllib.parse import urlparse
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
@@ -18,6 +22,11 @@ import mcp.types as types
 from mcp.server.stdio import stdio_server
 from dotenv import load_dotenv
 
+from content_store import ContentStore
+from doc_extract import EXTRACT_VERSION, chunk_blocks, extract_document, parse_blocks
+from doc_index import DocumentIndex
+from google_api import GoogleApiExecutor
+
 load_dotenv()
 
 # Configure logging
@@ -27,12 +36,66 @@ logger = logging.getLogger(__name__)
 # Environment variables
 GOOGLE_CREDS = os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON")
 GDRIVE_FOLDER_ID = os.getenv("GDRIVE_FOLDER_ID")
+GDOCS_INDEX_PATH = os.getenv("GDOCS_INDEX_PATH", ".gdocs_index.db")
+GDOCS_STORE_PATH = os.getenv("GDOCS_STORE_PATH", ".gdocs_store.db")
+# Seconds between polls of the Drive changes feed
+GDOCS_SYNC_INTERVAL = float(os.getenv("GDOCS_SYNC_INTERVAL", 60))
+GOOGLE_DOC_MIME_TYPE = "application/vnd.google-apps.document"
+# Google API requests: concurrent requests, seconds per attempt and average rate
+# (the Docs API allows 300 read requests per minute per user by default)
+GOOGLE_API_MAX_WORKERS = int(os.getenv("GOOGLE_API_MAX_WORKERS", 8))
+GOOGLE_API_TIMEOUT = float(os.getenv("GOOGLE_API_TIMEOUT", 30))
+GOOGLE_API_REQUESTS_PER_SECOND = float(os.getenv("GOOGLE_API_REQUESTS_PER_SECOND", 5))
+# Seconds a cached folder listing is served before it is listed again
+GDOCS_MANIFEST_TTL = float(os.getenv("GDOCS_MANIFEST_TTL", 300))
+GDOCS_MANIFEST_MAX_FOLDERS = 32
+MAX_PAGE_SIZE = 1000
+
+def _documents_query(folder_id: Optional[str]) -> str:
+    """Drive query for the Google Docs in a folder, or anywhere without folder_id"""
+    query = f"mimeType='{GOOGLE_DOC_MIME_TYPE}' and trashed=false"
+    if folder_id:
+        query = f"'{folder_id}' in parents and " + query
+    return query
+
+def _encode_cursor(file: Dict[str, Any]) -> str:
+    """Opaque cursor for the position after a file in (name, id) order"""
+    return base64.urlsafe_b64encode(json.dumps([file['name'], file['id']]).encode()).decode()
+
+def _page(manifest: dict, cursor: Optional[str], page_size: int):
+    """
+    Get the page of manifest files after cursor and the cursor of the next page
+    (None on the last page). Cursors are positions in (name, id) order, so pages
+    stay consistent when the manifest is refreshed between calls.
+    """
+    start = 0
+    if cursor:
+        try:
+            key = tuple(json.loads(base64.urlsafe_b64decode(cursor.encode())))
+        except (ValueError, TypeError):
+            raise ValueError(f"Invalid cursor: {cursor}")
+        start = bisect.bisect_right(manifest['keys'], key)
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    page = manifest['files'][start:start + page_size]
+    next_cursor = _encode_cursor(page[-1]) if start + page_size < len(manifest['files']) else None
+    return page, next_cursor
 
 class GoogleDocsServer:
     def __init__(self):
         self.server = Server(name="google-docs")
         self.drive_service = None
         self.docs_service = None
+        self.api = None
+        # Extracted text of every document and a vector index of its chunks,
+        # kept current by the sync loop so reads need no API calls
+        self.store = ContentStore(GDOCS_STORE_PATH)
+        self.index = DocumentIndex(GDOCS_INDEX_PATH)
+        self._sync_lock = asyncio.Lock()
+        self._synced = False
+        self._sync_task = None
+        # Cached listing of every document per folder, refreshed after GDOCS_MANIFEST_TTL
+        self._folder_manifests = {}
+        self._manifest_lock = asyncio.Lock()
         self._initialize_services()
         self._setup_handlers()
     
@@ -62,6 +125,13 @@ class GoogleDocsServer:
             
             self.drive_service = build('drive', 'v3', credentials=credentials)
             self.docs_service = build('docs', 'v1', credentials=credentials)
+            # Requests are executed on a bounded, rate-limited pool, never on the event loop
+            self.api = GoogleApiExecutor(
+                credentials,
+                max_workers=GOOGLE_API_MAX_WORKERS,
+                timeout=GOOGLE_API_TIMEOUT,
+                requests_per_second=GOOGLE_API_REQUESTS_PER_SECOND
+            )
             logger.info("Google services initialized successfully")
             
         except Exception as e:
@@ -77,18 +147,8 @@ class GoogleDocsServer:
             try:
                 resources = []
                 
-                # List documents in specified folder
-                query = f"'{GDRIVE_FOLDER_ID}' in parents and mimeType='application/vnd.google-apps.document'"
-                if not GDRIVE_FOLDER_ID:
-                    query = "mimeType='application/vnd.google-apps.document'"
-                
-                results = self.drive_service.files().list(
-                    q=query,
-                    pageSize=50,
-                    fields="nextPageToken, files(id, name, modifiedTime, description)"
-                ).execute()
-                
-                files = results.get('files', [])
+                # Every document in the folder, from the cached manifest
+                files = (await self._get_folder_manifest(GDRIVE_FOLDER_ID))['files']
                 
                 for file in files:
                     resources.append(types.Resource(
@@ -110,15 +170,15 @@ class GoogleDocsServer:
             """Read content from a Google Doc"""
             try:
                 # Parse document ID from URI
-                parsed = urlparse(uri)
-                if parsed.scheme != "gdocs" or not parsed.path.startswith("/document/"):
+                # gdocs://document/<id> parses with "document" as the host
+                parsed = urlparse(str(uri))
+                if parsed.scheme != "gdocs" or parsed.netloc != "document" or not parsed.path.strip("/"):
                     raise ValueError(f"Invalid URI format: {uri}")
                 
                 doc_id = parsed.path.split("/")[-1]
                 
                 # Get document content
-                doc = self.docs_service.documents().get(documentId=doc_id).execute()
-                content = self._extract_text_from_doc(doc)
+                content = (await self._read_document(doc_id))['text']
                 
                 logger.info(f"Read document {doc_id}, content length: {len(content)}")
                 return content
@@ -146,8 +206,12 @@ class GoogleDocsServer:
                             },
                             "max_results": {
                                 "type": "integer",
-                                "description": "Maximum number of results to return (default: 10)",
+                                "description": "Maximum number of results to return per page (default: 10)",
                                 "default": 10
+                            },
+                            "cursor": {
+                                "type": "string",
+                                "description": "Cursor returned by a previous call, to get the next page"
                             }
                         },
                         "required": ["query"]
@@ -169,13 +233,22 @@ class GoogleDocsServer:
                 ),
                 types.Tool(
                     name="list_folder_documents",
-                    description="List all documents in a specific Google Drive folder",
+                    description="List all documents in a specific Google Drive folder, one page at a time",
                     inputSchema={
                         "type": "object",
                         "properties": {
                             "folder_id": {
                                 "type": "string",
                                 "description": "The Google Drive folder ID (optional, uses default if not provided)"
+                            },
+                            "page_size": {
+                                "type": "integer",
+                                "description": "Documents per page (default: 50, maximum: 1000)",
+                                "default": 50
+                            },
+                            "cursor": {
+                                "type": "string",
+                                "description": "Cursor returned by a previous call, to get the next page"
                             }
                         }
                     }
@@ -226,48 +299,21 @@ class GoogleDocsServer:
                 )]
     
     def _extract_text_from_doc(self, doc: Dict[str, Any]) -> str:
-        """Extract plain text from Google Doc structure"""
-        content = doc.get('body', {}).get('content', [])
-        text_parts = []
-        
-        for element in content:
-            if 'paragraph' in element:
-                paragraph = element['paragraph']
-                for elem in paragraph.get('elements', []):
-                    if 'textRun' in elem:
-                        text_parts.append(elem['textRun'].get('content', ''))
-            elif 'table' in element:
-                # Handle table content
-                table = element['table']
-                for row in table.get('tableRows', []):
-                    for cell in row.get('tableCells', []):
-                        for cell_content in cell.get('content', []):
-                            if 'paragraph' in cell_content:
-                                paragraph = cell_content['paragraph']
-                                for elem in paragraph.get('elements', []):
-                                    if 'textRun' in elem:
-                                        text_parts.append(elem['textRun'].get('content', ''))
-        
-        return ''.join(text_parts)
+        """Extract text from Google Doc structure, keeping headings, lists and tables"""
+        return extract_document(doc)[0]
     
     async def _search_documents(self, arguments: dict) -> list[types.TextContent]:
-        """Search for documents by name"""
+        """Search for documents by name in the folder manifest"""
         query = arguments.get("query", "")
         max_results = arguments.get("max_results", 10)
+        cursor = arguments.get("cursor")
         
         try:
-            # Search by name
-            search_query = f"name contains '{query}' and mimeType='application/vnd.google-apps.document'"
-            if GDRIVE_FOLDER_ID:
-                search_query = f"'{GDRIVE_FOLDER_ID}' in parents and " + search_query
-            
-            results = self.drive_service.files().list(
-                q=search_query,
-                pageSize=max_results,
-                fields="files(id, name, modifiedTime, description)"
-            ).execute()
-            
-            files = results.get('files', [])
+            manifest = await self._get_folder_manifest(GDRIVE_FOLDER_ID)
+            matches = [file for file in manifest['files'] if query.lower() in file['name'].lower()]
+            files, next_cursor = _page(
+                {"files": matches, "keys": [(file['name'], file['id']) for file in matches]}, cursor, max_results
+            )
             
             if not files:
                 return [types.TextContent(
@@ -275,12 +321,14 @@ class GoogleDocsServer:
                     text=f"No documents found matching query: {query}"
                 )]
             
-            result_text = f"Found {len(files)} documents matching '{query}':\n\n"
+            result_text = f"Found {len(matches)} documents matching '{query}', showing {len(files)}:\n\n"
             for file in files:
                 result_text += f"• {file['name']} (ID: {file['id']})\n"
                 if file.get('description'):
                     result_text += f"  Description: {file['description']}\n"
                 result_text += f"  Modified: {file.get('modifiedTime', 'Unknown')}\n\n"
+            if next_cursor:
+                result_text += f"More results available; next page cursor: {next_cursor}\n"
             
             return [types.TextContent(type="text", text=result_text)]
             
@@ -301,12 +349,11 @@ class GoogleDocsServer:
             )]
         
         try:
-            doc = self.docs_service.documents().get(documentId=doc_id).execute()
-            content = self._extract_text_from_doc(doc)
+            document = await self._read_document(doc_id)
             
             return [types.TextContent(
                 type="text",
-                text=f"Document: {doc.get('title', 'Untitled')}\n\n{content}"
+                text=f"Document: {document['name'] or 'Untitled'}\n\n{document['text']}"
             )]
             
         except HttpError as e:
@@ -316,21 +363,14 @@ class GoogleDocsServer:
             )]
     
     async def _list_folder_documents(self, arguments: dict) -> list[types.TextContent]:
-        """List documents in a folder"""
+        """List a page of the documents in a folder"""
         folder_id = arguments.get("folder_id", GDRIVE_FOLDER_ID)
+        page_size = arguments.get("page_size", 50)
+        cursor = arguments.get("cursor")
         
         try:
-            query = f"'{folder_id}' in parents and mimeType='application/vnd.google-apps.document'"
-            if not folder_id:
-                query = "mimeType='application/vnd.google-apps.document'"
-            
-            results = self.drive_service.files().list(
-                q=query,
-                pageSize=50,
-                fields="files(id, name, modifiedTime, description, size)"
-            ).execute()
-            
-            files = results.get('files', [])
+            manifest = await self._get_folder_manifest(folder_id)
+            files, next_cursor = _page(manifest, cursor, page_size)
             
             if not files:
                 return [types.TextContent(
@@ -338,13 +378,15 @@ class GoogleDocsServer:
                     text="No documents found in the specified folder"
                 )]
             
-            result_text = f"Found {len(files)} documents:\n\n"
+            result_text = f"Found {len(manifest['files'])} documents, showing {len(files)}:\n\n"
             for file in files:
                 result_text += f"• {file['name']}\n"
                 result_text += f"  ID: {file['id']}\n"
                 if file.get('description'):
                     result_text += f"  Description: {file['description']}\n"
                 result_text += f"  Modified: {file.get('modifiedTime', 'Unknown')}\n\n"
+            if next_cursor:
+                result_text += f"More documents available; next page cursor: {next_cursor}\n"
             
             return [types.TextContent(type="text", text=result_text)]
             
@@ -354,79 +396,277 @@ class GoogleDocsServer:
                 text=f"Error listing documents: {e}"
             )]
     
-    async def _semantic_search(self, arguments: dict) -> list[types.TextContent]:
-        """Perform semantic search across document content"""
-        query = arguments.get("query", "")
-        max_results = arguments.get("max_results", 5)
+    async def _iter_documents(self, folder_id: Optional[str],
+                              fields: str = "id, name, modifiedTime, description") -> AsyncIterator[Dict[str, Any]]:
+        """Yield every Google Doc in a folder, requesting the next page of the listing as the previous one is consumed"""
+        page_token = None
+        while True:
+            results = await self.api.execute(self.drive_service.files().list(
+                q=_documents_query(folder_id),
+                pageSize=MAX_PAGE_SIZE,
+                pageToken=page_token,
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True,
+                fields=f"nextPageToken, files({fields})"
+            ))
+            for file in results.get('files', []):
+                yield file
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return
+    
+    async def _get_folder_manifest(self, folder_id: Optional[str]) -> dict:
+        """
+        Get the cached listing of every document in a folder as a dict with files
+        sorted by (name, id), their keys and when they were listed, listing the
+        folder again when the cache is older than GDOCS_MANIFEST_TTL
+        """
+        manifest = self._folder_manifests.get(folder_id)
+        if manifest and time.monotonic() - manifest['refreshed_at'] < GDOCS_MANIFEST_TTL:
+            return manifest
         
-        try:
-            # Get all documents first
-            search_query = f"mimeType='application/vnd.google-apps.document'"
-            if GDRIVE_FOLDER_ID:
-                search_query = f"'{GDRIVE_FOLDER_ID}' in parents and " + search_query
+        async with self._manifest_lock:
+            manifest = self._folder_manifests.get(folder_id)
+            if manifest and time.monotonic() - manifest['refreshed_at'] < GDOCS_MANIFEST_TTL:
+                return manifest
             
-            results = self.drive_service.files().list(
-                q=search_query,
-                pageSize=20,  # Limit to avoid too many API calls
-                fields="files(id, name)"
-            ).execute()
-            
-            files = results.get('files', [])
-            
-            # Search through document content
-            relevant_docs = []
-            for file in files:
-                try:
-                    doc = self.docs_service.documents().get(documentId=file['id']).execute()
-                    content = self._extract_text_from_doc(doc)
-                    
-                    # Simple keyword matching (in production, you'd use proper embeddings)
-                    if query.lower() in content.lower():
-                        # Find relevant snippets
-                        sentences = content.split('.')
-                        relevant_snippets = [
-                            sentence.strip() for sentence in sentences 
-                            if query.lower() in sentence.lower()
-                        ][:3]  # Max 3 snippets per document
-                        
-                        relevant_docs.append({
-                            'name': file['name'],
-                            'id': file['id'],
-                            'snippets': relevant_snippets
-                        })
-                        
-                        if len(relevant_docs) >= max_results:
-                            break
-                            
-                except HttpError as e:
-                    logger.warning(f"Could not read document {file['id']}: {e}")
+            files = [file async for file in self._iter_documents(folder_id)]
+            files.sort(key=lambda file: (file['name'], file['id']))
+            manifest = {
+                "files": files,
+                "keys": [(file['name'], file['id']) for file in files],
+                "refreshed_at": time.monotonic()
+            }
+            self._folder_manifests.pop(folder_id, None)
+            self._folder_manifests[folder_id] = manifest
+            # Keep the most recently listed folders
+            while len(self._folder_manifests) > GDOCS_MANIFEST_MAX_FOLDERS:
+                self._folder_manifests.pop(next(iter(self._folder_manifests)))
+            logger.info(f"Listed {len(files)} documents in folder {folder_id or '(all)'}")
+            return manifest
+    
+    def _list_all_documents(self) -> List[Dict[str, Any]]:
+        """List every Google Doc in the configured folder with its modifiedTime"""
+        files = []
+        page_token = None
+        while True:
+            results = self.api.execute_sync(self.drive_service.files().list(
+                q=_documents_query(GDRIVE_FOLDER_ID),
+                pageSize=MAX_PAGE_SIZE,
+                pageToken=page_token,
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True,
+                fields="nextPageToken, files(id, name, modifiedTime)"
+            ))
+            files.extend(results.get('files', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return files
+    
+    def _sync_documents(self, files: List[Dict[str, Any]]) -> int:
+        """
+        Fetch documents concurrently, store their text and re-index their chunks.
+        Returns the number synced; documents that cannot be read are skipped.
+        """
+        synced = 0
+        # Bounded batches keep only a few fetched documents in memory at once
+        batch_size = GOOGLE_API_MAX_WORKERS * 4
+        for start in range(0, len(files), batch_size):
+            batch = files[start:start + batch_size]
+            docs = self.api.execute_many([
+                self.docs_service.documents().get(documentId=file['id']) for file in batch
+            ])
+            for file, doc in zip(batch, docs):
+                if isinstance(doc, Exception):
+                    logger.warning(f"Could not read document {file['id']}: {doc}")
                     continue
+                text, blocks = extract_document(doc)
+                name = file.get('name') or doc.get('title', 'Untitled')
+                self.store.put(file['id'], name, file.get('modifiedTime'), text)
+                self.index.upsert(file['id'], name, file.get('modifiedTime'), chunk_blocks(text, blocks))
+                synced += 1
+        return synced
+    
+    def _remove_documents(self, doc_ids: List[str]) -> int:
+        self.index.remove(doc_ids)
+        return self.store.remove(doc_ids)
+    
+    def _in_scope(self, file: Dict[str, Any]) -> bool:
+        """Check whether a changed file is a live Google Doc in the configured folder"""
+        if file.get('trashed') or file.get('mimeType') != GOOGLE_DOC_MIME_TYPE:
+            return False
+        return not GDRIVE_FOLDER_ID or GDRIVE_FOLDER_ID in file.get('parents', [])
+    
+    def _full_sync(self, refetch: bool = False) -> dict:
+        """Sync every document in the folder, fetching only new and modified ones (all of them with refetch)"""
+        # Take the changes token first so nothing changed during the listing is missed
+        start_token = self.api.execute_sync(
+            self.drive_service.changes().getStartPageToken(supportsAllDrives=True)
+        )['startPageToken']
+        files = self._list_all_documents()
+        stored = self.store.versions()
+        
+        updated = self._sync_documents([
+            file for file in files
+            if refetch or file['id'] not in stored or stored[file['id']] != file.get('modifiedTime')
+        ])
+        
+        listed = {file['id'] for file in files}
+        removed = self._remove_documents([doc_id for doc_id in stored if doc_id not in listed])
+        self.store.set_state("changes_page_token", start_token)
+        
+        logger.info(f"Full sync: {updated} documents updated, {removed} removed, {len(files)} total")
+        return {"updated": updated, "removed": removed}
+    
+    def _sync_changes(self, page_token: str) -> dict:
+        """Apply the Drive changes made since page_token"""
+        stored = self.store.versions()
+        updated = removed = 0
+        
+        while page_token:
+            results = self.api.execute_sync(self.drive_service.changes().list(
+                pageToken=page_token,
+                pageSize=1000,
+                spaces="drive",
+                includeRemoved=True,
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True,
+                fields="nextPageToken, newStartPageToken, "
+                       "changes(fileId, removed, file(id, name, mimeType, modifiedTime, trashed, parents))"
+            ))
             
-            if not relevant_docs:
-                return [types.TextContent(
-                    type="text",
-                    text=f"No documents found containing: {query}"
-                )]
-            
-            result_text = f"Found {len(relevant_docs)} relevant documents for '{query}':\n\n"
-            for doc in relevant_docs:
-                result_text += f"📄 {doc['name']} (ID: {doc['id']})\n"
-                for snippet in doc['snippets']:
-                    result_text += f"  • {snippet}...\n"
-                result_text += "\n"
+            # Latest change per document in this page
+            changed = {}
+            for change in results.get('changes', []):
+                file = change.get('file') or {}
+                if change.get('removed') or not self._in_scope(file):
+                    removed += self._remove_documents([change['fileId']])
+                    stored.pop(change['fileId'], None)
+                    changed.pop(change['fileId'], None)
+                elif file['id'] not in stored or stored[file['id']] != file.get('modifiedTime'):
+                    changed[file['id']] = file
             
-            return [types.TextContent(type="text", text=result_text)]
+            updated += self._sync_documents(list(changed.values()))
+            for file in changed.values():
+                stored[file['id']] = file.get('modifiedTime')
             
+            if results.get('newStartPageToken'):
+                self.store.set_state("changes_page_token", results['newStartPageToken'])
+            page_token = results.get('nextPageToken')
+        
+        if updated or removed:
+            logger.info(f"Synced changes: {updated} documents updated, {removed} removed")
+        return {"updated": updated, "removed": removed}
+    
+    def _reindex_from_store(self) -> int:
+        """Index stored documents missing from (or stale in) the vector index, without API calls"""
+        indexed = self.index.versions()
+        reindexed = 0
+        for document in self.store.iter_documents():
+            if document['doc_id'] in indexed and indexed[document['doc_id']] == document['modified_time']:
+                continue
+            text = document['text']
+            self.index.upsert(document['doc_id'], document['name'], document['modified_time'],
+                              chunk_blocks(text, parse_blocks(text)))
+            reindexed += 1
+        return reindexed
+    
+    def _sync(self) -> dict:
+        """Bring the store up to date: from the changes feed if a token is saved, else by a full sync"""
+        if self.store.get_state("extract_version") != str(EXTRACT_VERSION):
+            # Stored text was extracted by another version of the extractor
+            result = self._full_sync(refetch=True)
+            self.store.set_state("extract_version", str(EXTRACT_VERSION))
+            return result
+        
+        page_token = self.store.get_state("changes_page_token")
+        if page_token is None:
+            return self._full_sync()
+        try:
+            return self._sync_changes(page_token)
         except HttpError as e:
+            # An expired or invalid token means changes were missed
+            logger.warning(f"Changes feed unavailable, running a full sync: {e}")
+            return self._full_sync()
+    
+    async def sync(self):
+        """Run one sync on a worker thread (one at a time)"""
+        async with self._sync_lock:
+            if not self._synced:
+                reindexed = await asyncio.to_thread(self._reindex_from_store)
+                if reindexed:
+                    logger.info(f"Re-indexed {reindexed} stored documents")
+            result = await asyncio.to_thread(self._sync)
+            self._synced = True
+            if result.get("updated") or result.get("removed"):
+                # Documents were added, renamed or removed in the default folder
+                self._folder_manifests.pop(GDRIVE_FOLDER_ID, None)
+    
+    async def _sync_loop(self):
+        while True:
+            try:
+                await self.sync()
+                # Keep the default folder listing warm for list_resources and the listing tools
+                await self._get_folder_manifest(GDRIVE_FOLDER_ID)
+            except Exception as e:
+                logger.error(f"Error syncing documents: {e}")
+            await asyncio.sleep(GDOCS_SYNC_INTERVAL)
+    
+    def start_sync(self):
+        """
+        Start the background sync loop on the running event loop; call it at
+        server start, so the initial sync runs before the first query needs it
+        """
+        if self._sync_task is None:
+            self._sync_task = asyncio.create_task(self._sync_loop())
+    
+    async def _read_document(self, doc_id: str) -> dict:
+        """
+        Get a document from the content store, fetching and storing it on a
+        miss (e.g. a document outside the synced folder)
+        """
+        document = await asyncio.to_thread(self.store.get, doc_id)
+        if document is None:
+            doc = await self.api.execute(self.docs_service.documents().get(documentId=doc_id))
+            
+            def store():
+                # Without a modifiedTime the next sync of this document refreshes it
+                self.store.put(doc_id, doc.get('title', 'Untitled'), None, self._extract_text_from_doc(doc))
+                return self.store.get(doc_id)
+            
+            document = await asyncio.to_thread(store)
+        return document
+    
+    async def _semantic_search(self, arguments: dict) -> list[types.TextContent]:
+        """Perform semantic search across document content using the local vector index"""
+        query = arguments.get("query", "")
+        max_results = arguments.get("max_results", 5)
+        
+        # Searches the documents indexed so far rather than waiting for the initial sync
+        results = await asyncio.to_thread(self.index.search, query, max_results)
+        pending = "" if self._synced else "Note: the initial document sync is still running; results may be incomplete.\n\n"
+        
+        if not results:
             return [types.TextContent(
                 type="text",
-                text=f"Error in semantic search: {e}"
+                text=f"{pending}No documents found for: {query}"
             )]
+        
+        result_text = f"{pending}Found {len(results)} relevant passages for '{query}':\n\n"
+        for result in results:
+            snippet = result['text'] if len(result['text']) <= 300 else result['text'][:300] + "..."
+            location = f" › {result['section']}" if result.get('section') else ""
+            offsets = f", chars {result['start']}-{result['end']}" if result.get('start') is not None else ""
+            result_text += f"📄 {result['name']}{location} (ID: {result['doc_id']}{offsets}, score: {result['score']:.2f})\n"
+            result_text += f"  • {snippet}\n\n"
+        
+        return [types.TextContent(type="text", text=result_text)]
 
 async def main():
 
     logger.info("Starting GoogleDocsServer...")
-    GoogleDocsServer()  # Initializes and sets up handlers
+    docs_server = GoogleDocsServer()  # Initializes and sets up handlers
+    docs_server.start_sync()
 
     logger.info("Running MCP server via stdio_server...")
     async with stdio_server():
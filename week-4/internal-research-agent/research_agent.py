@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache
 import logging
 from dotenv import load_dotenv
 
@@ -9,7 +10,8 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
 from langchain_community.utilities import SerpAPIWrapper
 from langchain.prompts import PromptTemplate
-from langchain.embeddings import HuggingFaceEmbeddings
+from langchain.embeddings import HuggingFaceEmbeddings, CacheBackedEmbeddings
+from langchain.storage import LocalFileStore
 from mcp_client_google_doc import MCPGoogleDocsClient
 
 load_dotenv()
@@ -21,8 +23,19 @@ AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 BEDROCK_MODEL_ID = os.getenv("BEDROCK_MODEL_ID", "anthropic.claude-3-sonnet-20240229-v1:0")
 SERPAPI_API_KEY = os.getenv("SERPAPI_API_KEY")
 HR_DOCS_PATH = os.getenv("HR_DOCS_PATH", "./hr_policies")
-
-embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "./.embedding_cache")
+
+@lru_cache(maxsize=None)
+def get_embedding_model():
+    """Load the embedding model on first use, caching document and query embeddings on disk"""
+    base_model = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+    return CacheBackedEmbeddings.from_bytes_store(
+        base_model,
+        LocalFileStore(EMBEDDING_CACHE_DIR),
+        namespace=EMBEDDING_MODEL_NAME,
+        query_embedding_cache=True
+    )
 
 class EnhancedResearchAgent:
     def __init__(self):
@@ -79,7 +92,7 @@ class EnhancedResearchAgent:
             pages = [p for loader in loaders for p in loader.load()]
             splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
             chunks = splitter.split_documents(pages)
-            vector_store = FAISS.from_documents(chunks, embedding_model)
+            vector_store = FAISS.from_documents(chunks, get_embedding_model())
             return vector_store.as_retriever(search_kwargs={"k": 3})
         except Exception as e:
             logger.error(f"HR retriever setup failed: {e}")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The agent's modules are imported as top-level modules, as the MCP server does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
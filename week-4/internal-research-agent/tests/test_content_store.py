@@ -0,0 +1,62 @@
+import pytest
+
+from content_store import ContentStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ContentStore(str(tmp_path / "store.db"))
+    yield store
+    store.close()
+
+
+def test_put_and_get(store):
+    store.put("d1", "Handbook", "2024-01-01T00:00:00Z", "# Leave\nAsk your manager.")
+
+    document = store.get("d1")
+    assert {key: document[key] for key in ("doc_id", "name", "modified_time", "text")} == {
+        "doc_id": "d1", "name": "Handbook", "modified_time": "2024-01-01T00:00:00Z",
+        "text": "# Leave\nAsk your manager."
+    }
+    assert store.get("missing") is None
+
+
+def test_put_replaces_a_document(store):
+    store.put("d1", "Handbook", "t1", "old")
+    store.put("d1", "Handbook v2", "t2", "new")
+
+    assert store.get("d1")["text"] == "new"
+    assert store.versions() == {"d1": "t2"}
+    assert store.stats()["documents"] == 1
+
+
+def test_remove_and_iterate(store):
+    for i in range(3):
+        store.put(f"d{i}", f"Doc {i}", "t1", f"text {i}")
+
+    assert store.remove(["d1", "missing"]) == 1
+    assert store.remove([]) == 0
+    assert sorted(document["doc_id"] for document in store.iter_documents()) == ["d0", "d2"]
+
+
+def test_sync_state(store):
+    assert store.get_state("page_token") is None
+    store.set_state("page_token", "42")
+    store.set_state("page_token", "43")
+
+    assert store.get_state("page_token") == "43"
+
+
+def test_store_persists_across_instances(tmp_path):
+    path = str(tmp_path / "store.db")
+    first = ContentStore(path)
+    first.put("d1", "Doc", "t1", "text")
+    first.set_state("page_token", "7")
+    first.close()
+
+    second = ContentStore(path)
+    try:
+        assert second.get("d1")["text"] == "text"
+        assert second.get_state("page_token") == "7"
+    finally:
+        second.close()
@@ -0,0 +1,116 @@
+from doc_extract import chunk_blocks, extract_document, parse_blocks
+
+
+def paragraph(text, style=None, bullet=None):
+    paragraph = {"elements": [{"textRun": {"content": text + "\n"}}]}
+    if style:
+        paragraph["paragraphStyle"] = {"namedStyleType": style}
+    if bullet:
+        paragraph["bullet"] = bullet
+    return {"paragraph": paragraph}
+
+
+def table(*rows):
+    return {"table": {"tableRows": [
+        {"tableCells": [{"content": cell if isinstance(cell, list) else [paragraph(cell)]} for cell in row]}
+        for row in rows
+    ]}}
+
+
+DOC = {
+    "lists": {
+        "numbered": {"listProperties": {"nestingLevels": [{"glyphType": "DECIMAL"}, {"glyphType": "ALPHA"}]}},
+        "bullets": {"listProperties": {"nestingLevels": [{}]}},
+    },
+    "body": {"content": [
+        paragraph("Handbook", "TITLE"),
+        paragraph("Leave", "HEADING_1"),
+        paragraph("Ask your manager\x0bin advance."),
+        paragraph("First", bullet={"listId": "numbered"}),
+        paragraph("Nested", bullet={"listId": "numbered", "nestingLevel": 1}),
+        paragraph("Second", bullet={"listId": "numbered"}),
+        paragraph("Anything", bullet={"listId": "bullets"}),
+        paragraph("Expenses", "HEADING_2"),
+        table(["Item", "Limit"], ["Hotel", [paragraph("Per night"), table(["EU", "150"])]], ["", ""]),
+        {"sectionBreak": {}},
+        paragraph(""),
+    ]},
+}
+
+
+def test_extract_renders_structure():
+    text, _ = extract_document(DOC)
+
+    assert text.split("\n") == [
+        "# Handbook",
+        "# Leave",
+        "Ask your manager in advance.",
+        "1. First",
+        "  1. Nested",
+        "2. Second",
+        "- Anything",
+        "## Expenses",
+        "Item | Limit",
+        "Hotel | Per night EU 150",
+    ]
+
+
+def test_blocks_record_offsets_kinds_and_sections():
+    text, blocks = extract_document(DOC)
+
+    assert [block["kind"] for block in blocks] == [
+        "heading", "heading", "paragraph", "list_item", "list_item", "list_item", "list_item",
+        "heading", "table_row", "table_row"
+    ]
+    assert [text[block["start"]:block["end"]] for block in blocks] == text.split("\n")
+    assert blocks[2]["section"] == "Leave"
+    assert blocks[-1]["section"] == "Leave > Expenses"
+
+
+def test_parse_blocks_recovers_extracted_blocks():
+    text, blocks = extract_document(DOC)
+
+    assert parse_blocks(text) == blocks
+
+
+def test_chunks_do_not_span_sections_and_keep_headings():
+    text = "# A\n" + "Alpha one. " * 10 + "\n# B\nBeta two."
+    chunks = chunk_blocks(text, parse_blocks(text), max_chars=60, overlap_chars=0)
+
+    assert [chunk["section"] for chunk in chunks] == ["A"] * (len(chunks) - 1) + ["B"]
+    assert chunks[0]["text"].startswith("# A\nAlpha one.")
+    assert chunks[-1]["text"] == "# B\nBeta two."
+    assert all(len(chunk["text"]) <= 60 for chunk in chunks)
+    assert all(chunk["text"] == text[chunk["start"]:chunk["end"]] for chunk in chunks)
+
+
+def test_long_blocks_are_split_at_sentences_then_hard():
+    sentences = "One two three. Four five six. " + "x" * 50
+    text = "# A\n" + sentences
+    chunks = chunk_blocks(text, parse_blocks(text), max_chars=20, overlap_chars=0)
+
+    assert [chunk["text"] for chunk in chunks] == [
+        "# A\nOne two three. ", "Four five six. ", "x" * 20, "x" * 20, "x" * 10
+    ]
+
+
+def test_overlap_repeats_trailing_blocks_of_the_same_section():
+    lines = ["# A", "First line.", "Second line.", "Third line.", "Fourth line."]
+    text = "\n".join(lines)
+    chunks = chunk_blocks(text, parse_blocks(text), max_chars=40, overlap_chars=15)
+
+    assert [chunk["text"] for chunk in chunks] == [
+        "# A\nFirst line.\nSecond line.\nThird line.", "Third line.\nFourth line."
+    ]
+
+
+def test_overlap_does_not_cross_sections():
+    text = "# A\nFirst line.\n# B\nSecond line."
+    chunks = chunk_blocks(text, parse_blocks(text), max_chars=20, overlap_chars=20)
+
+    assert [chunk["text"] for chunk in chunks] == ["# A\nFirst line.", "# B\nSecond line."]
+
+
+def test_empty_document():
+    assert extract_document({}) == ("", [])
+    assert chunk_blocks("", []) == []
@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+from doc_index import DocumentIndex
+
+VOCABULARY = ["leave", "holiday", "expense", "receipt", "security", "password", "policy"]
+
+
+class FakeEmbed:
+    """Embeds a text as the counts of the vocabulary words in it, recording every call"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[text.lower().count(word) for word in VOCABULARY] for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def embed():
+    return FakeEmbed()
+
+
+@pytest.fixture
+def index(tmp_path, embed):
+    index = DocumentIndex(str(tmp_path / "index.db"), embed=embed)
+    yield index
+    index.close()
+
+
+def test_search_returns_most_similar_chunks_first(index):
+    index.upsert("d1", "Leave policy", "t1", ["Annual leave and holiday rules", "Security password rules"])
+    index.upsert("d2", "Expenses", "t1", ["Expense receipt rules"])
+
+    results = index.search("holiday leave")
+
+    assert (results[0]["doc_id"], results[0]["position"]) == ("d1", 0)
+    assert results[0]["text"] == "Annual leave and holiday rules"
+    assert results[0]["name"] == "Leave policy"
+    assert results[0]["score"] == pytest.approx(1.0)
+    assert results[0]["section"] is None and results[0]["start"] is None
+
+
+def test_sections_are_embedded_and_returned(index, embed):
+    index.upsert("d1", "Handbook", "t1", [
+        {"text": "Ask your manager.", "section": "Leave > Holiday", "start": 10, "end": 27}
+    ])
+
+    assert embed.calls[-1] == ["Leave > Holiday\nAsk your manager."]
+    result = index.search("holiday")[0]
+    assert (result["text"], result["section"], result["start"], result["end"]) == \
+        ("Ask your manager.", "Leave > Holiday", 10, 27)
+
+
+def test_results_are_limited_per_document(index):
+    index.upsert("d1", "Leave", "t1", ["leave"] * 5)
+    index.upsert("d2", "Holiday", "t1", ["leave holiday"])
+
+    results = index.search("leave", max_results=4, max_per_document=2)
+
+    assert [result["doc_id"] for result in results] == ["d1", "d1", "d2"]
+
+
+def test_needs_update_tracks_modified_time(index):
+    assert index.needs_update("d1", "t1")
+    index.upsert("d1", "Doc", "t1", ["leave"])
+
+    assert not index.needs_update("d1", "t1")
+    assert index.needs_update("d1", "t2")
+    assert index.versions() == {"d1": "t1"}
+
+
+def test_upsert_replaces_and_remove_drops_chunks(index):
+    index.upsert("d1", "Doc", "t1", ["leave", "holiday", "expense"])
+    assert index.search("holiday")[0]["text"] == "holiday"
+
+    index.upsert("d1", "Doc", "t2", ["password"])
+    assert index.stats() == {"documents": 1, "chunks": 1}
+    assert [result["text"] for result in index.search("holiday")] == ["password"]
+
+    assert index.remove(["d1", "missing"]) == 1
+    assert index.search("holiday") == []
+    assert index.stats() == {"documents": 0, "chunks": 0}
+
+
+def test_names_follow_upserts(index):
+    index.upsert("d1", "Draft", "t1", ["leave"])
+    assert index.search("leave")[0]["name"] == "Draft"
+
+    index.upsert("d1", "Leave policy", "t2", ["leave"])
+    assert index.search("leave")[0]["name"] == "Leave policy"
+
+
+def test_index_persists_without_embedding_again(tmp_path, embed):
+    path = str(tmp_path / "index.db")
+    first = DocumentIndex(path, embed=embed)
+    first.upsert("d1", "Doc", "t1", ["expense receipt"])
+    first.close()
+
+    second_embed = FakeEmbed()
+    second = DocumentIndex(path, embed=second_embed)
+    try:
+        assert not second.needs_update("d1", "t1")
+        assert second.search("receipt")[0]["text"] == "expense receipt"
+        # Only the query is embedded
+        assert second_embed.calls == [["receipt"]]
+    finally:
+        second.close()
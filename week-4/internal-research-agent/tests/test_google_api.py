@@ -0,0 +1,157 @@
+import pytest
+
+pytest.importorskip("google_auth_httplib2")
+httplib2 = pytest.importorskip("httplib2")
+errors = pytest.importorskip("googleapiclient.errors")
+
+import google_api
+from google_api import GoogleApiExecutor, RateLimiter
+
+
+class Clock:
+    """Stands in for time.monotonic and time.sleep; sleeping advances the clock"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(google_api.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(google_api.time, "sleep", clock.sleep)
+    monkeypatch.setattr(google_api.random, "random", lambda: 0.5)
+    return clock
+
+
+def http_error(status, content=b""):
+    return errors.HttpError(httplib2.Response({"status": status}), content)
+
+
+class FakeRequest:
+    """Fails with the given errors, then returns result"""
+
+    def __init__(self, *failures, result="ok"):
+        self.failures = list(failures)
+        self.result = result
+        self.calls = 0
+
+    def execute(self, http=None):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return self.result
+
+
+def test_rate_limiter_allows_a_burst_then_spaces_requests(clock):
+    limiter = RateLimiter(rate=2, burst=3)
+
+    for _ in range(3):
+        limiter.acquire()
+    assert clock.now == 0
+
+    limiter.acquire()
+    limiter.acquire()
+    assert clock.now == pytest.approx(1.0)
+    assert clock.sleeps == [pytest.approx(0.5), pytest.approx(0.5)]
+
+
+def test_rate_limiter_refills_up_to_capacity(clock):
+    limiter = RateLimiter(rate=10)
+    assert limiter.capacity == 10
+    for _ in range(10):
+        limiter.acquire()
+
+    clock.now += 60
+    for _ in range(10):
+        limiter.acquire()
+    assert clock.sleeps == []
+    limiter.acquire()
+    assert clock.sleeps == [pytest.approx(0.1)]
+
+
+def test_rate_limiter_burst_is_at_least_one(clock):
+    limiter = RateLimiter(rate=0.5)
+
+    limiter.acquire()
+    limiter.acquire()
+
+    assert limiter.capacity == 1
+    assert clock.now == pytest.approx(2.0)
+
+
+def test_zero_rate_disables_the_limit(clock):
+    limiter = RateLimiter(rate=0)
+    for _ in range(100):
+        limiter.acquire()
+    assert clock.sleeps == []
+
+
+@pytest.fixture
+def executor(clock):
+    executor = GoogleApiExecutor(max_workers=2, requests_per_second=1, num_retries=2)
+    yield executor
+    executor.shutdown()
+
+
+@pytest.mark.parametrize("error", [
+    http_error(429),
+    http_error(503),
+    http_error(403, b'{"error": {"errors": [{"reason": "userRateLimitExceeded"}]}}'),
+    TimeoutError("timed out"),
+])
+def test_retryable_errors_are_retried(executor, error):
+    request = FakeRequest(error)
+
+    assert executor.execute_sync(request) == "ok"
+    assert request.calls == 2
+
+
+@pytest.mark.parametrize("error", [http_error(404), http_error(403, b'{"error": "forbidden"}')])
+def test_other_errors_are_not_retried(executor, error):
+    request = FakeRequest(error)
+
+    with pytest.raises(errors.HttpError):
+        executor.execute_sync(request)
+    assert request.calls == 1
+
+
+def test_retries_are_rate_limited_and_give_up(executor, clock):
+    request = FakeRequest(http_error(500), http_error(500), http_error(500))
+
+    with pytest.raises(errors.HttpError):
+        executor.execute_sync(request)
+
+    assert request.calls == 3
+    # Backoff of 0.5 * 2 and 0.5 * 4 seconds, which also refills the bucket
+    assert clock.sleeps == [pytest.approx(1.0), pytest.approx(2.0)]
+
+
+def test_retry_waits_for_a_token(clock):
+    executor = GoogleApiExecutor(requests_per_second=0.25, num_retries=1)
+    try:
+        assert executor.execute_sync(FakeRequest(http_error(429))) == "ok"
+    finally:
+        executor.shutdown()
+
+    # Backoff of 1 second, then 3 more until the bucket holds a token again
+    assert clock.now == pytest.approx(4.0)
+
+
+def test_execute_many_returns_results_and_errors_in_order():
+    executor = GoogleApiExecutor(max_workers=4, requests_per_second=0)
+    try:
+        results = executor.execute_many([FakeRequest(result=1), FakeRequest(http_error(404)), FakeRequest(result=3)])
+    finally:
+        executor.shutdown()
+
+    assert results[0] == 1 and results[2] == 3
+    assert isinstance(results[1], errors.HttpError)
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("mcp")
+pytest.importorskip("googleapiclient")
+
+import mcp_server_google_doc
+from mcp_server_google_doc import GoogleDocsServer, _encode_cursor, _page
+
+
+def manifest(files):
+    files = sorted(files, key=lambda file: (file["name"], file["id"]))
+    return {"files": files, "keys": [(file["name"], file["id"]) for file in files]}
+
+
+FILES = [{"id": f"id{i}", "name": name} for i, name in enumerate(["b", "a", "c", "a", "d"])]
+
+
+def test_pages_cover_every_file_once():
+    listing = manifest(FILES)
+    seen, cursor = [], None
+    while True:
+        files, cursor = _page(listing, cursor, 2)
+        seen += files
+        if cursor is None:
+            break
+
+    assert seen == listing["files"]
+
+
+def test_last_page_has_no_cursor():
+    files, cursor = _page(manifest(FILES), None, 5)
+
+    assert len(files) == 5
+    assert cursor is None
+
+
+def test_cursor_survives_a_refreshed_manifest():
+    files, cursor = _page(manifest(FILES), None, 2)
+    assert [file["id"] for file in files] == ["id1", "id3"]
+
+    # A document is added before the cursor and the one after it is deleted
+    refreshed = manifest([{"id": "id9", "name": "0"}] + [file for file in FILES if file["id"] != "id0"])
+    files, _ = _page(refreshed, cursor, 2)
+
+    assert [file["id"] for file in files] == ["id2", "id4"]
+
+
+def test_page_size_is_clamped():
+    listing = manifest([{"id": f"id{i:04}", "name": "doc"} for i in range(1500)])
+
+    assert len(_page(listing, None, 0)[0]) == 1
+    assert len(_page(listing, None, 5000)[0]) == mcp_server_google_doc.MAX_PAGE_SIZE
+
+
+def test_invalid_cursor_is_rejected():
+    with pytest.raises(ValueError):
+        _page(manifest(FILES), "not a cursor", 2)
+
+
+class FakeList:
+    def __init__(self, pages, page_token):
+        self.pages = pages
+        self.page_token = page_token
+
+    def execute(self):
+        return self.pages[self.page_token or 0]
+
+
+class FakeDrive:
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = []
+
+    def files(self):
+        return self
+
+    def list(self, **kwargs):
+        self.requests.append(kwargs)
+        return FakeList(self.pages, kwargs.get("pageToken"))
+
+
+class FakeApi:
+    async def execute(self, request):
+        return request.execute()
+
+
+def test_folder_manifest_follows_every_listing_page():
+    server = GoogleDocsServer.__new__(GoogleDocsServer)
+    server.drive_service = FakeDrive({
+        0: {"files": FILES[:2], "nextPageToken": 1},
+        1: {"files": FILES[2:4], "nextPageToken": 2},
+        2: {"files": FILES[4:]},
+    })
+    server.api = FakeApi()
+    server._folder_manifests = {}
+    server._manifest_lock = asyncio.Lock()
+
+    listing = asyncio.run(server._get_folder_manifest("folder"))
+
+    assert listing["files"] == manifest(FILES)["files"]
+    assert listing["keys"] == manifest(FILES)["keys"]
+    assert len(server.drive_service.requests) == 3
+    assert all(request["supportsAllDrives"] and request["includeItemsFromAllDrives"]
+               for request in server.drive_service.requests)
+    assert "'folder' in parents" in server.drive_service.requests[0]["q"]
+    # The listing is cached
+    assert asyncio.run(server._get_folder_manifest("folder")) is listing
+
+
+def test_encode_cursor_is_opaque_text():
+    cursor = _encode_cursor({"id": "id1", "name": "Q3 report / final"})
+
+    assert cursor.isascii() and "/" not in cursor